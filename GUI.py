@@ -13,7 +13,8 @@ from PyQt5.QtCore import QSize
 from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QPixmap, QIcon, QColor, QPalette
 from pytube import YouTube
 
-from common import fetch_title, get_playlist_links, get_playlist_links_untrusted, THUMBNAIL_CACHE_PATH, extract_video_id
+from common import fetch_title, fetch_video_metadata, get_playlist_links, get_playlist_links_untrusted, \
+    THUMBNAIL_CACHE_PATH, extract_video_id
 
 
 # todo: clear existing video titles before adding new ones
@@ -306,9 +307,10 @@ class PlaylistBuilderGUI(QMainWindow):
                 timestamps = playlist_data[1:]
 
                 video_urls = get_playlist_links(playlist_url)
+                titles = {video_url: info.title for video_url, info in fetch_video_metadata(video_urls)}
 
                 for index, video_url in enumerate(video_urls):
-                    title = fetch_title(video_url, "err fetching title", False)
+                    title = titles.get(video_url) or "err fetching title"
                     if title and index < len(timestamps):
                         self.video_data[title] = timestamps[index]
                     #print(f"{title}: {views}")
@@ -325,11 +327,12 @@ class PlaylistBuilderGUI(QMainWindow):
         playlist_url = self.playlist_url_edit.text().strip()
 
         video_urls = get_playlist_links(playlist_url)
+        titles = {video_url: info.title for video_url, info in fetch_video_metadata(video_urls)}
 
         output = [{"prefix": self.prefix_edit.text(), "name": self.project_name_edit.text()}]
 
         for video_url in video_urls:
-            this_title = fetch_title(video_url)
+            this_title = titles.get(video_url) or "err fetching title2"
             if this_title in self.video_data:
                 output.append(self.video_data[this_title])
 
@@ -418,6 +421,8 @@ class PlaylistBuilderGUI(QMainWindow):
 
         # Define the file path
         file_path = os.path.join(THUMBNAIL_CACHE_PATH, f"{video_id}.jpg")
+        if os.path.exists(file_path):
+            return file_path
 
         # Download and save the thumbnail
         response = requests.get(thumbnail_url)
@@ -457,10 +462,7 @@ class PlaylistBuilderGUI(QMainWindow):
 
     def add_video_to_list(self, video_url):
         # Fetch the video title using the provided fetch_title function
-        video_title = fetch_title(video_url)
-
-        # Fetch the YouTube video object using pytube
-        yt = YouTube(video_url)
+        video_title = fetch_title(video_url)  # cached by the playlist fetch
 
         # Extract video ID
         video_id = extract_video_id(video_url)
@@ -0,0 +1,590 @@
+# bench.py
+# rough timing harness for the render engines. needs ffmpeg on PATH and the usual config.json/targets.json,
+# since it drives the real tatoclip functions. outputs go to a scratch folder that is deleted afterwards.
+import argparse
+import json
+import shutil
+import subprocess
+import threading
+import time
+import os
+import re
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from common import print_colored, ColorsEnum, FONT_PATH
+import tatoclip
+import encoders
+import probe
+import mp4_header
+import manifest
+import downloader
+import window_planner
+import chunked_render
+import metadata_store
+import ytdlp_client
+import common
+from source_cache import SourceCache
+
+BENCH_DIR = "bench_scratch"
+
+
+def make_test_source(path, seconds=120, size="1920x1080", rate=60):
+    """Synthetic lavfi testsrc2 + sine source, so benchmarks don't depend on a real download"""
+    if os.path.exists(path):
+        return path
+    command = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={rate}',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+        '-t', str(seconds),
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(rate * 2),
+        '-c:a', 'aac',
+        path
+    ]
+    subprocess.run(command, check=True)
+    return path
+
+
+def spaced_clips(source_seconds, clip_count, clip_seconds):
+    """clip_count (start_sec, duration) pairs spread evenly over the source, buffers included"""
+    usable = source_seconds - clip_seconds - 2 * tatoclip.CLIP_BUFFER_SECONDS
+    step = usable / max(clip_count, 1)
+    return [(int(tatoclip.CLIP_BUFFER_SECONDS + i * step), clip_seconds) for i in range(clip_count)]
+
+
+def timed(label, fn):
+    start = time.time()
+    fn()
+    elapsed = time.time() - start
+    print_colored(f"{label}: {elapsed:.2f}s", "bench", ColorsEnum.CYAN.value)
+    return elapsed
+
+
+def bench_multi(source, source_seconds, clip_count, clip_seconds):
+    """Per-clip processes vs one multi-output process for the same clips"""
+    clips = spaced_clips(source_seconds, clip_count, clip_seconds)
+    no_progress = lambda progress: None
+
+    def per_clip():
+        for i, (start, duration) in enumerate(clips):
+            tatoclip.clip_and_timestamp_ffmpeg(source, start, duration, os.path.join(BENCH_DIR, f"clip_{i}.mp4"),
+                                               "Bench", on_progress=no_progress)
+
+    def multi():
+        batch = [(start, duration, os.path.join(BENCH_DIR, f"multi_{i}.mp4"), "Bench")
+                 for i, (start, duration) in enumerate(clips)]
+        for i in range(0, len(batch), tatoclip.MULTI_OUTPUT_BATCH):
+            tatoclip.clip_and_timestamp_multi_ffmpeg(source, batch[i:i + tatoclip.MULTI_OUTPUT_BATCH],
+                                                     on_progress=no_progress)
+
+    # the fixed cost we're trying to remove: spawn + open + probe + seek, with (almost) nothing decoded
+    def spawn_only():
+        for start, duration in clips:
+            subprocess.run(['ffmpeg', '-v', 'error', '-ss', str(start), '-t', '0.01', '-i', source, '-f', 'null', '-'],
+                           check=True)
+
+    def single_process_only():
+        command = ['ffmpeg', '-v', 'error']
+        for start, duration in clips:
+            command += ['-ss', str(start), '-t', '0.01', '-i', source]
+        for i in range(len(clips)):
+            command += ['-map', f'{i}:v', '-f', 'null', '-']
+        subprocess.run(command, check=True)
+
+    overhead_spawn = timed(f"{len(clips)} x spawn/probe/seek", spawn_only)
+    overhead_single = timed(f"1 x spawn/probe + {len(clips)} seeks", single_process_only)
+    per_clip_time = timed(f"clip engine, {len(clips)} clips", per_clip)
+    multi_time = timed(f"multi engine, {len(clips)} clips", multi)
+
+    print()
+    print(f"spawn+demux overhead removed: {overhead_spawn - overhead_single:.2f}s "
+          f"({(overhead_spawn - overhead_single) / len(clips) * 1000:.0f}ms per clip)")
+    print(f"end to end: {per_clip_time:.2f}s -> {multi_time:.2f}s ({per_clip_time / max(multi_time, 0.001):.2f}x)")
+
+
+def bench_encoders(clip_count, clip_seconds, size="1920x1080", rate=60):
+    """clips/minute for every working H.264 encoder, rendering lavfi testsrc2 with a drawtext overlay"""
+    results = {}
+    for encoder in encoders.probe_encoders(force=True):
+        def render_clips():
+            for i in range(clip_count):
+                subprocess.run([
+                    'ffmpeg', '-y', '-v', 'error',
+                    '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={rate}',
+                    '-t', str(clip_seconds),
+                    '-vf', f"drawtext=text='%{{pts\\:gmtime\\:0\\:%M\\\\\\:%S}}':fontfile='{FONT_PATH}':"
+                           f"fontsize=20:fontcolor=white:x=15:y=1050",
+                    *encoders.get_video_encoder_args(encoder),
+                    os.path.join(BENCH_DIR, f"{encoder}_{i}.mp4")
+                ], check=True)
+
+        elapsed = timed(f"{encoder} {' '.join(encoders.preset_args(encoder))}", render_clips)
+        results[encoder] = clip_count / elapsed * 60
+
+    print()
+    for encoder, clips_per_minute in sorted(results.items(), key=lambda item: -item[1]):
+        print(f"{encoder:20} {clips_per_minute:8.1f} clips/min ({clip_seconds}s {size}@{rate} clips)")
+
+
+# (name, rate, extra ffmpeg args): the shapes of file we actually see - downloads, our own clips, faststart'd
+# concat outputs, .mov, ntsc rates, silent clips
+MP4_VARIANTS = [
+    ("clip.mp4", 60, []),
+    ("ntsc.mp4", "30000/1001", []),
+    ("faststart.mp4", 30, ['-movflags', '+faststart']),
+    ("pal.mov", 25, []),
+    ("silent.mp4", 60, ['-an']),
+]
+
+
+def make_mp4_variants(seconds=10, size="1280x720"):
+    paths = []
+    for name, rate, extra in MP4_VARIANTS:
+        path = os.path.join(BENCH_DIR, name)
+        subprocess.run([
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={rate}',
+            '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+            '-t', str(seconds), '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', *extra,
+            path
+        ], check=True)
+        paths.append(path)
+    return paths
+
+
+def bench_mp4_header(paths, iterations):
+    """Cross-check the moov reader against ffprobe field by field, then time both per file"""
+    failures = 0
+    for path in paths:
+        header = probe.read_header(path)
+        reference = probe.run_ffprobe(path)
+        if header is None or reference is None:
+            print_colored(f"{path}: header={header is not None} ffprobe={reference is not None}", "bench",
+                          ColorsEnum.YELLOW.value)
+            failures += header is None
+            continue
+
+        mismatches = [field for field in ("width", "height", "video_codec", "audio_codec")
+                      if getattr(header, field) != getattr(reference, field)]
+        # ffprobe's format duration can include audio priming/edit lists; validation tolerates far more than this
+        if abs(header.duration - reference.duration) > 0.05:
+            mismatches.append(f"duration {header.duration:.3f} != {reference.duration:.3f}")
+        for ours, theirs in zip(header.streams, reference.streams):
+            for field, value in ours.items():
+                if str(value) != str(theirs.get(field)):
+                    mismatches.append(f"{ours['codec_type']}.{field} {value} != {theirs.get(field)}")
+
+        failures += bool(mismatches)
+        print_colored(f"{path}: {'; '.join(mismatches) or 'matches ffprobe'}", "bench",
+                      ColorsEnum.RED.value if mismatches else ColorsEnum.GREEN.value)
+
+    def header_reads():
+        for _ in range(iterations):
+            for path in paths:
+                mp4_header.read_mp4_info(path)
+
+    def ffprobe_spawns():
+        for _ in range(iterations):
+            for path in paths:
+                probe.run_ffprobe(path)
+
+    probes = iterations * len(paths)
+    header_time = timed(f"{probes} mp4 header reads", header_reads)
+    ffprobe_time = timed(f"{probes} ffprobe spawns", ffprobe_spawns)
+
+    print()
+    print(f"per file: {ffprobe_time / probes * 1000:.2f}ms ffprobe -> {header_time / probes * 1000:.3f}ms header "
+          f"({ffprobe_time / max(header_time, 1e-9):.0f}x)")
+    print(f"{failures} of {len(paths)} files disagree with ffprobe")
+    return failures
+
+
+def bench_manifest(clip_count, clip_seconds):
+    """Time planning a clip_count-clip project against the manifest: fingerprint + existence + compare per clip"""
+    source = os.path.join(BENCH_DIR, "source.mp4")
+    with open(source, 'wb') as f:
+        f.write(b"\0" * 1024)
+    clips = [(i * 60, clip_seconds, os.path.join(BENCH_DIR, f"clip_{i}.mp4")) for i in range(clip_count)]
+    # half the clips exist, half of those were rendered from older settings
+    render_manifest = manifest.RenderManifest(os.path.join(BENCH_DIR, "render_manifest.json"))
+    for i, (start, duration, output_file) in enumerate(clips[:clip_count // 2]):
+        open(output_file, 'wb').close()
+        render_manifest.record(output_file, "stale" if i % 2 else
+                               tatoclip.get_clip_fingerprint(source, start, duration, "Bench"))
+    render_manifest.save()
+
+    stale = []
+    def plan():
+        planner = manifest.RenderManifest(render_manifest.manifest_path)  # cold: includes loading the manifest
+        stale[:] = [output_file for start, duration, output_file in clips
+                    if not planner.is_current(output_file, tatoclip.get_clip_fingerprint(source, start, duration, "Bench"))]
+
+    elapsed = timed(f"planning {clip_count} clips", plan)
+    print(f"{len(stale)} of {clip_count} clips to render, {elapsed / clip_count * 1_000_000:.1f}us per clip")
+
+
+def bench_metadata(title_count, new_titles=100):
+    """
+    Caching new_titles fetched titles on top of title_count cached ones: rewriting the whole json per
+    title (the old cache.json autosave) vs one upsert each in the metadata store, and the import
+    """
+    json_path = os.path.join(BENCH_DIR, "cache.json")
+    titles = {f"video{i:08d}": f"Some video title number {i}" for i in range(title_count)}
+    with open(json_path, 'w') as f:
+        json.dump(titles, f, indent=4)
+    store = metadata_store.MetadataStore(os.path.join(BENCH_DIR, "metadata.db"))
+    timed(f"importing {title_count} titles", lambda: store.import_cache_json(json_path))
+
+    def json_rewrites():
+        for i in range(new_titles):
+            titles[f"new{i}"] = "A freshly fetched title"
+            with open(json_path, 'w') as f:
+                json.dump(titles, f, indent=4)
+
+    def store_puts():
+        for i in range(new_titles):
+            store.put(metadata_store.TITLES, f"new{i}", "A freshly fetched title")
+
+    rewrite_time = timed(f"{new_titles} titles, json rewrite each", json_rewrites)
+    put_time = timed(f"{new_titles} titles, store upsert each", store_puts)
+    print()
+    print(f"per title: {rewrite_time / new_titles * 1000:.2f}ms -> {put_time / new_titles * 1000:.2f}ms, "
+          f"{store.count(metadata_store.TITLES)} titles in the store")
+
+
+class FakeYoutubeDL:
+    """Local stand-in for yt_dlp.YoutubeDL: setup_seconds to build (extractors, session), request_seconds per call"""
+    setup_seconds = 0.02
+    request_seconds = 0.002
+
+    def __init__(self, options):
+        time.sleep(self.setup_seconds)
+
+    def extract_info(self, url, download=False):
+        time.sleep(self.request_seconds)
+        return {"id": url, "title": f"Title of {url}", "duration": 60}
+
+
+def bench_ytdlp(request_count):
+    """
+    The yt-dlp client against FakeYoutubeDL: a new YoutubeDL per call vs the pooled client (retries and
+    the breaker are covered by tests/test_ytdlp_client.py)
+    """
+    urls = [f"video{i}" for i in range(request_count)]
+
+    def fresh():
+        for url in urls:
+            FakeYoutubeDL({}).extract_info(url)
+
+    client = ytdlp_client.YtdlpClient(factory=FakeYoutubeDL)
+    fresh_time = timed(f"{request_count} requests, new YoutubeDL each", fresh)
+    pooled_time = timed(f"{request_count} requests, pooled", lambda: [client.extract_info(url, {}) for url in urls])
+    print(f"{fresh_time / max(pooled_time, 0.001):.1f}x")
+
+    print()
+    client.print_stats()
+    failures = int(client.stats["created"] != 1)
+    print(f"{failures} problems")
+    return failures
+
+
+def bench_batch_metadata(video_count, request_seconds=0.2, sample=20):
+    """
+    Loading a video_count-video playlist's metadata from FakeYoutubeDL answering in request_seconds:
+    one request after another (timed on sample videos, extrapolated) vs fetch_video_metadata, then again cached
+    """
+    FakeYoutubeDL.request_seconds = request_seconds
+    common.ytdlp = ytdlp_client.YtdlpClient(factory=FakeYoutubeDL)
+    common.metadata = metadata_store.MetadataStore(os.path.join(BENCH_DIR, "metadata.db"))
+    common.ensure_ytdlp = lambda: None
+    urls = [f"https://www.youtube.com/watch?v=bench{i:05d}" for i in range(video_count)]
+
+    serial = timed(f"{sample} videos one at a time", lambda: [common.fetch_video_info(url) for url in urls[:sample]])
+    results = {}
+    def batch():
+        results.update(common.fetch_video_metadata(urls))
+    batch_time = timed(f"{video_count} videos, {common.METADATA_MAX_IN_FLIGHT} in flight, "
+                       f"{common.METADATA_REQUESTS_PER_SECOND}/s", batch)
+    cached_time = timed(f"{video_count} videos again, cached", lambda: list(common.fetch_video_metadata(urls)))
+
+    missing = [url for url in urls if results.get(url) is None or results[url].title is None]
+    print()
+    print(f"one at a time (est.): {serial / sample * video_count:.1f}s -> batch {batch_time:.1f}s -> cached "
+          f"{cached_time:.2f}s, {len(missing)} without a title")
+    return len(missing)
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """http.server plus single byte ranges, which ffmpeg needs to seek in an mp4 over http"""
+
+    def send_head(self):
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        start = int(match[1])
+        end = min(int(match[2]) if match[2] else size - 1, size - 1)
+        if start >= size:
+            self.send_error(416)
+            return None
+        f = open(path, 'rb')
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self.range_remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "range_remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0:
+            chunk = source.read(min(64 * 1024, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+
+def bench_sections(source, source_seconds, clip_count, clip_seconds):
+    """
+    Offline check of the section download stage: serve the test source over local http, fetch only the
+    clip windows through yt-dlp, and check every clip lands in a section of the right length
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(RangeRequestHandler, directory=os.path.dirname(source)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/{os.path.basename(source)}"
+
+    clips = spaced_clips(source_seconds, clip_count, clip_seconds)
+    video_filepath = os.path.join(BENCH_DIR, "download", "part_1.mp4")
+    os.makedirs(os.path.dirname(video_filepath), exist_ok=True)
+
+    original_mode, original_cache = downloader.DOWNLOAD_MODE, downloader.source_cache
+    downloader.DOWNLOAD_MODE = "sections"
+    downloader.source_cache = SourceCache(os.path.join(BENCH_DIR, "source_cache.json"), budget_gb=None)
+    sources = []
+    try:
+        timed(f"section download of {len(clips)} clips", lambda: sources.append(
+            downloader.acquire_source(url, video_filepath, clips)))
+    finally:
+        downloader.DOWNLOAD_MODE, downloader.source_cache = original_mode, original_cache
+        server.shutdown()
+    sources = sources[0]
+    if sources is None:
+        print_colored("section download failed", "bench", ColorsEnum.RED.value)
+        return 1
+
+    failures = 0
+    for start, duration in clips:
+        section = sources.locate(*downloader.clip_window(start, duration))
+        if section is None:
+            print_colored(f"clip at {start}s: no section", "bench", ColorsEnum.RED.value)
+            failures += 1
+    for section in sources.sections:
+        info = probe.probe_media(section.path)
+        expected = min(section.end, source_seconds) - section.start
+        # stream copy cuts snap to keyframes, so allow a GOP of slack
+        if info is None or abs(info.duration - expected) > 2 + tatoclip.DURATION_TOLERANCE:
+            print_colored(f"{section.path}: {info.duration if info else None}s, expected ~{expected}s", "bench",
+                          ColorsEnum.RED.value)
+            failures += 1
+
+    downloaded = sum(os.path.getsize(path) for path in sources.paths())
+    print()
+    print(f"{len(sources.sections)} sections, {downloaded / 1_000_000:.1f}MB of {os.path.getsize(source) / 1_000_000:.1f}MB "
+          f"({downloaded / os.path.getsize(source):.0%}), {failures} problems")
+    return failures
+
+
+def bench_windows(source, source_seconds, clip_count, clip_seconds):
+    """
+    Per-clip renders vs merged windows for clips close enough that their buffers overlap,
+    checking every clip cut out of a window has its buffered length
+    """
+    step = clip_seconds + tatoclip.CLIP_BUFFER_SECONDS  # buffers overlap by CLIP_BUFFER_SECONDS
+    clips = [(tatoclip.CLIP_BUFFER_SECONDS + i * step, clip_seconds) for i in range(clip_count)
+             if tatoclip.CLIP_BUFFER_SECONDS + i * step + clip_seconds + tatoclip.CLIP_BUFFER_SECONDS <= source_seconds]
+    no_progress = lambda progress: None
+    batch = [(start, duration, os.path.join(BENCH_DIR, f"window_{i}.mp4"), "Bench", duration)
+             for i, (start, duration) in enumerate(clips)]
+    windows = window_planner.plan_windows(batch)
+
+    def per_clip():
+        for i, (start, duration) in enumerate(clips):
+            tatoclip.clip_and_timestamp_ffmpeg(source, start, duration, os.path.join(BENCH_DIR, f"clip_{i}.mp4"),
+                                               "Bench", on_progress=no_progress)
+
+    def merged():
+        for window in windows:
+            tatoclip.clip_and_timestamp_window_ffmpeg(source, window, on_progress=no_progress)
+
+    encoded = sum(window.duration for window in windows)
+    print_colored(f"{len(clips)} clips in {len(windows)} windows: {encoded:.0f}s encoded instead of "
+                  f"{len(clips) * (clip_seconds + 2 * tatoclip.CLIP_BUFFER_SECONDS)}s", "bench", ColorsEnum.CYAN.value)
+    per_clip_time = timed(f"clip engine, {len(clips)} clips", per_clip)
+    merged_time = timed(f"merged windows, {len(clips)} clips", merged)
+
+    failures = 0
+    for start, duration, output_file, prefix, unit_amount in batch:
+        info = probe.probe_media(output_file)
+        expected = duration + 2 * tatoclip.CLIP_BUFFER_SECONDS
+        if info is None or abs(info.duration - expected) > tatoclip.DURATION_TOLERANCE:
+            print_colored(f"{output_file}: {info.duration if info else None}s, expected {expected}s", "bench",
+                          ColorsEnum.RED.value)
+            failures += 1
+
+    print()
+    print(f"end to end: {per_clip_time:.2f}s -> {merged_time:.2f}s ({per_clip_time / max(merged_time, 0.001):.2f}x), "
+          f"{failures} problems")
+    return failures
+
+
+def bench_chunked(source, source_seconds):
+    """
+    One long clip spanning the source: a single encode vs keyframe chunks encoded 1, 2, 4, ... at a time,
+    up to one per core. Chunks are sized so every core gets two.
+    """
+    cores = os.cpu_count() or 1
+    start = tatoclip.CLIP_BUFFER_SECONDS
+    duration = source_seconds - 2 * tatoclip.CLIP_BUFFER_SECONDS
+    chunked_render.CHUNK_SECONDS = max(4, duration / (2 * cores))  # the source has a keyframe every 2s
+    no_progress = lambda progress: None
+
+    def single():
+        tatoclip.clip_and_timestamp_ffmpeg(source, start, duration, os.path.join(BENCH_DIR, "long_single.mp4"),
+                                           "Bench", on_progress=no_progress)
+    baseline = timed(f"single encode of {duration}s", single)
+
+    job_counts = sorted({2 ** i for i in range(cores.bit_length()) if 2 ** i <= cores} | {cores})
+    results = {}
+    failures = 0
+    for jobs in job_counts:
+        chunked_render.CHUNK_JOBS = jobs
+        output_file = os.path.join(BENCH_DIR, f"long_chunked_{jobs}.mp4")
+        results[jobs] = timed(f"chunked, {jobs} at a time", lambda: tatoclip.clip_and_timestamp_chunked_ffmpeg(
+            source, start, duration, output_file, "Bench", on_progress=no_progress))
+        info = probe.probe_media(output_file)
+        expected = duration + 2 * tatoclip.CLIP_BUFFER_SECONDS
+        if info is None or abs(info.duration - expected) > tatoclip.DURATION_TOLERANCE:
+            print_colored(f"{output_file}: {info.duration if info else None}s, expected {expected}s", "bench",
+                          ColorsEnum.RED.value)
+            failures += 1
+
+    print()
+    print(f"{'jobs':>5} {'time':>8} {'speedup':>8}   ({cores} cores, {chunked_render.CHUNK_SECONDS:.0f}s chunks)")
+    for jobs, elapsed in results.items():
+        print(f"{jobs:>5} {elapsed:>7.2f}s {baseline / max(elapsed, 0.001):>7.2f}x")
+    print(f"{failures} problems")
+    return failures
+
+
+def compare_psnr(reference, distorted):
+    """Average PSNR (dB) of distorted against reference, from ffmpeg's psnr filter"""
+    result = subprocess.run(['ffmpeg', '-v', 'info', '-i', distorted, '-i', reference, '-lavfi', 'psnr', '-f', 'null', '-'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    match = re.search(r"average:(\S+)", result.stderr)
+    return float(match[1]) if match else None
+
+
+def bench_overlay(source, source_seconds, clip_count, clip_seconds):
+    """
+    drawtext vs the numpy overlay engine on the same clips: throughput in frames per second, and how
+    closely the numpy render matches the drawtext one
+    """
+    clips = spaced_clips(source_seconds, clip_count, clip_seconds)
+    no_progress = lambda progress: None
+    frame_rate = tatoclip.get_output_frame_rate(source)
+    frames = len(clips) * round((clip_seconds + 2 * tatoclip.CLIP_BUFFER_SECONDS) * frame_rate)
+
+    def render(render_fn, name):
+        for i, (start, duration) in enumerate(clips):
+            render_fn(source, start, duration, os.path.join(BENCH_DIR, f"{name}_{i}.mp4"), "Bench",
+                      on_progress=no_progress)
+
+    drawtext_time = timed(f"drawtext, {len(clips)} clips", lambda: render(tatoclip.clip_and_timestamp_ffmpeg, "drawtext"))
+    numpy_time = timed(f"numpy overlay, {len(clips)} clips", lambda: render(tatoclip.clip_and_timestamp_numpy, "numpy"))
+
+    failures = 0
+    psnrs = []
+    for i in range(len(clips)):
+        reference, output_file = (os.path.join(BENCH_DIR, f"{name}_{i}.mp4") for name in ("drawtext", "numpy"))
+        info = probe.probe_media(output_file)
+        expected = clip_seconds + 2 * tatoclip.CLIP_BUFFER_SECONDS
+        if info is None or abs(info.duration - expected) > tatoclip.DURATION_TOLERANCE:
+            print_colored(f"{output_file}: {info.duration if info else None}s, expected {expected}s", "bench",
+                          ColorsEnum.RED.value)
+            failures += 1
+        elif (psnr := compare_psnr(reference, output_file)) is not None:
+            psnrs.append(psnr)
+
+    print()
+    print(f"drawtext: {frames / max(drawtext_time, 0.001):.0f} fps, numpy overlay: {frames / max(numpy_time, 0.001):.0f} fps "
+          f"({drawtext_time / max(numpy_time, 0.001):.2f}x)")
+    if psnrs:
+        print(f"numpy vs drawtext renders: {min(psnrs):.1f}dB worst, {sum(psnrs) / len(psnrs):.1f}dB mean PSNR")
+    print(f"{failures} problems")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tatoclip render paths on a synthetic source.")
+    parser.add_argument("benchmark", choices=["multi", "encoders", "mp4", "manifest", "sections", "windows", "chunked",
+                                              "overlay", "metadata", "ytdlp",
+                                              "batch"])
+    parser.add_argument("--source", help="source video (default: generate a lavfi test source)")
+    parser.add_argument("--source-seconds", type=int, default=120)
+    parser.add_argument("--clips", type=int, default=20)
+    parser.add_argument("--clip-seconds", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=20, help="mp4: probes per file when timing")
+    parser.add_argument("--keep", action="store_true", help="keep rendered outputs in " + BENCH_DIR)
+    args = parser.parse_args()
+
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    source = args.source
+    if not source and args.benchmark in ("multi", "sections", "windows", "overlay"):
+        source = make_test_source(os.path.join(BENCH_DIR, "testsrc.mp4"), args.source_seconds)
+    if args.benchmark == "chunked":
+        args.source_seconds = max(args.source_seconds, 600)  # long enough to be worth chunking
+        source = source or make_test_source(os.path.join(BENCH_DIR, "long.mp4"), args.source_seconds)
+
+    try:
+        if args.benchmark == "multi":
+            bench_multi(source, args.source_seconds, args.clips, args.clip_seconds)
+        elif args.benchmark == "encoders":
+            bench_encoders(args.clips, args.clip_seconds)
+        elif args.benchmark == "sections":
+            if bench_sections(source, args.source_seconds, args.clips, args.clip_seconds):
+                raise SystemExit(1)
+        elif args.benchmark == "windows":
+            if bench_windows(source, args.source_seconds, args.clips, args.clip_seconds):
+                raise SystemExit(1)
+        elif args.benchmark == "chunked":
+            if bench_chunked(source, args.source_seconds):
+                raise SystemExit(1)
+        elif args.benchmark == "overlay":
+            if bench_overlay(source, args.source_seconds, args.clips, args.clip_seconds):
+                raise SystemExit(1)
+        elif args.benchmark == "metadata":
+            bench_metadata(args.clips * 1000)
+        elif args.benchmark == "ytdlp":
+            if bench_ytdlp(args.clips * 10):
+                raise SystemExit(1)
+        elif args.benchmark == "batch":
+            if bench_batch_metadata(args.clips * 25):
+                raise SystemExit(1)
+        elif args.benchmark == "manifest":
+            bench_manifest(args.clips, args.clip_seconds)
+        elif args.benchmark == "mp4":
+            paths = [args.source] if args.source else make_mp4_variants()
+            if bench_mp4_header(paths, args.iterations):
+                raise SystemExit(1)
+    finally:
+        if not args.keep:
+            shutil.rmtree(BENCH_DIR, ignore_errors=True)
@@ -0,0 +1,142 @@
+# chunked_render.py
+# long clips (full boss fights) otherwise keep one encoder busy for their whole length. a clip longer than
+# CHUNK_MIN_SECONDS is split at source keyframes into chunks of about CHUNK_SECONDS, the chunks are encoded in
+# parallel (each seek lands on a keyframe, so nothing is decoded twice) and joined by stream copy. keyframe times
+# come from the mp4's sync sample table, or one ffprobe packet scan, and are cached per source like probe results.
+import os
+import json
+import math
+import atexit
+import bisect
+import subprocess
+import threading
+
+from common import config, print_colored, ColorsEnum
+from mp4_header import read_mp4_keyframes
+
+CHUNKED_RENDER = config.get("CHUNKED_RENDER", False)  # overridden by --chunked
+CHUNK_MIN_SECONDS = config.get("CHUNK_MIN_SECONDS", 180)  # clips at least this long (buffer included) are chunked
+CHUNK_SECONDS = config.get("CHUNK_SECONDS", 60)  # target chunk length
+CHUNK_JOBS = config.get("CHUNK_JOBS", 0)  # chunks encoded at once across the render pool, 0 = one per core
+KEYFRAME_INDEX_PATH = config.get("KEYFRAME_INDEX_PATH", "keyframe_index.json")
+
+
+def run_ffprobe_keyframes(video_path):
+    """Keyframe pts of the first video stream from its packet flags - demux only, nothing decoded"""
+    command = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        video_path
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    times = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            times.append(float(pts_time))
+    return sorted(times)
+
+
+class KeyframeIndex:
+    """On-disk keyframe times keyed by absolute path, valid while the file's size and mtime are unchanged"""
+
+    def __init__(self, index_path=KEYFRAME_INDEX_PATH):
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+        self.stats = {"hits": 0, "header_reads": 0, "spawns": 0}
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    self._entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                print_colored(f"ignoring unreadable {self.index_path}", "keyframe_index", ColorsEnum.YELLOW.value)
+
+    def get(self, video_path):
+        """Sorted keyframe times of video_path in seconds, [] if they can't be read"""
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return []
+        identity = [stat.st_size, stat.st_mtime_ns]
+        key = os.path.abspath(video_path)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry and entry["identity"] == identity:
+                self.stats["hits"] += 1
+                return entry["keyframes"]
+
+        keyframes = read_mp4_keyframes(video_path)
+        stat_name = "header_reads"
+        if keyframes is None:
+            keyframes = run_ffprobe_keyframes(video_path) or []
+            stat_name = "spawns"
+        with self._lock:
+            self.stats[stat_name] += 1
+            self._entries[key] = {"identity": identity, "keyframes": keyframes}
+            self._dirty = True
+        return keyframes
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+
+keyframe_index = KeyframeIndex()
+atexit.register(keyframe_index.save)
+
+
+def get_chunk_jobs(render_jobs=1):
+    """Chunks one clip encodes at once: its share of CHUNK_JOBS (or the cores) when render_jobs clips render together"""
+    return max(1, (CHUNK_JOBS or os.cpu_count() or 1) // render_jobs)
+
+
+def plan_chunks(keyframes, start_time, duration, frame_rate, chunk_seconds=None):
+    """
+    Split [start_time, start_time + duration] (file time, seconds) into [(start, duration)] chunks at the
+    keyframes nearest every chunk_seconds. Cuts are moved onto the output frame grid counted from
+    start_time, so the chunks join without drift. A single chunk means there's nothing to split at.
+    """
+    chunk_seconds = chunk_seconds or CHUNK_SECONDS
+    end_time = start_time + duration
+    cuts = [start_time]
+    target = start_time + chunk_seconds
+    while target < end_time - chunk_seconds / 2:  # don't leave a stub of a last chunk
+        i = bisect.bisect_left(keyframes, target)
+        nearest = min(keyframes[max(i - 1, 0):i + 1], key=lambda keyframe: abs(keyframe - target), default=None)
+        # first output frame at or after the keyframe, so the seek doesn't fall back a whole GOP
+        cut = start_time + math.ceil((nearest - start_time) * frame_rate - 1e-6) / frame_rate if nearest is not None else None
+        if cut is not None and cuts[-1] + chunk_seconds / 2 <= cut <= end_time - chunk_seconds / 2:
+            cuts.append(cut)
+            target = cut + chunk_seconds
+        else:
+            target += chunk_seconds
+    cuts.append(end_time)
+    return [(cut, next_cut - cut) for cut, next_cut in zip(cuts, cuts[1:])]
+
+
+def print_keyframe_stats():
+    stats = keyframe_index.stats
+    print(f"keyframe index: {stats['hits']} cached, {stats['header_reads']} mp4 header reads, "
+          f"{stats['spawns']} ffprobe scans")
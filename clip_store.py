@@ -0,0 +1,244 @@
+# clip_store.py
+# optional store of rendered clips shared by every project, keyed by render fingerprint (see manifest.py). a
+# project that needs a clip some other project already rendered links it in instead of encoding it again.
+# disabled unless CLIP_STORE_DIR is set. run `python clip_store.py gc` to trim it by hand.
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import threading
+
+from common import config, print_colored, ColorsEnum
+from metadata_store import BUSY_TIMEOUT_MS
+
+CLIP_STORE_DIR = config.get("CLIP_STORE_DIR", None)
+CLIP_STORE_QUOTA_GB = config.get("CLIP_STORE_QUOTA_GB", 50)
+
+FICLONE = 0x40049409  # linux ioctl: share extents (btrfs, xfs, ...) - a copy that costs no space
+
+
+def reflink(src, dst):
+    import fcntl  # posix only
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def link_file(src, dst):
+    """
+    Make dst the same content as src as cheaply as the filesystem allows: hardlink, then reflink,
+    then a plain copy. Goes through a temp name, so dst is never seen half written.
+    """
+    temp = f"{dst}.link.tmp"
+    if os.path.exists(temp):
+        os.remove(temp)
+    try:
+        os.link(src, temp)
+        method = "hardlink"
+    except OSError:  # other filesystem, or no hardlink support
+        try:
+            reflink(src, temp)
+            method = "reflink"
+        except (OSError, ImportError):
+            shutil.copyfile(src, temp)
+            method = "copy"
+    os.replace(temp, dst)
+    return method
+
+
+class ClipStore:
+    """
+    store_dir/<fp[:2]>/<fp>.mp4, plus index.db (sqlite, WAL) of fingerprint -> size / last use, for LRU eviction.
+    Every change is its own transaction against the shared index, so runs of different projects using the store
+    at the same time see each other's clips. Evicting only drops the store's link; projects that linked a clip
+    keep their own.
+    """
+
+    def __init__(self, store_dir, quota_gb=CLIP_STORE_QUOTA_GB):
+        self.store_dir = store_dir
+        self.quota_bytes = int(quota_gb * 1024 ** 3)
+        self.index_path = os.path.join(store_dir, "index.db")
+        self._local = threading.local()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        self._stats_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS clips ("
+                         "fingerprint TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._import_index_json()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(self.store_dir, exist_ok=True)
+            # autocommit: transactions are opened explicitly, BEGIN IMMEDIATE where files change with the index
+            conn = sqlite3.connect(self.index_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat, amount=1):
+        with self._stats_lock:
+            self.stats[stat] += amount
+
+    def _import_index_json(self):
+        """One-time import of the index.json older versions kept"""
+        json_path = os.path.join(self.store_dir, "index.json")
+        if not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            print_colored(f"ignoring unreadable {json_path}", "clip_store", ColorsEnum.YELLOW.value)
+            entries = {}
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR IGNORE INTO clips (fingerprint, size, last_used) VALUES (?, ?, ?)",
+                             [(clip_fingerprint, entry["size"], entry["last_used"])
+                              for clip_fingerprint, entry in entries.items()])
+            os.replace(json_path, json_path + ".imported")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def path_for(self, clip_fingerprint):
+        return os.path.join(self.store_dir, clip_fingerprint[:2], f"{clip_fingerprint}.mp4")
+
+    def fetch(self, clip_fingerprint, output_file):
+        """Link the stored clip to output_file if the store has it. Returns whether it did"""
+        return output_file in self.fetch_many([(clip_fingerprint, output_file)])
+
+    def fetch_many(self, clips):
+        """
+        Link every stored clip of [(fingerprint, output_file)] into place, with one lookup and one last-use
+        update for all of them. Returns the set of output files linked
+        """
+        conn = self._connect()
+        fingerprints = [clip_fingerprint for clip_fingerprint, output_file in clips]
+        known = set()
+        for i in range(0, len(fingerprints), 500):  # stay under sqlite's bound parameter limit
+            batch = fingerprints[i:i + 500]
+            known.update(row[0] for row in conn.execute(
+                f"SELECT fingerprint FROM clips WHERE fingerprint IN ({','.join('?' * len(batch))})", batch))
+
+        linked = set()
+        used = []
+        for clip_fingerprint, output_file in clips:
+            if clip_fingerprint not in known:
+                continue
+            os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+            try:
+                method = link_file(self.path_for(clip_fingerprint), output_file)
+            except FileNotFoundError:  # evicted by another run just now
+                continue
+            linked.add(output_file)
+            used.append(clip_fingerprint)
+            print_colored(f"{os.path.basename(output_file)} from clip store ({method})", "clip_store",
+                          ColorsEnum.GREEN.value, 1)
+        if used:
+            now = time.time()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("UPDATE clips SET last_used = ? WHERE fingerprint = ?",
+                                 [(now, clip_fingerprint) for clip_fingerprint in used])
+        self._count("hits", len(linked))
+        self._count("misses", len(clips) - len(linked))
+        return linked
+
+    def put(self, clip_fingerprint, output_file):
+        """Add a freshly rendered clip, then evict least recently used clips past the quota"""
+        stored = self.path_for(clip_fingerprint)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")  # so gc in another process can't take the new file for an orphan
+        try:
+            os.makedirs(os.path.dirname(stored), exist_ok=True)
+            link_file(output_file, stored)
+            conn.execute("INSERT INTO clips (fingerprint, size, last_used) VALUES (?, ?, ?) "
+                         "ON CONFLICT (fingerprint) DO UPDATE SET size = excluded.size, last_used = excluded.last_used",
+                         (clip_fingerprint, os.path.getsize(stored), time.time()))
+            self._evict(conn, self.quota_bytes)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("stored")
+
+    def _evict(self, conn, quota_bytes):
+        """Inside a write transaction: drop least recently used clips until the total is within quota_bytes"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM clips").fetchone()[0]
+        if total <= quota_bytes:
+            return
+        for clip_fingerprint, size in conn.execute("SELECT fingerprint, size FROM clips ORDER BY last_used").fetchall():
+            if total <= quota_bytes:
+                break
+            stored = self.path_for(clip_fingerprint)
+            if os.path.exists(stored):
+                os.remove(stored)
+            conn.execute("DELETE FROM clips WHERE fingerprint = ?", (clip_fingerprint,))
+            total -= size
+            self._count("evicted")
+
+    def gc(self, quota_bytes=None, unreferenced=False):
+        """
+        Drop index entries whose file is gone and files the index doesn't know, optionally clips no
+        project links anymore (hardlink count 1), then evict down to the quota. Returns bytes in use.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")  # holds off other runs' put() for the sweep
+        try:
+            known = set()
+            for clip_fingerprint, in conn.execute("SELECT fingerprint FROM clips").fetchall():
+                stored = self.path_for(clip_fingerprint)
+                if not os.path.exists(stored) or (unreferenced and os.stat(stored).st_nlink <= 1):
+                    if os.path.exists(stored):
+                        os.remove(stored)
+                    conn.execute("DELETE FROM clips WHERE fingerprint = ?", (clip_fingerprint,))
+                    self._count("evicted")
+                else:
+                    known.add(clip_fingerprint)
+
+            for root, dirs, files in os.walk(self.store_dir):
+                if root == self.store_dir:
+                    continue  # the index and its journal files
+                for name in files:
+                    if name[:-4] not in known:
+                        os.remove(os.path.join(root, name))  # orphan, or a temp from an interrupted link
+
+            self._evict(conn, self.quota_bytes if quota_bytes is None else quota_bytes)
+            in_use = conn.execute("SELECT COALESCE(SUM(size), 0) FROM clips").fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return in_use
+
+    def print_stats(self):
+        print(f"clip store: {self.stats['hits']} linked, {self.stats['misses']} misses, "
+              f"{self.stats['stored']} stored, {self.stats['evicted']} evicted")
+
+
+clip_store = ClipStore(CLIP_STORE_DIR) if CLIP_STORE_DIR else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the shared clip store (CLIP_STORE_DIR).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    gc_parser = subparsers.add_parser("gc", help="Remove stale entries and evict down to the quota")
+    gc_parser.add_argument("--quota", type=float, help=f"Quota in GB (default: {CLIP_STORE_QUOTA_GB})")
+    gc_parser.add_argument("--unreferenced", action="store_true",
+                           help="Also remove clips no project hardlinks anymore")
+    args = parser.parse_args()
+
+    if clip_store is None:
+        print_colored("CLIP_STORE_DIR isn't set in config.json", "clip_store", ColorsEnum.RED.value)
+        sys.exit(1)
+
+    if args.command == "gc":
+        quota_bytes = int(args.quota * 1024 ** 3) if args.quota is not None else None
+        in_use = clip_store.gc(quota_bytes, args.unreferenced)
+        clip_store.print_stats()
+        print(f"{in_use / 1024 ** 3:.2f}GB in {clip_store.store_dir}")
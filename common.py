@@ -9,11 +9,15 @@ import subprocess
 import re
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from enum import Enum
-from typing import Protocol
+from typing import Protocol, NamedTuple
 
 from ytdlp_checker import ensure_ytdlp
+from metadata_store import MetadataStore, TITLES, PLAYLISTS, DURATIONS
+from ytdlp_client import YtdlpClient
 from tatoclipLogging import LogModule
 
 class VideoProcessingStrategy(Protocol):
@@ -27,12 +31,25 @@ with open(CONFIG_PATH, 'r') as config_file:
     config = json.load(config_file)
 
 # Constants and Global Variables
-CACHE_PATH = config.get("CACHE_PATH", "cache.json")
+CACHE_PATH = config.get("CACHE_PATH", "cache.json")  # legacy json cache, imported into METADATA_DB_PATH once
+METADATA_DB_PATH = config.get("METADATA_DB_PATH", "metadata.db")
+YTDLP_RETRIES = config.get("YTDLP_RETRIES", 3)  # retries of a transient yt-dlp failure, with jittered backoff
+YTDLP_BACKOFF = config.get("YTDLP_BACKOFF", 1.0)  # seconds before the first retry, doubling after
+YTDLP_BREAKER_FAILURES = config.get("YTDLP_BREAKER_FAILURES", 5)  # consecutive failures before yt-dlp is left alone
+YTDLP_BREAKER_COOLDOWN = config.get("YTDLP_BREAKER_COOLDOWN", 60)  # seconds before trying it again
+METADATA_MAX_IN_FLIGHT = config.get("METADATA_MAX_IN_FLIGHT", 16)  # concurrent metadata requests of a batch
+PLAYLIST_CACHE_TTL_HOURS = config.get("PLAYLIST_CACHE_TTL_HOURS", 24)  # cached playlists are trusted this long
+METADATA_REQUESTS_PER_SECOND = config.get("METADATA_REQUESTS_PER_SECOND", 25)  # request starts per second, 0 = no limit
 BIT_RATE = config.get("BIT_RATE", "50000k")
 OUTPUT_DIR = config.get("OUTPUT_DIR", "videos")
 CLIP_BUFFER_SECONDS = config.get("CLIP_BUFFER_SECONDS", 3)
+DURATION_TOLERANCE = config.get("DURATION_TOLERANCE", 1)  # seconds a clip's duration may be off by and still pass
 FRAME_RATE = config.get("FRAME_RATE", 60)
-COMBINED_MODE = True # todo: default to false when not testing?
+RENDER_JOBS = config.get("RENDER_JOBS", 1)  # concurrent ffmpeg processes, overridden by --jobs
+COMBINED_MODE = config.get("COMBINED_MODE", False)  # one <prefix>_combined.mp4 per video, or with --combined
+COMBINED_BATCH_SIZE = config.get("COMBINED_BATCH_SIZE", 8)  # segments (= open decoders) per ffmpeg when combining
+PREFETCH_DEPTH = config.get("PREFETCH_DEPTH", 2)  # videos acquired ahead of the one being processed, overridden by --prefetch
+PREFETCH_DISK_BUDGET_GB = config.get("PREFETCH_DISK_BUDGET_GB", 20)  # no new prefetch while waiting ones hold this much
 TARGETS = {}
 
 HIGH_RES_THRESHOLD = 9991440          # resolution threshold (height) for capping frame rate
@@ -243,54 +260,40 @@ def sec_to_timestamp(seconds):
 
 
 
-cache_data = {}
-cache_locked = False
-
-# Function to load cache data from file
-def load_cache():
-    global cache_data
-    if os.path.exists(CACHE_PATH):
-        with open(CACHE_PATH, 'r') as f:
-            cache_data = json.load(f)
-    #print(cache_data)
-
-def dump_cache():
-    global CACHE_PATH
-    global cache_data
-    with open(CACHE_PATH, 'w') as f:
-        json.dump(cache_data, f, indent=4)
+metadata = MetadataStore(METADATA_DB_PATH)
+metadata.import_cache_json(CACHE_PATH)  # once, from before the store existed
 
 def video_title_is_cached(video_url):
-    return extract_video_id(video_url) in cache_data
+    return metadata.contains(TITLES, extract_video_id(video_url))
 
 def playlist_links_are_cached(playlist_url):
-    return playlist_url in cache_data
-
-def autosave(interval):
-    global last_save_time
-    global cache_data
-    global CACHE_PATH
-    global cache_locked
-    if time.time() - last_save_time > interval:
-        if not cache_locked:
-            try:
-                cache_locked = True
-                last_save_time = time.time()
-                with open(CACHE_PATH, 'w') as f:
-                    json.dump(cache_data, f, indent=4)
-                cache_locked = False
-            except:
-                i = 0
-                while cache_locked and i < 40:  # 2 seconds
-                    time.sleep(0.05)
-                    i += 1
-                cache_locked = False
-                autosave(-1)
-
-# Load cache data when script starts
-load_cache()
+    return metadata.contains(PLAYLISTS, playlist_url)
+
 youtube_title_fetch_count = 0
-last_save_time = time.time()
+
+ytdlp = YtdlpClient(retries=YTDLP_RETRIES, backoff=YTDLP_BACKOFF, failure_threshold=YTDLP_BREAKER_FAILURES,
+                    cooldown=YTDLP_BREAKER_COOLDOWN)
+
+UNAVAILABLE_TITLES = {"[Private video]", "[Deleted video]"}  # what flat playlist entries call videos we can't see
+
+def cache_video_metadata(video_infos):
+    """Cache the titles and durations of [(video_url, yt-dlp info dict)], e.g. flat playlist entries, in one write each"""
+    titles = {}
+    durations = {}
+    for video_url, info in video_infos:
+        video_id = extract_video_id(video_url)
+        title = info.get('title')
+        if title and title not in UNAVAILABLE_TITLES:
+            titles[video_id] = title
+        durations[video_id] = info.get('duration')  # None too: private/deleted, no need to ask again
+    metadata.put_many(TITLES, titles)
+    metadata.put_many(DURATIONS, durations)
+
+def get_cached_durations(video_urls):
+    """{video_url: seconds, or None if yt-dlp didn't know} for the videos whose duration is cached"""
+    durations = metadata.get_many(DURATIONS, [extract_video_id(video_url) for video_url in video_urls])
+    return {video_url: durations[extract_video_id(video_url)] for video_url in video_urls
+            if extract_video_id(video_url) in durations}
 
 
 # Function to extract video ID from YouTube URL
@@ -304,13 +307,13 @@ def extract_playlist_id(playlist_url):
 
 youtube_playlist_links_fetch_count = 0
 def get_playlist_links(playlist_url):
-    global cache_data
-    if playlist_url in cache_data:
-        return cache_data[playlist_url]
-    return get_playlist_links_untrusted(playlist_url)
+    """The playlist's video urls, from cache while it's younger than PLAYLIST_CACHE_TTL_HOURS (or the fetch fails)"""
+    cached_links, updated = metadata.get_updated(PLAYLISTS, playlist_url)
+    if cached_links is not None and time.time() - updated < PLAYLIST_CACHE_TTL_HOURS * 3600:
+        return cached_links
+    return get_playlist_links_untrusted(playlist_url) or cached_links
 
 def get_playlist_links_untrusted(playlist_url):
-    global cache_data
     # ensure yt-dlp is up-to-date
     ensure_ytdlp()
 
@@ -324,14 +327,14 @@ def get_playlist_links_untrusted(playlist_url):
             'force_generic_extractor': False,
         }
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(playlist_url, download=False)
+        info = ytdlp.extract_info(playlist_url, ydl_opts)
 
         # Extract video URLs from the playlist entries
         entries = info.get('entries', [])
         if entries:
             # If it's a playlist, build a list of video URLs
             new_links = []
+            harvested = []  # each entry's title and duration come along for free
             for entry in entries:
                 if not entry:
                     continue
@@ -341,6 +344,8 @@ def get_playlist_links_untrusted(playlist_url):
                     vid_url = f"https://www.youtube.com/watch?v={entry['id']}"
                 if vid_url:
                     new_links.append(vid_url)
+                    harvested.append((vid_url, entry))
+            cache_video_metadata(harvested)
         else:
             # Single video (not a playlist)
             vid_url = info.get('webpage_url') or info.get('url')
@@ -353,16 +358,11 @@ def get_playlist_links_untrusted(playlist_url):
             raise ValueError("No video URLs found")
 
         # Check if playlist URL is in cache
-        if playlist_url in cache_data:
-            # Compare lengths to decide if cache needs updating
-            cached_links = cache_data[playlist_url]
-            if len(new_links) != len(cached_links):
-                print(f"Playlist length has changed for {playlist_url}. Updating cache.") # todo: diff?
-                cache_data[playlist_url] = new_links
-                autosave(1)
-        else:
-            cache_data[playlist_url] = new_links
-            autosave(1)
+        cached_links = metadata.get(PLAYLISTS, playlist_url)
+        if cached_links is not None and cached_links != new_links:
+            # targets.json is remapped by playlist_sync, which keeps its own record of the old order
+            print(f"Playlist has changed for {playlist_url}. Updating cache.")
+        metadata.put(PLAYLISTS, playlist_url, new_links)  # also restarts PLAYLIST_CACHE_TTL_HOURS
 
         return new_links
 
@@ -371,6 +371,22 @@ def get_playlist_links_untrusted(playlist_url):
         return None
 
 
+def merge_windows(windows, gap=0):
+    """Merge (start, end) windows that overlap or are less than gap apart; returns sorted, disjoint windows"""
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1] + gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def get_clip_output_file(output_folder, prefix, start_time):
+    filename = f"{prefix}_{start_time.replace(':', '..')}_timestamped.mp4"
+    return os.path.join(output_folder.lower(), filename.lower()).replace(" ", "_")
+
+
 def should_process_clip(start_time, prefix, output_folder):
     if start_time == "name":
         return False
@@ -379,8 +395,7 @@ def should_process_clip(start_time, prefix, output_folder):
     if start_time == "aliases":
         return False
 
-    filename = f"{prefix}_{start_time.replace(':', '..')}_timestamped.mp4"
-    output_file = os.path.join(output_folder.lower(), filename.lower()).replace(" ", "_")
+    output_file = get_clip_output_file(output_folder, prefix, start_time)
 
     if os.path.exists(output_file):
         return False
@@ -433,95 +448,191 @@ def sanitize(title):
 def fetch_title(video_url, alt_title="err fetching title2", send_views_bool=False):
     # please please please don't use this for file names, just.. please. Not again.
     #                                   - viv at 1:30am on apparently mario day 2025
-    global cache_data
     global youtube_title_fetch_count
-    global last_save_time
-    global cache_locked
 
     video_id = extract_video_id(video_url)
 
-    loops = 100
-    while cache_locked and loops > 0:
-        time.sleep(0.1)
-        loops -= 1
-
-    if video_id in cache_data and not send_views_bool:
-        if type(cache_data[video_id]) == type("test"): # load bearing idiocy
-            return cache_data[video_id]
+    if not send_views_bool:
+        cached_title = metadata.get(TITLES, video_id)
+        if type(cached_title) == type("test"): # load bearing idiocy
+            return cached_title
 
     title = fetch_title_ytdlp(video_url)
 
     if not title or len(title) == 0:
         title = alt_title  # Use the alternative title if yt-dlp fails as well
     else:
-        cache_data[video_id] = title
+        metadata.put(TITLES, video_id, title)
 
     youtube_title_fetch_count += 1
-    autosave(1)
 
     return title
 
-ytdlp_is_borked = False
 def fetch_title_ytdlp(video_url):
-    global ytdlp_is_borked
-
     print("Fetching title with yt-dlp... ", end="\r")
+    ensure_ytdlp()
+    title = fetch_video_info(video_url).title
+    if title:
+        print(f"Fetched title with yt-dlp: {title}")
+        return title
+    print_colored(f"Error fetching title with yt-dlp: no title for {video_url}", "fetch_title_yt_dlp_fallback", 3)
+    return None
+
+
+class VideoMetadata(NamedTuple):
+    title: str = None
+    duration: float = None
+    view_count: int = None  # never cached: always fetched when asked for
+
+
+class RateLimiter:
+    """Spaces acquire() calls across threads at most rate per second apart (no limit when rate is 0)"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def fetch_video_info(video_url, limiter=None):
+    """One video's VideoMetadata from yt-dlp, caching its title and duration. Empty VideoMetadata on failure"""
+    if limiter is not None:
+        limiter.acquire()
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': True,
+        'force_generic_extractor': False,
+    }
     try:
-        assert not ytdlp_is_borked
-        ensure_ytdlp()
+        info = ytdlp.extract_info(video_url, ydl_opts)
+    except Exception as e:
+        print_colored(f"Error fetching metadata for {video_url}: {e}", "fetch_video_metadata", 3)
+        return VideoMetadata()
+    cache_video_metadata([(video_url, info)])
+    return VideoMetadata(info.get('title'), info.get('duration'), info.get('view_count'))
 
-        # Use yt-dlp's Python API to get title without downloading
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': True,
-            'force_generic_extractor': False,
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            title = info.get('title')
-            if title:
-                print(f"Fetched title with yt-dlp: {title}")
-                return title
+
+def fetch_video_metadata(video_urls, with_views=False, max_in_flight=None, requests_per_second=None):
+    """
+    Yield (video_url, VideoMetadata) for every url, in completion order: cached titles and durations right
+    away, the rest as yt-dlp answers, at most max_in_flight requests at once and requests_per_second
+    starting per second (METADATA_MAX_IN_FLIGHT / METADATA_REQUESTS_PER_SECOND by default).
+    with_views always fetches, since view counts aren't cached.
+    """
+    video_urls = list(dict.fromkeys(video_urls))
+    to_fetch = video_urls
+    if not with_views:
+        titles = metadata.get_many(TITLES, [extract_video_id(video_url) for video_url in video_urls])
+        durations = metadata.get_many(DURATIONS, [extract_video_id(video_url) for video_url in video_urls])
+        to_fetch = []
+        for video_url in video_urls:
+            video_id = extract_video_id(video_url)
+            if isinstance(titles.get(video_id), str):
+                yield video_url, VideoMetadata(titles[video_id], durations.get(video_id))
             else:
-                raise ValueError("No title in extracted info")
+                to_fetch.append(video_url)
+    if not to_fetch:
+        return
 
-    except Exception as e:
-        ytdlp_is_borked = True
-        print_colored(f"Error fetching title with yt-dlp: {e}", "fetch_title_yt_dlp_fallback", 3)
-        return None
+    ensure_ytdlp()
+    limiter = RateLimiter(METADATA_REQUESTS_PER_SECOND if requests_per_second is None else requests_per_second)
+    executor = ThreadPoolExecutor(max_workers=max_in_flight or METADATA_MAX_IN_FLIGHT, thread_name_prefix="metadata")
+    try:
+        futures = {executor.submit(fetch_video_info, video_url, limiter): video_url for video_url in to_fetch}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)  # the caller stopped early
 
 
+def get_mp4_bounds(video_path):
+    from probe import probe_media  # probe imports common
+    info = probe_media(video_path)
+    if info is None:
+        raise ValueError(f"couldn't probe {video_path}")
+    return [info.width, info.height]
 
 
-_video_bounds_cache = {}
-def get_mp4_bounds(video_path):
-    # Return cached result if available
-    if video_path in _video_bounds_cache:
-        return _video_bounds_cache[video_path]
+def has_audio_stream(video_path):
+    from probe import probe_media
+    info = probe_media(video_path)
+    return info is not None and info.has_audio
 
-    #print(video_path)
-    command = [
-        'ffprobe',
-        '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream=width,height',
-        '-of', 'json',
-        video_path
-    ]
 
-    #print(command)
+stage_times = {"prefetch": [], "prefetch_wait": [], "process": []}  # seconds per video, per pipeline stage
 
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    output = json.loads(result.stdout)
-    width = output['streams'][0]['width']
-    height = output['streams'][0]['height']
 
-    _video_bounds_cache[video_path] = [width, height]
-    return [width, height]
+class Prefetcher:
+    """
+    Runs prefetch_fn (same signature as a VideoProcessingStrategy, returning the bytes it put on disk)
+    for upcoming videos on one background thread while the caller processes the current video.
+    At most depth videos run ahead, and no new one starts while finished prefetches that haven't
+    been processed yet hold more than disk_budget bytes.
+    """
 
+    def __init__(self, prefetch_fn, depth, disk_budget):
+        self.prefetch_fn = prefetch_fn
+        self.depth = depth
+        self.disk_budget = disk_budget
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._futures = {}  # index -> future of bytes prefetched
 
-def process_playlist(playlist_url, timestamps, process_fn, prefix="", start_index=1, end_index=None):
+    def _run(self, index, *args):
+        start_time = time.time()
+        try:
+            return self.prefetch_fn(index, *args) or 0
+        except Exception as e:  # the processing stage acquires the source itself instead
+            print_err(f"prefetch of video {index} failed: {e}", "prefetch")
+            return 0
+        finally:
+            stage_times["prefetch"].append(time.time() - start_time)
+
+    def pending_bytes(self):
+        return sum(future.result() for future in self._futures.values() if future.done())
+
+    def schedule(self, jobs):
+        """Start prefetching jobs [(index, url, timestamps, prefix, filename)], the current video first"""
+        for index, *args in jobs[:self.depth + 1]:
+            if index in self._futures:
+                continue
+            if self.pending_bytes() >= self.disk_budget:
+                break
+            self._futures[index] = self._executor.submit(self._run, index, *args)
+
+    def wait(self, index):
+        """Block until video index is prefetched (if it was scheduled), recording how long processing waited"""
+        future = self._futures.pop(index, None)
+        if future is None:
+            return
+        start_time = time.time()
+        future.result()
+        stage_times["prefetch_wait"].append(time.time() - start_time)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def print_stage_times(wall_time):
+    prefetch, waiting, process = (sum(stage_times[stage]) for stage in ("prefetch", "prefetch_wait", "process"))
+    print(f"stages: prefetch {prefetch:.1f}s, processing {process:.1f}s, processing waited on prefetch {waiting:.1f}s; "
+          f"wall {wall_time:.1f}s vs {prefetch + process:.1f}s back to back")
+
+
+def process_playlist(playlist_url, timestamps, process_fn, prefix="", start_index=1, end_index=None,
+                     prefetch_fn=None, prefetch_depth=PREFETCH_DEPTH):
+    """
+    Run process_fn for each video of the playlist in [start_index, end_index). With prefetch_fn, sources
+    for the next prefetch_depth videos are acquired in the background while process_fn works (see Prefetcher).
+    """
     print("Processing playlist...")
     start_time_playlist = time.time()
     end_index = end_index or len(timestamps)
@@ -534,69 +645,120 @@ def process_playlist(playlist_url, timestamps, process_fn, prefix="", start_inde
 
     video_urls = get_playlist_links(playlist_url)
 
-    for index in range(start_index, end_index):
-        #print(video_urls)
-        #print(index)
-        try:
-            video_url = video_urls[index - 1]
-        except IndexError:
-            print_colored(f"video {index} OOB in playlist url cache, checking for changes...", "process_playlist")
-            video_urls = get_playlist_links_untrusted(playlist_url)
+    prefetcher = None
+    if prefetch_fn is not None and prefetch_depth > 0:
+        prefetcher = Prefetcher(prefetch_fn, prefetch_depth, PREFETCH_DISK_BUDGET_GB * 1024 ** 3)
+
+    def get_prefetch_jobs(first_index):
+        jobs = []
+        for index in range(first_index, min(first_index + prefetch_depth + 1, end_index)):
+            video_timestamps = timestamps[index]
+            if not video_timestamps or "prefix" in video_timestamps or not video_urls or index > len(video_urls):
+                continue
+            jobs.append((index, video_urls[index - 1], video_timestamps, prefix, sanitize(f"{prefix}{index}") + ".mp4"))
+        return jobs
+
+    try:
+        for index in range(start_index, end_index):
+            #print(video_urls)
+            #print(index)
             try:
                 video_url = video_urls[index - 1]
-            except IndexError:
-                print_err(f"video {index} OOB in playlist", "fetch_video_url_fallback")
+            except (IndexError, TypeError):
+                # the playlist was synced with targets.json before this loop (see playlist_sync.py), so
+                # refetching here could only move later indices onto different videos mid-run
+                print_err(f"video {index} OOB in playlist (try --sync)", "process_playlist")
+                skipped += 1
+                continue
 
-        video_timestamps = timestamps[index]
+            video_timestamps = timestamps[index]
 
-        # Generic skipping logic
-        if not video_timestamps or "prefix" in video_timestamps:
-            skipped += 1
-            continue
+            # Generic skipping logic
+            if not video_timestamps or "prefix" in video_timestamps:
+                skipped += 1
+                continue
 
-        video_filename = sanitize(f"{prefix}{index}") + ".mp4"
+            video_filename = sanitize(f"{prefix}{index}") + ".mp4"
 
-        result = process_fn(index, video_url, video_timestamps, prefix, video_filename)
+            if prefetcher is not None:
+                prefetcher.schedule(get_prefetch_jobs(index))
+                prefetcher.wait(index)
 
-        if result is None:
-            skipped += 1
-        else:
-            if isinstance(result, list):
-                results.extend(result)
-            else:
-                results.append(result)
-            processed += 1
+            start_time_processing = time.time()
+            result = process_fn(index, video_url, video_timestamps, prefix, video_filename)
+            stage_times["process"].append(time.time() - start_time_processing)
 
-        # ETA estimation
-        elapsed = time.time() - start_time_playlist
-        avg_time = elapsed / (processed + skipped) if processed + skipped else 0
-        remaining = total_videos - (processed + skipped)
-        eta = time.strftime("%H:%M:%S", time.gmtime(avg_time * remaining))
-        print(f"ETA: {eta}")
+            if result is None:
+                skipped += 1
+            else:
+                if isinstance(result, list):
+                    results.extend(result)
+                else:
+                    results.append(result)
+                processed += 1
+
+            # ETA estimation
+            elapsed = time.time() - start_time_playlist
+            avg_time = elapsed / (processed + skipped) if processed + skipped else 0
+            remaining = total_videos - (processed + skipped)
+            eta = time.strftime("%H:%M:%S", time.gmtime(avg_time * remaining))
+            print(f"ETA: {eta}")
+    finally:
+        if prefetcher is not None:
+            prefetcher.shutdown()
 
     print(f"Finished processing playlist. Processed {processed} videos, skipped {skipped}.")
+    print_stage_times(time.time() - start_time_playlist)
     return results
 
 
-def process_targets_with(strategy: VideoProcessingStrategy):
+_args = None
+def get_args():
+    """Parse (once) the command line shared by every process_targets_with script"""
+    global _args
+    if _args is not None:
+        return _args
+
+    parser = argparse.ArgumentParser(description="Process video links from targets.json.")
+    parser.add_argument("start_index", type=int, nargs="?", default=1,
+                      help="Starting index for processing (1-based).")
+    parser.add_argument("end_index", type=int, nargs="?",
+                      help="Optional ending index for processing.")
+    parser.add_argument("--combined", action="store_true",
+                      help="Combine clips per video into single compilation")
+    parser.add_argument("--jobs", "-j", type=int, default=RENDER_JOBS,
+                      help="Number of clips to render concurrently (default: RENDER_JOBS from config.json)")
+    parser.add_argument("--engine", choices=["clip", "multi", "numpy"],
+                      help="Render engine: one ffmpeg per clip, one per batch of clips from the same video, "
+                           "or per clip with the overlay drawn in numpy between a decoding and an encoding ffmpeg")
+    parser.add_argument("--debug-script", action="store_true",
+                      help="Also write a runnable .sh of every ffmpeg command, for reproducing renders by hand")
+    parser.add_argument("--chunked", action="store_true",
+                      help="Split clips longer than CHUNK_MIN_SECONDS at keyframes and encode the chunks in parallel")
+    parser.add_argument("--sync", action="store_true",
+                      help="Refetch the playlist and remap targets.json to it now, even if the cached playlist "
+                           "is younger than PLAYLIST_CACHE_TTL_HOURS")
+    parser.add_argument("--prefetch", type=int, default=PREFETCH_DEPTH,
+                      help="Videos to download ahead while the current one renders, 0 to disable "
+                           "(default: PREFETCH_DEPTH from config.json)")
+    _args = parser.parse_args()
+    return _args
+
+
+def process_targets_with(strategy: VideoProcessingStrategy, prefetch_fn: VideoProcessingStrategy = None):
     """
     Execute playlist processing based on global TARGETS configuration.
 
     Args:
         strategy (callable): The specific video processing function to use
             (must match VideoProcessingStrategy signature: fn(index: int, url: str, timestamps: list, prefix: str, filename: str))
+        prefetch_fn (callable, optional): Acquires a video's source ahead of strategy, same signature,
+            returning the bytes it downloaded. Runs --prefetch videos ahead in the background
 
     Returns:
         list: All expected output files from processing
     """
-    parser = argparse.ArgumentParser(description="Process video links from targets.json.")
-    parser.add_argument("start_index", type=int, nargs="?", default=1,
-                      help="Starting index for processing (1-based).")
-    parser.add_argument("end_index", type=int, nargs="?",
-                      help="Optional ending index for processing.")
-    parser.add_argument("--combined", action="store_true",
-                      help="Combine clips per video into single compilation")
-    args = parser.parse_args()
+    args = get_args()
 
     if not callable(strategy):
         raise TypeError("process_playlist_fn must be a callable function")
@@ -639,13 +801,17 @@ def process_targets_with(strategy: VideoProcessingStrategy):
 
 
     if "list" in url:
+        from playlist_sync import sync_targets  # playlist_sync imports common
+        sync_targets(TARGETS, force=args.sync)
         output_files = process_playlist(
             playlist_url=url,
             timestamps=TARGETS,
             process_fn=strategy,
             prefix=prefix,
             start_index=args.start_index,
-            end_index=args.end_index
+            end_index=args.end_index,
+            prefetch_fn=prefetch_fn,
+            prefetch_depth=args.prefetch
         )
         expected_files.extend(output_files)
     else:
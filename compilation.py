@@ -0,0 +1,157 @@
+# compilation.py
+import os
+import subprocess
+
+from common import print_colored, print_err, ColorsEnum
+from encoders import get_video_encoder_args
+from probe import probe_media
+
+# stream fields that have to match for the concat demuxer to join files with -c copy
+CONCAT_STREAM_FIELDS = [
+    "codec_type", "codec_name", "profile", "width", "height", "pix_fmt", "sample_aspect_ratio",
+    "r_frame_rate", "time_base", "sample_rate", "channels", "channel_layout"
+]
+
+
+def get_codec_params(video_path):
+    """Per-stream codec parameters relevant to stream-copy concatenation, or None if it can't be probed"""
+    info = probe_media(video_path, detailed=True)
+    if info is None:
+        return None
+    return [tuple(stream.get(field) for field in CONCAT_STREAM_FIELDS) for stream in info.streams]
+
+
+def clips_share_codec_params(files):
+    reference = None
+    for path in files:
+        params = get_codec_params(path)
+        if not params:
+            print_colored(f"couldn't probe {path}", "compile_clips", ColorsEnum.YELLOW.value)
+            return False
+        if reference is None:
+            reference = params
+        elif params != reference:
+            print_colored(f"{os.path.basename(path)} doesn't match {os.path.basename(files[0])}: {params} vs {reference}",
+                          "compile_clips", ColorsEnum.YELLOW.value)
+            return False
+    return reference is not None
+
+
+def write_concat_list(files, list_path):
+    """Write an ffmpeg concat demuxer list. Paths are absolute so the list can live anywhere."""
+    with open(list_path, 'w') as f:
+        for path in files:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return list_path
+
+
+def concat_copy(files, output_file):
+    """
+    Join files that share codec parameters with the concat demuxer, without re-encoding.
+    Returns True on success.
+    """
+    list_path = f"{output_file}.concat.txt"
+    write_concat_list(files, list_path)
+
+    command = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'concat', '-safe', '0',
+        '-i', list_path,
+        '-map', '0',
+        '-c', 'copy',
+        '-movflags', '+faststart',
+        output_file
+    ]
+    print_colored(f"concatenating {len(files)} files into {os.path.basename(output_file)} (stream copy)",
+                  "concat_copy", ColorsEnum.CYAN.value)
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+    if result.returncode != 0:
+        print_err(f"concat failed for {output_file}: {result.stderr.strip()}", "concat_copy")
+        return False
+    return True
+
+
+def cut_copy(input_file, start_time, duration, output_file):
+    """
+    Cut [start_time, start_time + duration] out of input_file without re-encoding. Only exact when a
+    keyframe sits at start_time (see window_planner.py), otherwise the cut starts at the keyframe before.
+    Returns True on success.
+    """
+    command = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-ss', f"{start_time:.6f}",
+        '-i', input_file,
+        '-t', f"{duration:.6f}",
+        '-map', '0',
+        '-c', 'copy',
+        '-avoid_negative_ts', 'make_zero',
+        '-movflags', '+faststart',
+        output_file
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        print_err(f"cut failed for {output_file}: {result.stderr.strip()}", "cut_copy")
+        return False
+    return True
+
+
+def concat_reencode(files, output_file):
+    """
+    Fallback for clips that can't be stream copied: decode and re-encode everything through the concat
+    filter, normalized to the first clip's size and frame rate.
+    """
+    params = get_codec_params(files[0]) or []
+    video = next((p for p in params if p[0] == "video"), None)
+    with_audio = all(any(p[0] == "audio" for p in (get_codec_params(path) or [])) for path in files)
+
+    input_args = []
+    graph = []
+    concat_inputs = ""
+    for i, path in enumerate(files):
+        input_args += ['-i', path]
+        if video:
+            width, height, frame_rate = video[3], video[4], video[7]
+            graph.append(f"[{i}:v]scale={width}:{height},setsar=1,fps={frame_rate}[v{i}]")
+        else:
+            graph.append(f"[{i}:v]null[v{i}]")
+        concat_inputs += f"[v{i}][{i}:a]" if with_audio else f"[v{i}]"
+
+    audio_out = "[a]" if with_audio else ""
+    graph.append(f"{concat_inputs}concat=n={len(files)}:v=1:a={1 if with_audio else 0}[v]{audio_out}")
+
+    command = [
+        'ffmpeg', '-y', '-v', 'error',
+        *input_args,
+        '-filter_complex', ";".join(graph),
+        '-map', '[v]',
+        *(['-map', '[a]', '-c:a', 'aac'] if with_audio else []),
+        *get_video_encoder_args(),
+        output_file
+    ]
+    print_colored(f"re-encoding {len(files)} clips into {os.path.basename(output_file)}",
+                  "concat_reencode", ColorsEnum.YELLOW.value)
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        print_err(f"re-encode failed for {output_file}: {result.stderr.strip()}", "concat_reencode")
+        return False
+    return True
+
+
+def compile_clips(files, output_file):
+    """
+    Build a compilation from already rendered clips: stream copy when they all share codec
+    parameters (seconds of disk I/O), otherwise fall back to a re-encode.
+    """
+    if not files:
+        return False
+    if clips_share_codec_params(files):
+        if concat_copy(files, output_file):
+            return True
+        print_colored("stream copy failed, falling back to re-encode", "compile_clips", ColorsEnum.YELLOW.value)
+    return concat_reencode(files, output_file)
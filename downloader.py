@@ -0,0 +1,197 @@
+# downloader.py
+# the download stage: fetch a video's source through yt-dlp before clipping it. in "sections" mode only the union
+# of the clip windows ([start - CLIP_BUFFER_SECONDS, start + duration + CLIP_BUFFER_SECONDS], merged) is downloaded,
+# one file per merged window in <source>.sections/, and clips are rendered from whichever section covers them.
+import os
+import re
+import json
+import math
+from typing import NamedTuple
+
+import yt_dlp
+from yt_dlp.utils import download_range_func
+
+from common import config, CLIP_BUFFER_SECONDS, merge_windows, print_colored, print_err, ColorsEnum
+from ytdlp_checker import ensure_ytdlp
+from source_cache import source_cache, get_section_dir
+
+DOWNLOAD_MODE = config.get("DOWNLOAD_MODE", "sections")  # "sections", "full", or "none" (sources placed by hand)
+DOWNLOAD_FORMAT = config.get("DOWNLOAD_FORMAT", "bv*[ext=mp4]+ba[ext=m4a]/b[ext=mp4]/bv*+ba/b")
+SECTION_MERGE_GAP = config.get("SECTION_MERGE_GAP", 30)  # windows closer than this (s) are fetched as one section
+FORCE_KEYFRAMES_AT_CUTS = config.get("FORCE_KEYFRAMES_AT_CUTS", False)  # re-encode cut points; slower, exact
+
+SECTION_FILE_PATTERN = re.compile(r"^(\d+)-(\d+)\.mp4$")
+SOURCE_INFO_FILE = "source.json"  # the source's full duration: yt-dlp cuts the last section short at the end
+
+
+class Section(NamedTuple):
+    start: float  # where the file starts in the source video, seconds; clips seek to (start_time - start)
+    end: float
+    path: str
+
+
+class SourceSections:
+    """The downloaded parts of one source video: a single full file, or section files"""
+
+    def __init__(self, sections, duration=math.inf):
+        self.sections = sorted(sections)
+        self.duration = duration
+        self.downloaded = False  # whether acquire_source had to fetch anything for it
+
+    @classmethod
+    def full(cls, path):
+        return cls([Section(0, math.inf, path)])
+
+    @classmethod
+    def from_dir(cls, section_dir):
+        sections = []
+        duration = math.inf
+        if os.path.isdir(section_dir):
+            for name in os.listdir(section_dir):
+                match = SECTION_FILE_PATTERN.match(name)
+                if match:
+                    sections.append(Section(int(match[1]), int(match[2]), os.path.join(section_dir, name)))
+            try:
+                with open(os.path.join(section_dir, SOURCE_INFO_FILE), 'r') as f:
+                    duration = json.load(f)["duration"] or math.inf
+            except (OSError, KeyError, json.JSONDecodeError):
+                pass
+        return cls(sections, duration)
+
+    def locate(self, start, end):
+        """The section containing [start, end] of the source, or None"""
+        if self.duration != math.inf:
+            end = min(end, math.floor(self.duration))  # section names are whole seconds
+        for section in self.sections:
+            if section.start <= start and end <= section.end:
+                return section
+        return None
+
+    def missing(self, windows):
+        return [window for window in windows if self.locate(*window) is None]
+
+    def paths(self):
+        return [section.path for section in self.sections]
+
+
+def clip_window(start_time, duration):
+    """The part of the source a clip reads, buffer included. start_time in seconds"""
+    return max(0, start_time - CLIP_BUFFER_SECONDS), start_time + duration + CLIP_BUFFER_SECONDS
+
+
+def get_section_windows(windows):
+    """
+    The sections to download for clip windows: rounded out to whole seconds, which is how section files are
+    named (so a name covers at least what was asked for), and merged where close
+    """
+    return merge_windows([(math.floor(start), math.ceil(end)) for start, end in windows], SECTION_MERGE_GAP)
+
+
+def get_download_options(outtmpl, windows=None):
+    options = {
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'format': DOWNLOAD_FORMAT,
+        'merge_output_format': 'mp4',
+        'outtmpl': {'default': outtmpl},
+    }
+    if windows:
+        options['download_ranges'] = download_range_func(None, windows)
+        options['force_keyframes_at_cuts'] = FORCE_KEYFRAMES_AT_CUTS
+    return options
+
+
+def estimate_download_size(info, seconds=None):
+    """Bytes the formats yt-dlp picked will take, for seconds of the video (all of it by default)"""
+    formats = info.get("requested_formats") or [info]
+    duration = info.get("duration") or 0
+    size = sum(f.get("filesize") or f.get("filesize_approx") or 0 for f in formats)
+    if not size:  # no size in the format list: average bitrate (kbit/s) * duration
+        size = sum(f.get("tbr") or 0 for f in formats) * 125 * duration
+    if seconds is not None and duration:
+        size *= min(1.0, seconds / duration)
+    return int(size)
+
+
+def download(video_url, options, source_key, seconds=None):
+    """
+    Download through yt-dlp's API; returns the video's info dict, or None on failure. Resolves the
+    formats first, so room for them can be made in the source cache before anything is written.
+    """
+    try:
+        with yt_dlp.YoutubeDL(options) as ydl:
+            info = ydl.extract_info(video_url, download=False)
+            nbytes = estimate_download_size(info, seconds)
+            if not source_cache.reserve(source_key, nbytes):
+                return None
+            try:
+                return ydl.process_ie_result(info, download=True)
+            finally:
+                source_cache.finish(source_key, nbytes)
+    except yt_dlp.utils.DownloadError as e:
+        print_err(f"download failed for {video_url}: {e}", "downloader")
+        return None
+
+
+def download_full(video_url, video_filepath):
+    print_colored(f"downloading {video_url} to {video_filepath}", "downloader", ColorsEnum.CYAN.value)
+    info = download(video_url, get_download_options(video_filepath), video_filepath)
+    return info is not None and os.path.exists(video_filepath)
+
+
+def download_sections(video_url, video_filepath, windows):
+    """
+    Download each (start, end) window of video_url to <video_filepath's section dir>/<start>-<end>.mp4;
+    windows are whole seconds (see get_section_windows), as the file names can't hold fractions
+    """
+    section_dir = get_section_dir(video_filepath)
+    os.makedirs(section_dir, exist_ok=True)
+    seconds = sum(end - start for start, end in windows)
+    print_colored(f"downloading {len(windows)} sections ({seconds:.0f}s) of {video_url}", "downloader",
+                  ColorsEnum.CYAN.value)
+    outtmpl = os.path.join(section_dir, "%(section_start)d-%(section_end)d.%(ext)s")
+    info = download(video_url, get_download_options(outtmpl, windows), video_filepath, seconds)
+    if info is None:
+        return False
+    with open(os.path.join(section_dir, SOURCE_INFO_FILE), 'w') as f:
+        json.dump({"url": video_url, "duration": info.get("duration")}, f)
+    return True
+
+
+def acquire_source(video_url, video_filepath, clips):
+    """
+    SourceSections covering every clip in clips [(start_time, duration)], downloading what's missing
+    per DOWNLOAD_MODE. A full download already at video_filepath is always used as is. None on failure.
+    Everything but hand-placed sources (DOWNLOAD_MODE "none") goes through the source cache.
+    """
+    if os.path.exists(video_filepath):
+        if DOWNLOAD_MODE != "none":
+            source_cache.hit(video_filepath)
+        return SourceSections.full(video_filepath)
+    if DOWNLOAD_MODE == "none" or not video_url:
+        return None
+
+    ensure_ytdlp()
+    if DOWNLOAD_MODE == "full":
+        if not download_full(video_url, video_filepath):
+            return None
+        sources = SourceSections.full(video_filepath)
+        sources.downloaded = True
+        return sources
+
+    section_dir = get_section_dir(video_filepath)
+    windows = [clip_window(start_time, duration) for start_time, duration in clips]
+    missing = SourceSections.from_dir(section_dir).missing(windows)
+    if missing:
+        download_sections(video_url, video_filepath, get_section_windows(missing))
+    else:
+        source_cache.hit(video_filepath)
+
+    sources = SourceSections.from_dir(section_dir)
+    sources.downloaded = bool(missing)
+    still_missing = sources.missing(windows)
+    if still_missing:
+        print_err(f"{len(still_missing)} clip windows of {video_url} weren't downloaded", "downloader")
+        return None
+    return sources
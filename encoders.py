@@ -0,0 +1,146 @@
+# encoders.py
+import os
+import json
+import shutil
+import socket
+import subprocess
+import threading
+
+from common import config, BIT_RATE, print_colored, print_err, ColorsEnum
+
+ENCODER_CACHE_PATH = config.get("ENCODER_CACHE_PATH", "encoder_cache.json")
+ENCODER = config.get("ENCODER", "auto")      # "auto", or force one of H264_ENCODERS
+ENCODER_SPEED = config.get("ENCODER_SPEED", 6)  # 1 (fastest) .. 7 (best quality), same scale as nvenc's p1..p7
+
+# preference order for "auto": hardware first, then software
+H264_ENCODERS = ["h264_nvenc", "h264_qsv", "h264_amf", "h264_videotoolbox", "libx264", "libopenh264"]
+
+X264_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow"]
+QSV_PRESETS = ["veryfast", "veryfast", "faster", "fast", "medium", "slow", "slower"]
+
+
+def preset_args(encoder, speed=None):
+    """Map the single ENCODER_SPEED setting onto each encoder's own preset vocabulary"""
+    speed = min(max(int(speed or ENCODER_SPEED), 1), 7)
+    match encoder:
+        case "h264_nvenc":
+            return ['-preset', f'p{speed}']
+        case "libx264":
+            return ['-preset', X264_PRESETS[speed - 1]]
+        case "h264_qsv":
+            return ['-preset', QSV_PRESETS[speed - 1]]
+        case "h264_amf":
+            return ['-quality', "speed" if speed <= 2 else "balanced" if speed <= 5 else "quality"]
+        case "h264_videotoolbox":
+            return ['-realtime', '1'] if speed <= 2 else []
+        case _:
+            return []
+
+
+def list_encoders():
+    """Encoder names compiled into this ffmpeg (compiled in != usable, e.g. nvenc on a box without a GPU)"""
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    encoders = []
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        # " V....D libx264              libx264 H.264 / AVC ..."
+        if len(parts) >= 2 and len(parts[0]) == 6 and parts[0][0] == "V":
+            encoders.append(parts[1])
+    return encoders
+
+
+def encoder_works(encoder):
+    """Trial-encode a couple of tiny frames; catches missing drivers/devices that -encoders can't"""
+    command = [
+        'ffmpeg', '-hide_banner', '-v', 'error',
+        '-f', 'lavfi', '-i', 'color=c=black:s=256x256:r=30:d=0.2',
+        '-frames:v', '3',
+        '-c:v', encoder,
+        '-f', 'null', '-'
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30)
+    except subprocess.TimeoutExpired:
+        return False
+    return result.returncode == 0
+
+
+def get_machine_key():
+    # new ffmpeg binary or a different host (shared cache dir) means probing again
+    ffmpeg_path = shutil.which('ffmpeg') or 'ffmpeg'
+    try:
+        ffmpeg_mtime = int(os.path.getmtime(ffmpeg_path))
+    except OSError:
+        ffmpeg_mtime = 0
+    return f"{socket.gethostname()}|{ffmpeg_path}|{ffmpeg_mtime}"
+
+
+def load_encoder_cache():
+    if os.path.exists(ENCODER_CACHE_PATH):
+        try:
+            with open(ENCODER_CACHE_PATH, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            pass
+    return {}
+
+
+def probe_encoders(force=False):
+    """Working H.264 encoders on this machine, best first. Probed once per machine and cached on disk."""
+    key = get_machine_key()
+    cache = load_encoder_cache()
+    if not force and key in cache:
+        return cache[key]
+
+    compiled = set(list_encoders())
+    working = []
+    for encoder in H264_ENCODERS:
+        if encoder not in compiled:
+            continue
+        if encoder_works(encoder):
+            working.append(encoder)
+        else:
+            print_colored(f"{encoder} is compiled in but doesn't work here, skipping", "probe_encoders",
+                          ColorsEnum.YELLOW.value)
+
+    print_colored(f"usable H.264 encoders: {', '.join(working) or 'none'}", "probe_encoders", ColorsEnum.CYAN.value)
+    cache[key] = working
+    with open(ENCODER_CACHE_PATH, 'w') as f:
+        json.dump(cache, f, indent=4)
+    return working
+
+
+_selected_encoder = None
+_select_lock = threading.Lock()
+def get_encoder():
+    """The configured encoder if it works here, else the best available one"""
+    global _selected_encoder
+    with _select_lock:  # render pool workers all ask at once on the first clip
+        if _selected_encoder:
+            return _selected_encoder
+
+        working = probe_encoders()
+        if ENCODER != "auto" and ENCODER in working:
+            _selected_encoder = ENCODER
+        else:
+            if ENCODER != "auto":
+                print_err(f"configured ENCODER {ENCODER} isn't usable here, falling back", "get_encoder")
+            if not working:
+                print_err("no working H.264 encoder found, trying libx264 anyway", "get_encoder")
+            _selected_encoder = working[0] if working else "libx264"
+
+        print_colored(f"encoding with {_selected_encoder} {' '.join(preset_args(_selected_encoder))}",
+                      "get_encoder", ColorsEnum.CYAN.value)
+        return _selected_encoder
+
+
+def get_video_encoder_args(encoder=None, speed=None):
+    """-c:v/-b:v/preset arguments for the selected (or given) encoder"""
+    encoder = encoder or get_encoder()
+    return ['-c:v', encoder, '-b:v', BIT_RATE, *preset_args(encoder, speed)]
+
+
+if __name__ == "__main__":
+    for name in probe_encoders(force=True):
+        print(f"{name}: {' '.join(get_video_encoder_args(name))}")
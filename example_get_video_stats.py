@@ -4,40 +4,32 @@
 
 
 from common import *
-ensure_ytdlp()
+
+video_stats_by_url = {}  # filled for the whole playlist at once in __main__
 
 def get_video_stats(video_url, video_filename):
-    try:
-        print_colored(f"fetching stats for: {video_url}", "processing video", 0, 3)
-
-        # Use yt-dlp to get video metadata as JSON
-        command = [
-            'yt-dlp',
-            '--skip-download',
-            '--print', '%(title)s|||%(view_count)s',
-            '--no-warnings',
-            '--', video_url
-        ]
-
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-        title, view_count = result.stdout.strip().split('|||')
-
-        return {
-            'title': title,
-            'views': view_count,
-            'example_filename': video_filename
-        }
-
-    except Exception as e:
-        print_colored(f"Failed to get info for {video_url}: {str(e)}", "error", 1, 1)
+    info = video_stats_by_url.get(video_url)
+    if info is None or info.title is None:
+        print_colored(f"Failed to get info for {video_url}", "error", 1, 1)
         return None
 
+    print_colored(f"stats for: {video_url}", "processing video", 0, 3)
+    return {
+        'title': info.title,
+        'views': info.view_count,
+        'example_filename': video_filename
+    }
+
 
 def get_video_stats_strategy(index, video_url, video_timestamps, prefix, video_filename):
     return get_video_stats(video_url, video_filename)
 
 
 if __name__ == "__main__":
+    # one concurrent, rate limited batch (see fetch_video_metadata) instead of a yt-dlp run per video
+    playlist_urls = get_playlist_links(TARGETS[0]["url"]) or []
+    for video_url, info in fetch_video_metadata(playlist_urls, with_views=True):
+        video_stats_by_url[video_url] = info
     video_stats = process_targets_with(get_video_stats_strategy)
 
     # Print summary
@@ -46,4 +38,4 @@ if __name__ == "__main__":
         if stats:
             print(f"\nTitle: {stats['title']}")
             print(f"Example filename: {stats['example_filename']}")
-            print(f"Views: {stats['views']}")
\ No newline at end of file
+            print(f"Views: {stats['views']}")
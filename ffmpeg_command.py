@@ -0,0 +1,114 @@
+# ffmpeg_command.py
+# structured ffmpeg commands: argv lists executed directly (no shell), plus filter graph objects that do
+# ffmpeg's own escaping. there are only ffmpeg's levels left to escape for now:
+#   1. drawtext text expansion   ('\' and '%', and ':' inside %{...} arguments)   -> escape_drawtext_text
+#   2. filter option values       ('\', ''', ':')                                   -> escape_option_value
+#   3. the filtergraph itself     ('[],;' etc - we just single-quote option lists)   -> quote_filtergraph
+import os
+import shlex
+
+
+def escape_drawtext_text(text):
+    """Literal text for drawtext's text= (expansion=normal): '\\%' is a literal percent, '\\\\' a backslash"""
+    return str(text).replace('\\', '\\\\').replace('%', '\\%')
+
+
+def escape_option_value(value):
+    return str(value).replace('\\', '\\\\').replace("'", "\\'").replace(':', '\\:')
+
+
+def quote_filtergraph(text):
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+class Filter:
+    """One filter with ordered options, e.g. Filter("drawtext", text=..., x=15)"""
+
+    def __init__(self, name, **options):
+        self.name = name
+        self.options = {key: value for key, value in options.items() if value is not None}
+
+    def __str__(self):
+        if not self.options:
+            return self.name
+        args = ":".join(f"{key}={escape_option_value(value)}" for key, value in self.options.items())
+        return f"{self.name}={quote_filtergraph(args)}"
+
+
+class FilterChain:
+    """Filters applied one after another, with optional [input] and [output] pad labels"""
+
+    def __init__(self, filters, inputs=None, outputs=None):
+        self.filters = list(filters)
+        self.inputs = list(inputs or [])
+        self.outputs = list(outputs or [])
+
+    def __str__(self):
+        body = ",".join(str(f) for f in self.filters) or "null"
+        return "".join(f"[{label}]" for label in self.inputs) + body + "".join(f"[{label}]" for label in self.outputs)
+
+
+class FilterGraph:
+    def __init__(self, chains=None):
+        self.chains = list(chains or [])
+
+    def add(self, chain):
+        self.chains.append(chain)
+        return chain
+
+    def __str__(self):
+        return ";".join(str(chain) for chain in self.chains)
+
+
+class FFmpegCommand:
+    """
+    argv builder: global options, then each input's options + -i, then -filter_complex (if a
+    filter graph is set), then each output's options + path.
+    """
+
+    def __init__(self, binary="ffmpeg"):
+        self.binary = binary
+        self.global_args = []
+        self.inputs = []   # (args, path)
+        self.outputs = []  # (args, path)
+        self.filter_graph = None
+
+    def add_global(self, *args):
+        self.global_args += [str(arg) for arg in args]
+        return self
+
+    def add_input(self, path, *args):
+        self.inputs.append(([str(arg) for arg in args], path))
+        return len(self.inputs) - 1
+
+    def add_output(self, path, *args):
+        self.outputs.append(([str(arg) for arg in args], path))
+        return self
+
+    def argv(self):
+        argv = [self.binary, *self.global_args]
+        for args, path in self.inputs:
+            argv += [*args, '-i', path]
+        if self.filter_graph is not None and self.filter_graph.chains:
+            argv += ['-filter_complex', str(self.filter_graph)]
+        for args, path in self.outputs:
+            argv += [*args, path]
+        return argv
+
+    def to_shell(self):
+        return shlex.join(self.argv())
+
+    def write_script(self, script_path):
+        """Dump an equivalent bash script, for reproducing a render by hand"""
+        # todo: windows compatibility
+        script_dir = os.path.dirname(script_path)
+        if script_dir:
+            os.makedirs(script_dir, exist_ok=True)
+        with open(script_path, 'w') as f:
+            f.write("#!/bin/bash\n")
+            f.write(self.to_shell() + "\n")
+        os.chmod(script_path, 0o755)
+        return script_path
+
+    def __str__(self):
+        return self.to_shell()
@@ -0,0 +1,128 @@
+# manifest.py
+# fingerprints of each clip's full render spec (source, window, overlay, font, encoder settings), stored per
+# project next to the outputs. a clip is re-rendered when its fingerprint changes, instead of being kept just
+# because its file exists.
+import os
+import json
+import atexit
+import hashlib
+import threading
+
+from common import config, OUTPUT_DIR, print_colored, ColorsEnum
+
+MANIFEST_PATH = config.get("MANIFEST_PATH", os.path.join(OUTPUT_DIR, "render_manifest.json"))
+
+# bump when the render itself changes in a way the spec doesn't capture (filter graph, output args)
+RENDER_SPEC_VERSION = 1
+
+
+def fingerprint(spec):
+    """Stable short hash of a JSON-able render spec"""
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+_file_identities = {}
+_identity_lock = threading.Lock()
+def file_identity(path, hash_content=False):
+    """
+    (name, size[, sha1]) of a file, memoized for the run so planning thousands of clips stats each
+    source once. hash_content is for small files like the font, where a same-size edit is plausible.
+    """
+    key = (path, hash_content)
+    with _identity_lock:
+        if key in _file_identities:
+            return _file_identities[key]
+    try:
+        identity = [os.path.basename(path), os.path.getsize(path)]
+        if hash_content:
+            with open(path, 'rb') as f:
+                identity.append(hashlib.sha1(f.read()).hexdigest())
+    except OSError:
+        identity = None
+    with _identity_lock:
+        _file_identities[key] = identity
+    return identity
+
+
+class RenderManifest:
+    """output path -> fingerprint of the spec it was rendered from"""
+
+    def __init__(self, manifest_path=MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+        self.adopted = 0
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    self._entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                print_colored(f"ignoring unreadable {self.manifest_path}", "manifest", ColorsEnum.YELLOW.value)
+
+    def record(self, output_file, clip_fingerprint):
+        with self._lock:
+            self._load()
+            self._entries[output_file] = clip_fingerprint
+            self._dirty = True
+
+    def forget(self, output_file):
+        with self._lock:
+            self._load()
+            if self._entries.pop(output_file, None) is not None:
+                self._dirty = True
+
+    def is_current(self, output_file, clip_fingerprint):
+        """
+        Whether output_file exists and was rendered from this exact spec. Clips rendered before
+        the manifest existed are adopted as current rather than re-rendering a whole project.
+        """
+        if not os.path.exists(output_file):
+            return False
+        with self._lock:
+            self._load()
+            recorded = self._entries.get(output_file)
+            if recorded is None:
+                self._entries[output_file] = clip_fingerprint
+                self._dirty = True
+                self.adopted += 1
+                return True
+            return recorded == clip_fingerprint
+
+    def move_folders(self, moves):
+        """
+        Rekey the entries of clips moved to another output folder, {old folder: new folder}, all at once so
+        folders can trade places. Entries of a folder moved to None are forgotten.
+        """
+        with self._lock:
+            self._load()
+            entries = {}
+            for output_file, clip_fingerprint in self._entries.items():
+                folder = os.path.dirname(output_file)
+                if folder not in moves:
+                    entries.setdefault(output_file, clip_fingerprint)
+                elif moves[folder] is not None:
+                    entries[os.path.join(moves[folder], os.path.basename(output_file))] = clip_fingerprint
+            if entries != self._entries:
+                self._entries = entries
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+            tmp_path = self.manifest_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.manifest_path)
+            self._dirty = False
+
+
+manifest = RenderManifest()
+atexit.register(manifest.save)
@@ -0,0 +1,109 @@
+# metadata_store.py
+# titles, playlist link lists and the like, persisted in one sqlite database (WAL mode) instead of cache.json.
+# entries are (namespace, key) -> json value, written one upsert at a time as they're fetched, so a new title
+# costs one small transaction rather than rewriting every cached title. each thread gets its own connection,
+# and sqlite's locking keeps concurrent threads (GUI fetch threads) and processes (tatoclip + GUI) consistent.
+import os
+import json
+import time
+import sqlite3
+import threading
+
+BUSY_TIMEOUT_MS = 10000  # how long a write waits for another process's transaction before failing
+
+TITLES = "titles"        # video id -> title
+PLAYLISTS = "playlists"  # playlist url -> [video url]
+DURATIONS = "durations"  # video id -> seconds
+META = "meta"            # the store's own bookkeeping (imported json files)
+
+
+class MetadataStore:
+    """Namespaced key -> json value store; safe to share between threads"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                         "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated REAL NOT NULL, "
+                         "PRIMARY KEY (namespace, key))")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; a crash loses at most the last writes
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key, default=None):
+        row = self._connect().execute("SELECT value FROM entries WHERE namespace = ? AND key = ?",
+                                      (namespace, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def get_updated(self, namespace, key):
+        """(value, unix time it was last written), or (None, None)"""
+        row = self._connect().execute("SELECT value, updated FROM entries WHERE namespace = ? AND key = ?",
+                                      (namespace, key)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, None)
+
+    def get_many(self, namespace, keys):
+        """{key: value} for the keys that are present"""
+        keys = list(keys)
+        found = {}
+        conn = self._connect()
+        for i in range(0, len(keys), 500):  # stay under sqlite's bound parameter limit
+            batch = keys[i:i + 500]
+            rows = conn.execute(f"SELECT key, value FROM entries WHERE namespace = ? AND key IN "
+                                f"({','.join('?' * len(batch))})", (namespace, *batch))
+            found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def contains(self, namespace, key):
+        return self._connect().execute("SELECT 1 FROM entries WHERE namespace = ? AND key = ?",
+                                       (namespace, key)).fetchone() is not None
+
+    def put(self, namespace, key, value):
+        self.put_many(namespace, {key: value})
+
+    def put_many(self, namespace, items):
+        """Upsert {key: value} in one transaction"""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT INTO entries (namespace, key, value, updated) VALUES (?, ?, ?, ?) "
+                             "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, "
+                             "updated = excluded.updated",
+                             [(namespace, key, json.dumps(value), now) for key, value in items.items()])
+
+    def delete(self, namespace, key):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def count(self, namespace):
+        return self._connect().execute("SELECT COUNT(*) FROM entries WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    def import_cache_json(self, json_path):
+        """
+        One-time import of a legacy cache.json (video id -> title, playlist url -> [video url]); the file
+        is renamed to <json_path>.imported afterwards. Entries already in the store win. Returns the count imported.
+        """
+        if not os.path.exists(json_path) or self.contains(META, f"imported:{os.path.abspath(json_path)}"):
+            return 0
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        titles = {key: value for key, value in data.items() if isinstance(value, str)}
+        playlists = {key: value for key, value in data.items() if isinstance(value, list)}
+        existing_titles = self.get_many(TITLES, titles)
+        existing_playlists = self.get_many(PLAYLISTS, playlists)
+        titles = {key: value for key, value in titles.items() if key not in existing_titles}
+        playlists = {key: value for key, value in playlists.items() if key not in existing_playlists}
+        self.put_many(TITLES, titles)
+        self.put_many(PLAYLISTS, playlists)
+        self.put(META, f"imported:{os.path.abspath(json_path)}", {"titles": len(titles), "playlists": len(playlists)})
+        os.replace(json_path, json_path + ".imported")
+        print(f"imported {len(titles)} titles and {len(playlists)} playlists from {json_path} into {self.db_path}")
+        return len(titles) + len(playlists)
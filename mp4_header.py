@@ -0,0 +1,223 @@
+# mp4_header.py
+# reads dimensions, frame rate, duration and codecs straight out of an mp4/mov's moov box (mvhd, mdhd, hdlr, stsd,
+# stts) through mmap, so the common case doesn't pay for an ffprobe spawn. width/height come from the sample
+# description rather than tkhd, since tkhd holds the display size and ffprobe reports the coded one. anything
+# unusual (fragmented files, variable frame rate, no moov) returns None and probe.py falls back to ffprobe.
+import mmap
+import struct
+from fractions import Fraction
+
+MP4_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+# sample entry fourcc -> ffprobe codec_name
+CODEC_NAMES = {
+    b"avc1": "h264", b"avc3": "h264",
+    b"hvc1": "hevc", b"hev1": "hevc",
+    b"av01": "av1", b"vp09": "vp9",
+    b"mp4v": "mpeg4", b"jpeg": "mjpeg",
+    b"mp4a": "aac", b"Opus": "opus", b"ac-3": "ac3", b"ec-3": "eac3", b"fLaC": "flac", b".mp3": "mp3",
+}
+
+
+class Mp4ParseError(Exception):
+    pass
+
+
+def iter_boxes(buf, start, end):
+    """(type, payload_start, box_end) for each box in buf[start:end]"""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise Mp4ParseError("truncated largesize box")
+            size, = struct.unpack_from(">Q", buf, pos + 8)
+            header = 16
+        elif size == 0:
+            size = end - pos  # extends to the end of the file
+        if size < header or pos + size > end:
+            raise Mp4ParseError(f"bad {box_type!r} box size {size} at {pos}")
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def find_box(buf, start, end, box_type):
+    for found_type, payload, box_end in iter_boxes(buf, start, end):
+        if found_type == box_type:
+            return payload, box_end
+    return None
+
+
+def read_full_box_times(buf, payload):
+    """(timescale, duration) from an mvhd/mdhd payload, version 0 or 1"""
+    version = buf[payload]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", buf, payload + 4 + 16)
+    else:
+        timescale, duration = struct.unpack_from(">II", buf, payload + 4 + 8)
+    return timescale, duration
+
+
+def read_stts_rate(buf, payload, timescale):
+    """Constant frame rate as a Fraction, or None for variable frame rate"""
+    entry_count, = struct.unpack_from(">I", buf, payload + 4)
+    deltas = [struct.unpack_from(">II", buf, payload + 8 + i * 8) for i in range(entry_count)]
+    # muxers commonly give the final sample its own delta; anything beyond that is real VFR
+    if not deltas or any(delta != deltas[0][1] for _, delta in deltas[:-1]):
+        return None
+    if len(deltas) > 1 and deltas[-1][0] > 1:
+        return None
+    delta = deltas[0][1]
+    if not delta or not timescale:
+        return None
+    return Fraction(timescale, delta)
+
+
+def read_track(buf, start, end):
+    """Stream dict (ffprobe field names) for one trak box, or None for tracks we don't care about"""
+    mdia = find_box(buf, start, end, b"mdia")
+    if mdia is None:
+        return None
+    mdhd = find_box(buf, *mdia, b"mdhd")
+    hdlr = find_box(buf, *mdia, b"hdlr")
+    minf = find_box(buf, *mdia, b"minf")
+    if mdhd is None or hdlr is None or minf is None:
+        return None
+    stbl = find_box(buf, *minf, b"stbl")
+    stsd = find_box(buf, *stbl, b"stsd") if stbl else None
+    if stsd is None:
+        return None
+
+    timescale, _ = read_full_box_times(buf, mdhd[0])
+    handler = bytes(buf[hdlr[0] + 8:hdlr[0] + 12])
+    entry = stsd[0] + 8  # fullbox header + entry_count, then the first sample entry
+    fourcc = bytes(buf[entry + 4:entry + 8])
+    codec_name = CODEC_NAMES.get(fourcc, fourcc.decode("latin-1").strip())
+
+    if handler == b"vide":
+        width, height = struct.unpack_from(">HH", buf, entry + 8 + 24)
+        stts = find_box(buf, *stbl, b"stts")
+        rate = read_stts_rate(buf, stts[0], timescale) if stts else None
+        if rate is None:
+            raise Mp4ParseError("variable or missing frame rate")
+        return {
+            "codec_type": "video", "codec_name": codec_name, "width": width, "height": height,
+            "r_frame_rate": f"{rate.numerator}/{rate.denominator}", "time_base": f"1/{timescale}"
+        }
+    if handler == b"soun":
+        if struct.unpack_from(">H", buf, entry + 16)[0] != 0:
+            raise Mp4ParseError("quicktime v1/v2 sound description")  # rate lives elsewhere
+        channels, = struct.unpack_from(">H", buf, entry + 8 + 16)
+        sample_rate, = struct.unpack_from(">I", buf, entry + 8 + 24)
+        return {
+            "codec_type": "audio", "codec_name": codec_name, "sample_rate": str(sample_rate >> 16),
+            "channels": channels, "time_base": f"1/{timescale}"
+        }
+    return None
+
+
+def read_sample_times(buf, stts_payload, sample_numbers):
+    """Decode times (timescale units) of the given 1-based sample numbers, ascending, from an stts payload"""
+    entry_count, = struct.unpack_from(">I", buf, stts_payload + 4)
+    times = []
+    wanted = iter(sample_numbers)
+    sample = next(wanted, None)
+    first_sample, time = 1, 0
+    for i in range(entry_count):
+        count, delta = struct.unpack_from(">II", buf, stts_payload + 8 + i * 8)
+        while sample is not None and sample < first_sample + count:
+            times.append(time + (sample - first_sample) * delta)
+            sample = next(wanted, None)
+        first_sample += count
+        time += count * delta
+    return times
+
+
+def read_keyframe_times(buf):
+    """
+    Keyframe times (seconds) of the first video track from its sync sample table. These are decode times:
+    with B-frames, presentation runs a constant few frames later, which the edit list usually cancels out.
+    A track without stss has every sample as a keyframe, which we don't index (returns None).
+    """
+    moov = find_box(buf, 0, len(buf), b"moov")
+    if moov is None:
+        raise Mp4ParseError("no moov box")
+    for box_type, payload, box_end in iter_boxes(buf, *moov):
+        if box_type != b"trak":
+            continue
+        mdia = find_box(buf, payload, box_end, b"mdia")
+        hdlr = find_box(buf, *mdia, b"hdlr") if mdia else None
+        if hdlr is None or bytes(buf[hdlr[0] + 8:hdlr[0] + 12]) != b"vide":
+            continue
+        timescale, _ = read_full_box_times(buf, find_box(buf, *mdia, b"mdhd")[0])
+        stbl = find_box(buf, *find_box(buf, *mdia, b"minf"), b"stbl")
+        stss = find_box(buf, *stbl, b"stss")
+        stts = find_box(buf, *stbl, b"stts")
+        if stss is None or stts is None or not timescale:
+            return None
+        entry_count, = struct.unpack_from(">I", buf, stss[0] + 4)
+        sample_numbers = struct.unpack_from(f">{entry_count}I", buf, stss[0] + 8)
+        return [time / timescale for time in read_sample_times(buf, stts[0], sample_numbers)]
+    raise Mp4ParseError("no video track")
+
+
+def parse_mp4_header(buf):
+    """(duration seconds, [stream dicts]) from a whole-file buffer"""
+    moov = find_box(buf, 0, len(buf), b"moov")
+    if moov is None:
+        raise Mp4ParseError("no moov box")
+    mvhd = find_box(buf, *moov, b"mvhd")
+    if mvhd is None:
+        raise Mp4ParseError("no mvhd box")
+    if find_box(buf, *moov, b"mvex") is not None:
+        raise Mp4ParseError("fragmented mp4")
+
+    timescale, duration = read_full_box_times(buf, mvhd[0])
+    if not timescale or not duration:
+        raise Mp4ParseError("no movie duration")
+
+    streams = []
+    for box_type, payload, box_end in iter_boxes(buf, *moov):
+        if box_type == b"trak":
+            stream = read_track(buf, payload, box_end)
+            if stream:
+                streams.append(stream)
+    return duration / timescale, streams
+
+
+def read_mp4_info(video_path):
+    """
+    ffprobe-shaped (format, streams) for an mp4/mov, or None if it isn't one we can read
+    without ffprobe. format has duration, bit_rate and format_name like ffprobe's -show_format.
+    """
+    if not video_path.lower().endswith(MP4_EXTENSIONS):
+        return None
+    try:
+        with open(video_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            duration, streams = parse_mp4_header(buf)
+            file_size = len(buf)
+    except (OSError, ValueError, struct.error, IndexError, Mp4ParseError):
+        return None  # ValueError: empty file can't be mapped
+
+    if not any(stream["codec_type"] == "video" for stream in streams):
+        return None
+    media_format = {
+        "duration": duration,
+        "bit_rate": int(file_size * 8 / duration),
+        "format_name": "mov,mp4,m4a,3gp,3g2,mj2"
+    }
+    return media_format, streams
+
+
+def read_mp4_keyframes(video_path):
+    """Keyframe times of an mp4/mov's video track in seconds, or None if they can't be read without ffprobe"""
+    if not video_path.lower().endswith(MP4_EXTENSIONS):
+        return None
+    try:
+        with open(video_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if find_box(buf, 0, len(buf), b"moof") is not None:
+                return None  # fragmented: sync samples live in the fragments
+            return read_keyframe_times(buf)
+    except (OSError, ValueError, struct.error, IndexError, TypeError, Mp4ParseError):
+        return None
@@ -0,0 +1,294 @@
+# numpy_overlay.py
+# the "numpy" render engine: one ffmpeg decodes the clip to raw yuv420p frames on a pipe, the timestamp and series
+# text are composited onto a small region of each frame here, and a second ffmpeg encodes the result. glyphs are
+# rendered once per font size by ffmpeg's own drawtext (so they look the same), the border and shadow are built
+# from them with numpy, and the composited text layer is only rebuilt when the text changes - once a second, and
+# then only the characters that changed are redrawn into it. the overlay is white over black, so chroma just
+# blends towards neutral and no rgb conversion is needed either way.
+import subprocess
+import threading
+
+import numpy as np
+
+from common import print_err
+from ffmpeg_command import Filter, FilterChain, escape_drawtext_text
+from progress import FFmpegProgressReader, FFmpegResult
+
+DIGITS = "0123456789:"
+BAR = "|"  # brackets every atlas row: gives all rows the same baseline, and marks where each token starts and ends
+INK = 0.5  # coverage counted as ink when measuring the bars
+
+# drawtext's white and black on limited range video
+FILL_LUMA = 235
+BORDER_LUMA = 16
+NEUTRAL_CHROMA = 128
+
+
+def render_masks(font_path, font_size, tokens):
+    """
+    {token: coverage mask (row height x advance, 0..1)} for each token, rendered in one ffmpeg drawtext pass
+    as rows of |token| on black. The bars' positions give each token's advance.
+    """
+    row_height = font_size * 2
+    pad = font_size
+    rows = [BAR * 2] + [f"{BAR}{token}{BAR}" for token in tokens]
+    width = pad * 2 + font_size * 2 * max(len(row) for row in rows)
+    height = row_height * len(rows)
+
+    filters = [Filter("format", pix_fmts="rgb24")]
+    for i, row in enumerate(rows):
+        filters.append(Filter("drawtext", text=escape_drawtext_text(row), fontfile=font_path, fontsize=font_size,
+                              fontcolor="white", x=pad, y=i * row_height + font_size // 2))
+    command = [
+        'ffmpeg', '-v', 'error',
+        '-f', 'lavfi', '-i', f"color=c=black:s={width}x{height}",
+        '-frames:v', '1',
+        '-vf', str(FilterChain(filters)),
+        '-pix_fmt', 'gray', '-f', 'rawvideo', 'pipe:1'
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0 or len(result.stdout) != width * height:
+        raise RuntimeError(f"couldn't render glyphs: {result.stderr.decode(errors='replace').strip()}")
+    image = np.frombuffer(result.stdout, np.uint8).reshape(len(rows), row_height, width).astype(np.float32) / 255
+
+    bar_columns = np.flatnonzero(image[0].max(axis=0) > INK)
+    gap = np.flatnonzero(np.diff(bar_columns) > 1)[0]
+    bar_width = gap + 1
+    bar_advance = bar_columns[gap + 1] - bar_columns[0]
+
+    masks = {}
+    for token, row in zip(tokens, image[1:]):
+        columns = np.flatnonzero(row.max(axis=0) > INK)
+        start = columns[0] + bar_advance
+        advance = (columns[-1] - bar_width + 1) - start
+        masks[token] = row[:, start:start + advance].copy()
+    return masks
+
+
+class GlyphAtlas:
+    """Masks of every token drawn so far at one font size; digits up front, other tokens rendered on first use"""
+
+    def __init__(self, font_path, font_size):
+        self.font_path = font_path
+        self.font_size = font_size
+        self._masks = render_masks(font_path, font_size, list(DIGITS))
+
+    def get(self, tokens):
+        missing = [token for token in dict.fromkeys(tokens) if token not in self._masks]
+        if missing:
+            self._masks.update(render_masks(self.font_path, self.font_size, missing))
+        return [self._masks[token] for token in tokens]
+
+
+_atlases = {}
+_atlas_lock = threading.Lock()
+def get_atlas(font_path, font_size):
+    """One GlyphAtlas per font and size for the whole run, shared by render pool workers"""
+    with _atlas_lock:
+        key = (font_path, font_size)
+        if key not in _atlases:
+            _atlases[key] = GlyphAtlas(font_path, font_size)
+        return _atlases[key]
+
+
+def dilate(mask, radius):
+    """Max over a disc of radius pixels: the border drawtext strokes around each glyph"""
+    if radius <= 0:
+        return mask
+    padded = np.pad(mask, radius)
+    out = np.zeros_like(mask)
+    height, width = mask.shape
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if dx * dx + dy * dy <= radius * radius:
+                np.maximum(out, padded[radius + dy:radius + dy + height, radius + dx:radius + dx + width], out=out)
+    return out
+
+
+def shift(mask, dx, dy):
+    out = np.zeros_like(mask)
+    height, width = mask.shape
+    out[max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)] = \
+        mask[max(-dy, 0):height - max(dy, 0), max(-dx, 0):width - max(dx, 0)]
+    return out
+
+
+class TextLayer:
+    """
+    One line of text at (x, vertically centred on y) like drawtext's x=x:y=y-text_h/2, with border and
+    shadow, ready to blend: alpha and premultiplied luma over the region, and alpha at chroma resolution.
+    """
+
+    def __init__(self, atlas, x, y, borderw=0, shadowx=0, shadowy=0):
+        self.atlas = atlas
+        self.x, self.y = x, y
+        self.borderw, self.shadowx, self.shadowy = borderw, shadowx, shadowy
+        self.margin = borderw + max(abs(shadowx), abs(shadowy))
+        self.tokens = None
+        self.widths = None
+        self.line = None  # fill coverage of the whole line, row height x total advance
+        self.redrawn = 0  # characters redrawn, as opposed to kept from the previous text
+
+    def set_tokens(self, tokens):
+        """Lay out tokens, redrawing only the ones that changed when the layout allows. Returns whether anything did"""
+        if tokens == self.tokens:
+            return False
+        masks = self.atlas.get(tokens)
+        widths = [mask.shape[1] for mask in masks]
+        if widths != self.widths:
+            self.line = np.concatenate(masks, axis=1)
+            self.redrawn += len(tokens)
+        else:
+            x = 0
+            for token, old, mask, width in zip(tokens, self.tokens, masks, widths):
+                if token != old:
+                    self.line[:, x:x + width] = mask
+                    self.redrawn += 1
+                x += width
+        self.tokens, self.widths = list(tokens), widths
+        self._build()
+        return True
+
+    def _build(self):
+        ink_rows = np.flatnonzero(self.line.max(axis=1) > 0)
+        top, bottom = (ink_rows[0], ink_rows[-1] + 1) if len(ink_rows) else (0, 1)
+        fill = np.pad(self.line[top:bottom], self.margin)
+
+        # region origin on even coordinates, so it maps onto whole chroma samples
+        left = self.x - self.margin
+        upper = self.y - (bottom - top) // 2 - self.margin
+        self.left, self.upper = left - left % 2, upper - upper % 2
+        fill = np.pad(fill, ((upper % 2, 0), (left % 2, 0)))
+        fill = np.pad(fill, ((0, fill.shape[0] % 2), (0, fill.shape[1] % 2)))
+
+        border = dilate(fill, self.borderw)
+        shadow = shift(border, self.shadowx, self.shadowy) if self.shadowx or self.shadowy else np.zeros_like(fill)
+        dark = 1 - (1 - shadow) * (1 - border)  # shadow, then border, both black
+        self.alpha = fill + dark * (1 - fill)  # then the white fill over them
+        self.luma = fill * FILL_LUMA + dark * (1 - fill) * BORDER_LUMA
+        height, width = self.alpha.shape
+        self.chroma_alpha = self.alpha.reshape(height // 2, 2, width // 2, 2).mean(axis=(1, 3))
+
+    def composite(self, y_plane, u_plane, v_plane):
+        """Blend onto one yuv420p frame in place, clipped to the frame"""
+        frame_height, frame_width = y_plane.shape
+        height, width = self.alpha.shape
+        top, left = max(self.upper, 0), max(self.left, 0)
+        bottom, right = min(self.upper + height, frame_height), min(self.left + width, frame_width)
+        if top >= bottom or left >= right:
+            return
+        rows = slice(top - self.upper, bottom - self.upper)
+        columns = slice(left - self.left, right - self.left)
+        region = y_plane[top:bottom, left:right]
+        region[:] = region * (1 - self.alpha[rows, columns]) + self.luma[rows, columns]
+
+        chroma_rows = slice(rows.start // 2, (rows.stop + 1) // 2)
+        chroma_columns = slice(columns.start // 2, (columns.stop + 1) // 2)
+        chroma_alpha = self.chroma_alpha[chroma_rows, chroma_columns]
+        for plane in (u_plane, v_plane):
+            region = plane[top // 2:top // 2 + chroma_alpha.shape[0], left // 2:left // 2 + chroma_alpha.shape[1]]
+            region[:] = region * (1 - chroma_alpha[:region.shape[0], :region.shape[1]]) + \
+                NEUTRAL_CHROMA * chroma_alpha[:region.shape[0], :region.shape[1]]
+
+
+def format_source_time(seconds):
+    """What drawtext's %{pts:gmtime:...} shows with our formats: M:SS under an hour, H:MM:SS from then on"""
+    seconds = int(seconds)
+    hours, minutes, seconds = seconds // 3600, seconds // 60 % 60, seconds % 60
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class TimestampOverlay:
+    """
+    The drawtext overlay of build_timestamp_filters, drawn with numpy: optional series text, then
+    "<prefix> <time>", either counting source time from start_time (updating) or a fixed label (static).
+    :param layout: TIMESTAMP_ARGS scaled to the source resolution (see tatoclip.get_timestamp_layout)
+    """
+
+    def __init__(self, font_path, layout, prefix, start_time, frame_rate, series_text=None, static_text=None):
+        self.prefix_token = f"{prefix} "
+        self.start_time = start_time
+        self.frame_rate = frame_rate
+        self.static_text = static_text
+        effects = dict(borderw=layout["borderw"], shadowx=layout["shadowx"], shadowy=layout["shadowy"])
+
+        self.series = None
+        if series_text:
+            self.series = TextLayer(get_atlas(font_path, layout["series_font_size"]), layout["x_offset"],
+                                    layout["series_y_offset"], **effects)
+            self.series.set_tokens([series_text])
+        self.timestamp = TextLayer(get_atlas(font_path, layout["font_size"]), layout["x_offset"], layout["y_offset"],
+                                   **effects)
+
+    def draw(self, n, y_plane, u_plane, v_plane):
+        if self.static_text is not None:
+            self.timestamp.set_tokens([self.static_text])
+        else:
+            time_text = format_source_time(self.start_time + n / self.frame_rate)
+            self.timestamp.set_tokens([self.prefix_token, *time_text])
+        if self.series is not None:
+            self.series.composite(y_plane, u_plane, v_plane)  # drawn under the timestamp
+        self.timestamp.composite(y_plane, u_plane, v_plane)
+
+
+def read_frame(stream, view):
+    """Fill view from stream; False at end of stream"""
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            return False
+        filled += count
+    return True
+
+
+def run_overlay_pipeline(decoder_argv, encoder_argv, width, height, overlay, frame_count, on_progress):
+    """
+    Pipe yuv420p frames from the decoder ffmpeg (rawvideo on stdout) through overlay.draw into the
+    encoder ffmpeg (rawvideo on stdin). Returns an FFmpegResult with the encoder's progress, failed if
+    either process did.
+    """
+    encoder_argv = [encoder_argv[0], '-progress', 'pipe:1', '-nostats', *encoder_argv[1:]]
+    encoder = subprocess.Popen(encoder_argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True, bufsize=1)
+    reader = FFmpegProgressReader(encoder)  # keeps the encoder's stdout/stderr drained
+    decoder = subprocess.Popen(decoder_argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    frame = np.empty(width * height * 3 // 2, np.uint8)
+    y_plane = frame[:width * height].reshape(height, width)
+    u_plane = frame[width * height:width * height * 5 // 4].reshape(height // 2, width // 2)
+    v_plane = frame[width * height * 5 // 4:].reshape(height // 2, width // 2)
+    view = memoryview(frame)
+    report_every = max(1, int(overlay.frame_rate))
+
+    n = 0
+    try:
+        while read_frame(decoder.stdout, view):
+            overlay.draw(n, y_plane, u_plane, v_plane)
+            encoder.stdin.buffer.write(view)
+            n += 1
+            if n % report_every == 0 and frame_count:
+                on_progress(min(n / frame_count, 1))
+    except BrokenPipeError:
+        pass  # the encoder died; its exit status says why
+    finally:
+        try:
+            encoder.stdin.close()
+        except BrokenPipeError:
+            pass
+        decoder.stdout.close()
+        decoder_error = decoder.stderr.read().decode(errors="replace").strip()
+        decoder_returncode = decoder.wait()
+
+    last_event = None
+    for event in reader.events():
+        last_event = event
+    returncode = encoder.wait()
+    stderr_tail = reader.stderr_tail()
+    if decoder_returncode != 0:
+        print_err(f"decoder exited with {decoder_returncode}: {decoder_error}", "numpy_overlay")
+        returncode = returncode or decoder_returncode
+        stderr_tail = f"{decoder_error}\n{stderr_tail}"
+    return FFmpegResult(returncode, last_event, stderr_tail)
@@ -0,0 +1,248 @@
+# playlist_sync.py
+# targets.json lines timestamps up with playlist positions, so one video added or removed upstream used to shift
+# every later entry onto the wrong video. targets.json now remembers the video ids it was written against
+# (meta "video_ids"); a sync fetches the playlist, diffs it by id, and moves each video's timestamps, alias,
+# offset skip, downloaded source and rendered clips to its new position. videos inserted in front of existing
+# ones are skipped (offsets), so part numbers don't change; videos appended at the end are new parts as usual.
+# timestamps of removed videos are kept under meta "removed". routine runs diff against the cached playlist
+# instead of fetching while it's younger than PLAYLIST_CACHE_TTL_HOURS.
+import os
+import json
+import time
+import bisect
+import shutil
+from typing import NamedTuple
+
+from common import metadata, OUTPUT_DIR, PLAYLISTS, PLAYLIST_CACHE_TTL_HOURS, extract_video_id, \
+    get_playlist_links_untrusted, sanitize, print_colored, print_err, ColorsEnum
+from manifest import manifest
+from source_cache import source_cache
+
+TARGETS_PATH = "targets.json"
+
+
+class PlaylistDiff(NamedTuple):
+    moves: dict     # old index -> new index (1-based) of every video in both
+    inserted: list  # new indices of videos that weren't in the old playlist
+    removed: list   # old indices of videos that aren't in the new one
+    reordered: list  # old indices of videos that moved relative to the others, not just shifted
+
+    @property
+    def changed(self):
+        return bool(self.inserted or self.removed or any(old != new for old, new in self.moves.items()))
+
+
+def longest_increasing(values):
+    """Indices into values of one longest strictly increasing subsequence"""
+    tails, tail_at, parents = [], [], [None] * len(values)
+    for i, value in enumerate(values):
+        position = bisect.bisect_left(tails, value)
+        if position == len(tails):
+            tails.append(value)
+            tail_at.append(i)
+        else:
+            tails[position] = value
+            tail_at[position] = i
+        parents[i] = tail_at[position - 1] if position else None
+    kept = []
+    i = tail_at[-1] if tail_at else None
+    while i is not None:
+        kept.append(i)
+        i = parents[i]
+    return kept[::-1]
+
+
+def diff_playlists(old_ids, new_ids):
+    """PlaylistDiff between two lists of video ids. A video listed twice is matched in order"""
+    new_positions = {}
+    for index, video_id in enumerate(new_ids, 1):
+        new_positions.setdefault(video_id, []).append(index)
+    moves = {}
+    removed = []
+    for index, video_id in enumerate(old_ids, 1):
+        positions = new_positions.get(video_id)
+        if positions:
+            moves[index] = positions.pop(0)
+        else:
+            removed.append(index)
+    matched = set(moves.values())
+    inserted = [index for index in range(1, len(new_ids) + 1) if index not in matched]
+
+    old_order = sorted(moves)
+    in_order = {old_order[i] for i in longest_increasing([moves[old] for old in old_order])}
+    reordered = [old for old in old_order if old not in in_order]
+    return PlaylistDiff(moves, inserted, removed, reordered)
+
+
+def get_skipped(offsets):
+    """The raw indices offsets {effective threshold: count} skip (see metadata_handler.get_effective_index)"""
+    skipped = []
+    for threshold, count in sorted((int(k), int(v)) for k, v in offsets.items()):
+        start = threshold + len(skipped)
+        skipped.extend(range(start, start + count))
+    return skipped
+
+
+def build_offsets(skipped):
+    """offsets {effective threshold: count} skipping exactly the raw indices in skipped"""
+    offsets = {}
+    before = 0
+    run_start = None
+    previous = None
+    for raw_index in sorted(set(skipped)):
+        if run_start is None or raw_index != previous + 1:
+            run_start = raw_index - before
+            offsets[str(run_start)] = 0
+        offsets[str(run_start)] += 1
+        before += 1
+        previous = raw_index
+    return offsets
+
+
+def get_source_path(prefix, index):
+    return os.path.join(OUTPUT_DIR, sanitize(f"{prefix}{index}") + ".mp4")
+
+
+def get_output_folder(prefix, index):
+    """Where the clips of video index are rendered, as tatoclip.clip_video names it"""
+    return os.path.join(OUTPUT_DIR, sanitize(f"{prefix}{index}")).lower()
+
+
+def move_sources(prefix, diff):
+    """
+    Move downloaded sources (full file and section dir) and rendered clip folders from their old index to their
+    new one, through temporary names, and rekey the manifest to match. Removed videos' sources and clips are
+    deleted, so no other video picks them up at that index. Returns the number of videos moved.
+    """
+    moved = {old: new for old, new in diff.moves.items() if old != new}
+    staged = []
+    for old, new in moved.items():
+        source = get_source_path(prefix, old)
+        temporary = f"{source[:-4]}.sync.mp4"
+        source_cache.rename(source, temporary)
+        folder = get_output_folder(prefix, old)
+        if os.path.isdir(folder):
+            os.replace(folder, f"{folder}.sync")
+        staged.append((temporary, f"{folder}.sync", new))
+    for old in diff.removed:
+        source_cache.remove(get_source_path(prefix, old))
+        shutil.rmtree(get_output_folder(prefix, old), ignore_errors=True)
+    for temporary, temporary_folder, new in staged:
+        source_cache.rename(temporary, get_source_path(prefix, new))
+        folder = get_output_folder(prefix, new)
+        shutil.rmtree(folder, ignore_errors=True)  # an inserted index's leftover clips
+        if os.path.isdir(temporary_folder):
+            os.replace(temporary_folder, folder)
+
+    # manifest keys are named like get_clip_output_file names clips
+    folder_moves = {get_output_folder(prefix, old).replace(" ", "_"): get_output_folder(prefix, new).replace(" ", "_")
+                    for old, new in moved.items()}
+    folder_moves.update({get_output_folder(prefix, old).replace(" ", "_"): None for old in diff.removed})
+    if folder_moves:
+        manifest.move_folders(folder_moves)
+        manifest.save()
+    source_cache.save()
+    return len(moved)
+
+
+def remap_targets(targets, diff, new_ids, old_ids):
+    """Apply a PlaylistDiff to targets ([meta, timestamps per raw index...]) in place"""
+    meta = targets[0]
+    entries = targets[1:]
+    remapped = [{} for _ in range(len(new_ids))]
+    removed = meta.get("removed", {})
+    for old, entry in enumerate(entries, 1):
+        if not entry:
+            continue
+        if old in diff.moves:
+            remapped[diff.moves[old] - 1] = entry
+        elif old <= len(old_ids):
+            removed[old_ids[old - 1]] = entry
+        else:  # past the end of the old playlist: nothing to match it by, keep it where it was
+            remapped.extend({} for _ in range(old - len(remapped)))
+            if not remapped[old - 1]:
+                remapped[old - 1] = entry
+            else:
+                removed[f"index {old}"] = entry
+                print_err(f"timestamps at {old}, past the end of the playlist, were displaced by a moved video; "
+                          f"kept under removed \"index {old}\"", "playlist_sync")
+    while remapped and not remapped[-1]:
+        remapped.pop()  # only as long as the last video with timestamps, like a hand written file
+    if removed:
+        meta["removed"] = removed
+
+    if "aliases" in meta:
+        meta["aliases"] = {str(diff.moves[int(index)]): alias for index, alias in meta["aliases"].items()
+                           if int(index) in diff.moves}
+
+    skipped = [diff.moves[index] for index in get_skipped(meta.get("offsets", {})) if index in diff.moves]
+    last_kept = max(diff.moves.values(), default=0)
+    skipped += [index for index in diff.inserted if index < last_kept]  # keeps the part numbers after them
+    if skipped or "offsets" in meta:
+        meta["offsets"] = build_offsets(skipped)
+
+    targets[1:] = remapped
+
+
+def print_diff(diff, old_ids, new_ids, targets):
+    print_colored(f"playlist changed: {len(diff.inserted)} added, {len(diff.removed)} removed, "
+                  f"{len(diff.reordered)} reordered", "playlist_sync", ColorsEnum.YELLOW.value)
+    for index in diff.inserted:
+        print_colored(f"added at {index}: {new_ids[index - 1]}", "playlist_sync", ColorsEnum.YELLOW.value, 1)
+    for index in diff.removed:
+        print_colored(f"removed from {index}: {old_ids[index - 1]}", "playlist_sync", ColorsEnum.YELLOW.value, 1)
+    for index in diff.reordered:
+        print_colored(f"moved {index} -> {diff.moves[index]}: {old_ids[index - 1]}", "playlist_sync",
+                      ColorsEnum.YELLOW.value, 1)
+    skipped = get_skipped(targets[0].get("offsets", {}))
+    removed_labels = [index for index in diff.removed if index not in skipped]
+    if removed_labels:
+        print_err(f"part numbers after removed video(s) {removed_labels} move down; add aliases to keep them",
+                  "playlist_sync")
+
+
+def write_targets(targets, targets_path):
+    if os.path.exists(targets_path):
+        shutil.copyfile(targets_path, targets_path + ".bak")
+    tmp_path = targets_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(targets, f, indent=4)
+    os.replace(tmp_path, targets_path)
+
+
+def sync_targets(targets, targets_path=TARGETS_PATH, force=False):
+    """
+    Bring targets (loaded from targets_path) in line with its playlist as it is now, rewriting targets_path
+    if anything moved. While the cached playlist is fresh (and not force) it's diffed against that instead of
+    fetching, and nothing is done if it matches. Returns the PlaylistDiff, or None.
+    """
+    meta = targets[0]
+    playlist_url = meta["url"]
+    cached_links, updated = metadata.get_updated(PLAYLISTS, playlist_url)
+    fresh = updated is not None and time.time() - updated < PLAYLIST_CACHE_TTL_HOURS * 3600
+    if fresh and cached_links and "video_ids" in meta and not force:
+        # something else (GUI, yoink) may have refreshed the cache since targets.json was last synced
+        new_ids = [extract_video_id(link) for link in cached_links]
+        if new_ids == meta["video_ids"]:
+            return None
+    else:
+        new_links = get_playlist_links_untrusted(playlist_url)
+        if not new_links:
+            print_err(f"couldn't fetch {playlist_url}, using the playlist as cached", "playlist_sync")
+            return None
+        new_ids = [extract_video_id(link) for link in new_links]
+    # targets.json from before syncing existed was written against the cached playlist, if there is one
+    old_ids = meta.get("video_ids") or ([extract_video_id(link) for link in cached_links] if cached_links else new_ids)
+
+    diff = diff_playlists(old_ids, new_ids)
+    if diff.changed:
+        print_diff(diff, old_ids, new_ids, targets)
+        remap_targets(targets, diff, new_ids, old_ids)
+        moved = move_sources(meta.get("prefix", "Part "), diff)
+        if moved:
+            print_colored(f"moved the sources and clips of {moved} videos to their new indices", "playlist_sync",
+                          ColorsEnum.YELLOW.value, 1)
+    if diff.changed or meta.get("video_ids") != new_ids:
+        meta["video_ids"] = new_ids
+        write_targets(targets, targets_path)
+    return diff
@@ -0,0 +1,198 @@
+# probe.py
+# one ffprobe per file for everything we need (size, frame rate, duration, codecs, bitrate), cached on disk and
+# invalidated by (size, mtime). shared by the renderer, validate_durations and compilation.
+import os
+import json
+import atexit
+import subprocess
+import threading
+from fractions import Fraction
+from typing import NamedTuple, Optional
+
+from common import config, print_colored, ColorsEnum
+from mp4_header import read_mp4_info
+
+PROBE_CACHE_PATH = config.get("PROBE_CACHE_PATH", "probe_cache.json")
+
+PROBE_STREAM_FIELDS = [
+    "codec_type", "codec_name", "profile", "width", "height", "pix_fmt", "sample_aspect_ratio",
+    "r_frame_rate", "avg_frame_rate", "time_base", "bit_rate", "sample_rate", "channels", "channel_layout"
+]
+PROBE_FORMAT_FIELDS = ["duration", "bit_rate", "format_name"]
+
+
+class MediaInfo(NamedTuple):
+    width: int
+    height: int
+    r_frame_rate: str          # rational as ffprobe reports it, e.g. "30000/1001"
+    duration: float            # container duration, seconds
+    video_codec: Optional[str]
+    audio_codec: Optional[str]
+    bit_rate: int              # container bitrate, 0 if unknown
+    streams: list              # per-stream dicts of PROBE_STREAM_FIELDS, in file order
+    source: str = "ffprobe"    # "mp4_header" when read without ffprobe: streams then lack profile/pix_fmt/etc
+
+    @property
+    def frame_rate(self):
+        return parse_rational(self.r_frame_rate)
+
+    @property
+    def has_audio(self):
+        return self.audio_codec is not None
+
+
+def parse_rational(value):
+    try:
+        return float(Fraction(value))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return 0.0
+
+
+probe_stats = {"spawns": 0, "header_reads": 0, "hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def count_probe(stat):
+    with _stats_lock:  # render pool workers probe concurrently
+        probe_stats[stat] += 1
+
+
+def run_ffprobe(video_path):
+    """Probe a file with a single ffprobe spawn; None if it isn't readable media"""
+    command = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries', f"stream={','.join(PROBE_STREAM_FIELDS)}:format={','.join(PROBE_FORMAT_FIELDS)}",
+        '-of', 'json',
+        video_path
+    ]
+    count_probe("spawns")
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output = json.loads(result.stdout or b"{}")
+    except (OSError, json.JSONDecodeError):
+        return None
+
+    streams = [{field: stream[field] for field in PROBE_STREAM_FIELDS if field in stream}
+               for stream in output.get('streams', [])]
+    media_format = output.get('format', {})
+    if not streams and not media_format:
+        return None
+    return build_media_info(media_format, streams)
+
+
+def read_header(video_path):
+    """Probe an mp4/mov by reading its moov box directly; None if that isn't possible"""
+    header = read_mp4_info(video_path)
+    if header is None:
+        return None
+    count_probe("header_reads")
+    return build_media_info(*header, source="mp4_header")
+
+
+def build_media_info(media_format, streams, source="ffprobe"):
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    return MediaInfo(
+        width=int(video.get("width", 0)),
+        height=int(video.get("height", 0)),
+        r_frame_rate=video.get("r_frame_rate", "0/1"),
+        duration=float(media_format.get("duration", 0) or 0),
+        video_codec=video.get("codec_name"),
+        audio_codec=audio.get("codec_name"),
+        bit_rate=int(media_format.get("bit_rate", 0) or 0),
+        streams=streams,
+        source=source
+    )
+
+
+class ProbeCache:
+    """On-disk probe results keyed by absolute path, valid while the file's size and mtime are unchanged"""
+
+    def __init__(self, cache_path=PROBE_CACHE_PATH):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r') as f:
+                    self._entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                print_colored(f"ignoring unreadable {self.cache_path}", "probe_cache", ColorsEnum.YELLOW.value)
+
+    @staticmethod
+    def _identity(stat):
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, video_path):
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        with self._lock:
+            self._load()
+            entry = self._entries.get(os.path.abspath(video_path))
+            if entry and entry["identity"] == self._identity(stat):
+                return MediaInfo(**entry["info"])
+        return None
+
+    def put(self, video_path, info):
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return
+        with self._lock:
+            self._load()
+            self._entries[os.path.abspath(video_path)] = {"identity": self._identity(stat), "info": info._asdict()}
+            self._dirty = True
+
+    def forget(self, video_path):
+        with self._lock:
+            self._load()
+            if self._entries.pop(os.path.abspath(video_path), None) is not None:
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+
+
+probe_cache = ProbeCache()
+atexit.register(probe_cache.save)
+
+
+def probe_media(video_path, detailed=False):
+    """
+    MediaInfo for video_path, from the cache when the file hasn't changed; None if it can't be probed.
+    mp4/mov headers are read directly unless detailed is set, which asks for ffprobe's full per-stream
+    fields (profile, pix_fmt, ...) as needed for stream-copy compatibility checks.
+    """
+    info = probe_cache.get(video_path)
+    if info is not None and (info.source == "ffprobe" or not detailed):
+        count_probe("hits")
+        return info
+
+    count_probe("misses")
+    info = None if detailed else read_header(video_path)
+    if info is None:
+        info = run_ffprobe(video_path)
+    if info is not None:
+        probe_cache.put(video_path, info)
+    return info
+
+
+def print_probe_stats():
+    print(f"probe cache: {probe_stats['hits']} hits, {probe_stats['misses']} misses, "
+          f"{probe_stats['header_reads']} mp4 header reads, {probe_stats['spawns']} ffprobe spawns")
@@ -0,0 +1,114 @@
+# progress.py
+# ffmpeg progress via -progress pipe:1 -nostats: newline-terminated key=value blocks on stdout, each ending in
+# progress=continue|end, instead of scraping the \r-terminated stats line off stderr.
+import collections
+import queue
+import subprocess
+import threading
+from typing import NamedTuple, Optional
+
+
+class ProgressEvent(NamedTuple):
+    frame: int
+    fps: float
+    speed: float       # x realtime, 0 while ffmpeg reports N/A
+    out_time: float    # seconds of output written so far
+    total_size: int    # bytes
+    done: bool         # the final progress=end block
+
+
+class FFmpegResult(NamedTuple):
+    returncode: int
+    last_event: Optional[ProgressEvent]
+    stderr_tail: str
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+
+def _number(value, cast=float, default=0):
+    try:
+        return cast(value.rstrip("x").strip())
+    except (AttributeError, ValueError):
+        return default  # "N/A", missing
+
+
+def parse_progress_block(fields):
+    out_time_us = fields.get("out_time_us", fields.get("out_time_ms"))  # out_time_ms is microseconds too, historically
+    return ProgressEvent(
+        frame=_number(fields.get("frame"), int),
+        fps=_number(fields.get("fps")),
+        speed=_number(fields.get("speed")),
+        out_time=_number(out_time_us, int) / 1_000_000,
+        total_size=_number(fields.get("total_size"), int),
+        done=fields.get("progress") == "end"
+    )
+
+
+class FFmpegProgressReader:
+    """
+    Reads a running ffmpeg's stdout (progress blocks) and stderr (log, kept as a short tail) on
+    background threads, so neither pipe can fill up and stall ffmpeg. Events are queued and
+    consumed on the caller's thread, which keeps UI callbacks off the reader threads.
+    """
+
+    def __init__(self, process, stderr_lines=40):
+        self.process = process
+        self._events = queue.Queue()
+        self._stderr_tail = collections.deque(maxlen=stderr_lines)
+
+        self._stdout_thread = threading.Thread(target=self._read_stdout, daemon=True)
+        self._stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stdout_thread.start()
+        self._stderr_thread.start()
+
+    def _read_stdout(self):
+        fields = {}
+        for line in self.process.stdout:
+            key, _, value = line.strip().partition("=")
+            if not key:
+                continue
+            fields[key] = value
+            if key == "progress":
+                self._events.put(parse_progress_block(fields))
+                fields = {}
+        self._events.put(None)  # EOF
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            self._stderr_tail.append(line.rstrip())
+
+    def events(self):
+        """Yield ProgressEvents as they arrive, until ffmpeg closes stdout"""
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            yield event
+
+    def stderr_tail(self):
+        self._stderr_thread.join()
+        return "\n".join(self._stderr_tail)
+
+
+def run_ffmpeg_with_progress(argv, on_event=None):
+    """
+    Run ffmpeg (argv[0] is the binary) with machine-readable progress, calling on_event(ProgressEvent)
+    on this thread for every block. Always waits for ffmpeg to exit before returning.
+    """
+    argv = [argv[0], '-progress', 'pipe:1', '-nostats', *argv[1:]]
+    process = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True, bufsize=1)
+    reader = FFmpegProgressReader(process)
+
+    last_event = None
+    try:
+        for event in reader.events():
+            last_event = event
+            if on_event:
+                on_event(event)
+    finally:
+        returncode = process.wait()
+
+    return FFmpegResult(returncode, last_event, reader.stderr_tail())
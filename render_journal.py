@@ -0,0 +1,105 @@
+# render_journal.py
+# renders are written to a temp name next to their final path and renamed into place only once ffmpeg succeeds,
+# so an existing output file is always a finished one. an append-only journal records which temp files are in
+# flight; anything a killed run left behind is removed by recover() at the next startup.
+import os
+import glob
+import json
+import threading
+
+from common import config, print_colored, ColorsEnum
+
+RENDER_JOURNAL_PATH = config.get("RENDER_JOURNAL_PATH", "render_journal.jsonl")
+
+
+def get_temp_output_file(output_file):
+    # keeps the extension so ffmpeg still picks the right muxer
+    root, ext = os.path.splitext(output_file)
+    return f"{root}.tmp{ext}"
+
+
+def get_window_file(temp_file):
+    """Scratch encode of a merged clip window (see window_planner.py), named after its first clip's temp output"""
+    root, ext = os.path.splitext(temp_file)
+    return f"{root}.window{ext}"
+
+
+def get_leftovers(temp_file):
+    """A temp output plus the scratch files rendering it can create (combined .partN files, concat lists, windows)"""
+    root, ext = os.path.splitext(temp_file)
+    return [temp_file, f"{temp_file}.concat.txt", get_window_file(temp_file),
+            *glob.glob(f"{glob.escape(root)}.part*{ext}")]
+
+
+class RenderJournal:
+    def __init__(self, journal_path=RENDER_JOURNAL_PATH):
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+
+    def _append(self, record):
+        with self._lock:  # render pool workers begin/finish concurrently
+            with open(self.journal_path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read(self):
+        records = []
+        if not os.path.exists(self.journal_path):
+            return records
+        with open(self.journal_path, 'r') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass  # torn last line from a killed run
+        return records
+
+    def begin(self, output_file):
+        """Record output_file as in flight; returns the temp path to render into"""
+        temp_file = get_temp_output_file(output_file)
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        self._append({"event": "begin", "path": output_file, "temp": temp_file})
+        return temp_file
+
+    def finish(self, output_file, ok):
+        """Rename the temp render into place if ok, else discard it. Returns whether output_file now exists"""
+        temp_file = get_temp_output_file(output_file)
+        promoted = ok and os.path.exists(temp_file)
+        if promoted:
+            os.replace(temp_file, output_file)
+        for leftover in get_leftovers(temp_file):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        self._append({"event": "done" if promoted else "failed", "path": output_file})
+        return promoted
+
+    def recover(self):
+        """
+        Remove temp files of renders that never finished (killed, crashed, Ctrl-C) and reset the
+        journal. Finished renders need no record: their output existing is proof enough.
+        """
+        in_flight = {}
+        for record in self._read():
+            if record.get("event") == "begin":
+                in_flight[record["path"]] = record["temp"]
+            else:
+                in_flight.pop(record.get("path"), None)
+
+        removed = []
+        for output_file, temp_file in in_flight.items():
+            for leftover in get_leftovers(temp_file):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+                    removed.append(leftover)
+
+        if removed:
+            print_colored(f"removed {len(removed)} partial files from {len(in_flight)} interrupted renders",
+                          "render_journal", ColorsEnum.YELLOW.value)
+        with self._lock:
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+        return removed
+
+
+journal = RenderJournal()
@@ -0,0 +1,108 @@
+# render_pool.py
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common import print_colored, print_err
+
+
+class RenderPool:
+    """
+    Bounded pool of concurrent ffmpeg renders.
+
+    Workers only run ffmpeg; everything that touches shared state (UI counters, tkinter,
+    callers' bookkeeping) is handed back to the main thread through poll()/wait(), so
+    clips finishing out of order can't race the UI.
+    """
+
+    def __init__(self, jobs, cpu_count=None):
+        self.jobs = max(1, int(jobs))
+        cpu_count = cpu_count or os.cpu_count() or 1
+
+        # split the machine between workers so N ffmpegs don't each spin up a thread per core
+        self.threads_per_job = max(1, cpu_count // self.jobs)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="render")
+        self._done_queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._scheduled = set()  # output files already queued this session
+        self._progress = {}      # output file -> 0..1, for in-flight renders only
+        self._pending = 0
+
+        print_colored(f"render pool: {self.jobs} jobs x {self.threads_per_job} threads", "render_pool", 4)
+
+    def is_scheduled(self, key):
+        return key in self._scheduled
+
+    def submit(self, key, fn, *args, on_done=None, **kwargs):
+        """
+        Queue fn(*args, **kwargs, on_progress=..., threads=...) for rendering.
+        :param key: unique id for the job (the output file); duplicates are ignored.
+        :param on_done: called as on_done(key, error) from the main thread once the job finishes.
+        :return: False if key was already scheduled.
+        """
+        if key in self._scheduled:
+            return False
+        self._scheduled.add(key)
+        self._pending += 1
+
+        def on_progress(progress):
+            with self._lock:
+                self._progress[key] = progress
+
+        def run():
+            with self._lock:
+                self._progress[key] = 0.0
+            error = None
+            try:
+                fn(*args, on_progress=on_progress, threads=self.threads_per_job, **kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                with self._lock:
+                    self._progress.pop(key, None)
+                self._done_queue.put((key, error, on_done))
+
+        self._executor.submit(run)
+        return True
+
+    def poll(self, timeout=0.0):
+        """Run on_done callbacks for finished jobs on the calling thread. Returns how many finished."""
+        finished = 0
+        while True:
+            try:
+                if timeout and finished == 0:
+                    key, error, on_done = self._done_queue.get(timeout=timeout)
+                else:
+                    key, error, on_done = self._done_queue.get_nowait()
+            except queue.Empty:
+                return finished
+
+            self._pending -= 1
+            finished += 1
+            if error is not None:
+                print_err(f"render failed for {key}: {error}", "render_pool")
+            if on_done:
+                on_done(key, error)
+
+    def active_progress(self):
+        """Average progress (0..1) of the renders currently running"""
+        with self._lock:
+            if not self._progress:
+                return 0.0
+            return sum(self._progress.values()) / len(self._progress)
+
+    def pending(self):
+        return self._pending
+
+    def wait(self, on_tick=None, interval=0.25):
+        """Block until every submitted job has finished, calling on_tick() between polls."""
+        while self._pending > 0:
+            self.poll(timeout=interval)
+            if on_tick:
+                on_tick()
+
+    def shutdown(self):
+        self.wait()
+        self._executor.shutdown(wait=True)
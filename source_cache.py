@@ -0,0 +1,224 @@
+# source_cache.py
+# downloaded sources (OUTPUT_DIR/part_N.mp4 or its part_N.sections/ dir) under a byte budget. a source is pinned
+# while its video is being processed or any of its clips is still rendering, becomes evictable once every clip
+# rendered from it verified, and evictable sources are deleted least recently used first when a download needs
+# room. with no budget (SOURCE_CACHE_GB null, the default) nothing is ever evicted, only counted.
+import os
+import json
+import time
+import atexit
+import shutil
+import threading
+
+from common import config, OUTPUT_DIR, print_colored, print_err, ColorsEnum
+
+SOURCE_CACHE_GB = config.get("SOURCE_CACHE_GB", None)
+SOURCE_CACHE_INDEX_PATH = config.get("SOURCE_CACHE_INDEX_PATH", os.path.join(OUTPUT_DIR, "source_cache.json"))
+SOURCE_CACHE_WAIT = config.get("SOURCE_CACHE_WAIT", 600)  # seconds a download waits for evictions before giving up
+
+SECTION_DIR_SUFFIX = ".sections"
+
+
+def get_section_dir(video_filepath):
+    return video_filepath[:-4] + SECTION_DIR_SUFFIX
+
+
+def get_source_key(path):
+    """The cache key (the full download's path) of a source file: itself, or the video a section file belongs to"""
+    section_dir = os.path.dirname(path)
+    if section_dir.endswith(SECTION_DIR_SUFFIX):
+        return section_dir[:-len(SECTION_DIR_SUFFIX)] + ".mp4"
+    return path
+
+
+def get_source_size(key):
+    size = os.path.getsize(key) if os.path.isfile(key) else 0
+    for root, dirs, files in os.walk(get_section_dir(key)):
+        size += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return size
+
+
+def remove_source(key):
+    if os.path.isfile(key):
+        os.remove(key)
+    shutil.rmtree(get_section_dir(key), ignore_errors=True)
+
+
+class SourceCache:
+    """
+    index.json of source key -> size / last use / done (every clip verified), persisted across runs;
+    pins and download reservations only live for the run.
+    """
+
+    def __init__(self, index_path=SOURCE_CACHE_INDEX_PATH, budget_gb=SOURCE_CACHE_GB):
+        self.index_path = index_path
+        self.budget_bytes = int(budget_gb * 1024 ** 3) if budget_gb is not None else None
+        self._cond = threading.Condition()  # downloads waiting for room wake up when a source is released
+        self._index = None
+        self._pins = {}      # key -> renders pending, +1 while the video is being processed
+        self._failed = set()  # keys with a clip that didn't verify this run: kept for the retry
+        self._reserved = {}  # key -> estimated bytes of a download in progress
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0, "bytes_evicted": 0, "waits": 0}
+
+    def _load(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    self._index = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                print_colored(f"ignoring unreadable {self.index_path}", "source_cache", ColorsEnum.YELLOW.value)
+        for key in list(self._index):
+            if not os.path.exists(key) and not os.path.isdir(get_section_dir(key)):
+                del self._index[key]  # deleted by hand
+
+    def save(self):
+        with self._cond:
+            if self._index is None:
+                return
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+
+    def used_bytes(self):
+        return sum(entry["size"] for entry in self._index.values()) + sum(self._reserved.values())
+
+    def _track(self, key):
+        """Index key (sized from disk) if it isn't yet, e.g. a source downloaded before the cache existed"""
+        entry = self._index.get(key)
+        if entry is None:
+            entry = self._index[key] = {"size": get_source_size(key), "done": False}
+        entry["last_used"] = time.time()
+        return entry
+
+    def hit(self, key):
+        """The source is already on disk and covers what's needed"""
+        with self._cond:
+            self._load()
+            self._track(key)
+            self.stats["hits"] += 1
+
+    def pin(self, key, count=1):
+        """Keep key from being evicted until release() is called count times"""
+        with self._cond:
+            self._load()
+            self._pins[key] = self._pins.get(key, 0) + count
+            if key in self._index:
+                self._index[key]["done"] = False
+
+    def release(self, key, ok=True):
+        """
+        Drop one pin, ok=False if it was a clip that didn't verify. A source whose last pin
+        is released with every clip verified becomes evictable.
+        """
+        with self._cond:
+            if not ok:
+                self._failed.add(key)
+            remaining = self._pins.get(key, 0) - 1
+            if remaining > 0:
+                self._pins[key] = remaining
+                return
+            self._pins.pop(key, None)
+            if self._index is not None and key in self._index:
+                self._index[key]["done"] = key not in self._failed
+            self._cond.notify_all()
+
+    def _evict_one(self):
+        candidates = [(entry["last_used"], key) for key, entry in self._index.items()
+                      if entry["done"] and key not in self._pins and key not in self._reserved]
+        if not candidates:
+            return False
+        last_used, key = min(candidates)
+        size = self._index.pop(key)["size"]
+        remove_source(key)
+        self.stats["evicted"] += 1
+        self.stats["bytes_evicted"] += size
+        print_colored(f"evicted {os.path.basename(key)} ({size / 1024 ** 3:.2f}GB) from the source cache",
+                      "source_cache", ColorsEnum.YELLOW.value, 1)
+        return True
+
+    def reserve(self, key, nbytes):
+        """
+        Make room for a download of about nbytes: evict, or wait for pinned sources to become evictable.
+        Returns False, refusing the download, if the budget can't be met within SOURCE_CACHE_WAIT.
+        """
+        with self._cond:
+            self._load()
+            self.stats["misses"] += 1
+            deadline = time.time() + SOURCE_CACHE_WAIT
+            waited = False
+            while self.budget_bytes is not None and self.used_bytes() + nbytes > self.budget_bytes:
+                if self._evict_one():
+                    continue
+                remaining = deadline - time.time()
+                if not any(pinned != key for pinned in self._pins) or remaining <= 0:  # nothing else can free room
+                    print_err(f"source cache full: {os.path.basename(key)} needs {nbytes / 1024 ** 3:.2f}GB, "
+                              f"{self.used_bytes() / 1024 ** 3:.2f}GB of {self.budget_bytes / 1024 ** 3:.2f}GB "
+                              f"is held by sources with pending clips", "source_cache")
+                    return False
+                if not waited:
+                    waited = True
+                    self.stats["waits"] += 1
+                    print_colored(f"waiting for room in the source cache for {os.path.basename(key)}",
+                                  "source_cache", ColorsEnum.YELLOW.value, 1)
+                self._cond.wait(timeout=remaining)
+            self._reserved[key] = self._reserved.get(key, 0) + nbytes
+            self._track(key)  # so it can't be picked for eviction mid-download
+            self._index[key]["done"] = False
+            return True
+
+    def finish(self, key, nbytes):
+        """The download reserved with nbytes is over (or failed): account the source at its real size"""
+        with self._cond:
+            self._reserved[key] = self._reserved.get(key, 0) - nbytes
+            if self._reserved[key] <= 0:
+                del self._reserved[key]
+            size = get_source_size(key)
+            if size:
+                self._track(key)["size"] = size
+            else:
+                self._index.pop(key, None)
+            self._cond.notify_all()
+        self.save()
+
+    def rename(self, key, new_key):
+        """
+        Move a source (full file and section dir) to new_key along with its index entry and pins,
+        replacing whatever source was at new_key
+        """
+        with self._cond:
+            self._load()
+            self.remove(new_key)
+            if os.path.isfile(key):
+                os.replace(key, new_key)
+            if os.path.isdir(get_section_dir(key)):
+                os.replace(get_section_dir(key), get_section_dir(new_key))
+            for table in (self._index, self._pins, self._reserved):
+                if key in table:
+                    table[new_key] = table.pop(key)
+            if key in self._failed:
+                self._failed.discard(key)
+                self._failed.add(new_key)
+
+    def remove(self, key):
+        """Delete a source and forget it"""
+        with self._cond:
+            self._load()
+            remove_source(key)
+            self._index.pop(key, None)
+            self._cond.notify_all()
+
+    def print_stats(self):
+        self._load()
+        budget = f" of {self.budget_bytes / 1024 ** 3:.2f}GB" if self.budget_bytes is not None else ""
+        print(f"source cache: {self.stats['hits']} hits, {self.stats['misses']} misses, "
+              f"{self.stats['evicted']} evicted ({self.stats['bytes_evicted'] / 1024 ** 3:.2f}GB), "
+              f"waited for room {self.stats['waits']} times, {self.used_bytes() / 1024 ** 3:.2f}GB{budget} in use")
+
+
+source_cache = SourceCache()
+atexit.register(source_cache.save)
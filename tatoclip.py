@@ -1,8 +1,26 @@
 # tatoclip.py
 import math
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, wait
 from common import *
 from metadata_handler import get_effective_index, resolve_alias_to_effective_index, get_alias_for_index
 from ui_handler import get_ui_handler, init_loading_ui, calculate_total_work_units, update_loading_ui, close_ui
+from render_pool import RenderPool
+from compilation import concat_copy, compile_clips, cut_copy
+from encoders import get_video_encoder_args, get_encoder, ENCODER_SPEED
+from ffmpeg_command import FFmpegCommand, Filter, FilterChain, FilterGraph, escape_drawtext_text
+from progress import run_ffmpeg_with_progress, FFmpegResult
+from probe import probe_media, print_probe_stats
+from verification import verify_render, verify_outputs, get_session_checks, record_check, RenderCheck
+from render_journal import journal, get_window_file
+from manifest import manifest, fingerprint, file_identity, RENDER_SPEC_VERSION
+from clip_store import clip_store
+from downloader import acquire_source, clip_window, SourceSections
+from window_planner import plan_windows, MERGE_CLIP_WINDOWS, KEYFRAME_SLACK
+from chunked_render import keyframe_index, plan_chunks, get_chunk_jobs, print_keyframe_stats, CHUNKED_RENDER, \
+    CHUNK_MIN_SECONDS
+from source_cache import source_cache, get_source_key
 
 # Constants and config
 
@@ -10,18 +28,29 @@ class DrawType(Enum):
     STATIC = "static"
     UPDATING = "updating"
 
+class RenderEngine(Enum):
+    CLIP = "clip"    # one ffmpeg per clip
+    MULTI = "multi"  # one ffmpeg per batch of clips from the same source
+    NUMPY = "numpy"  # per clip, an ffmpeg decoding and one encoding, overlay drawn in between (numpy_overlay.py)
+
+RENDER_ENGINE = config.get("RENDER_ENGINE", RenderEngine.CLIP.value)  # overridden by --engine
+MULTI_OUTPUT_BATCH = config.get("MULTI_OUTPUT_BATCH", 8)  # clips (= decoders) per multi-output ffmpeg
+DEBUG_FFMPEG_SCRIPTS = config.get("DEBUG_FFMPEG_SCRIPTS", False)  # overridden by --debug-script
+DEBUG_SCRIPT_DIR = config.get("DEBUG_SCRIPT_DIR", "debug_scripts")
+
 video_downloading_times = []
 video_clipping_times = []
 clipping_times = {}
+clipping_times_lock = threading.Lock()
 
-def build_clip_and_timestamp_script(input_file, start_time, duration, output_file, prefix, frame_rate, series_text=None):
-    global TIMESTAMP_ARGS
-    draw_type = TIMESTAMP_ARGS.get("draw_type", "updating").lower()
+render_pool = None  # set in __main__ when rendering with --jobs > 1
+clip_store_misses = set()  # fingerprints the clip store didn't have when this run planned their video
+source_ids = {}  # source path -> youtube video id, so fingerprints match across projects naming sources differently
 
+def get_timestamp_layout(input_file):
+    """TIMESTAMP_ARGS positions and sizes scaled from 1080p to input_file's resolution, series text line included"""
     resolution = get_mp4_bounds(input_file)[1]
 
-    text = ""
-
     x_offset = TIMESTAMP_ARGS.get("x_offset", 0)
     y_offset = TIMESTAMP_ARGS.get("y_offset", 0)
     font_size = TIMESTAMP_ARGS.get("font_size", 0)
@@ -43,15 +72,62 @@ def build_clip_and_timestamp_script(input_file, start_time, duration, output_fil
         print(y_offset)
         print(font_size)
 
+    return {
+        "x_offset": x_offset, "y_offset": y_offset, "font_size": font_size,
+        "borderw": borderw, "shadowx": shadowx, "shadowy": shadowy,
+        # series text goes 1.5 lines above timestamp... if this works?
+        "series_y_offset": math.floor(y_offset - (font_size * 1.4)),
+        "series_font_size": math.floor(font_size * 0.8),
+    }
+
+
+def get_static_label(prefix, start_time, label_start=None):
+    """The static draw type's text for a window starting at start_time (buffered, source seconds)"""
+    return f"{prefix} {sec_to_timestamp((start_time if label_start is None else label_start) + CLIP_BUFFER_SECONDS)}"
+
+
+def build_timestamp_filters(input_file, start_time, duration, prefix, series_text=None, label_start=None):
+    """
+    drawtext Filters overlaying the timestamp (and series text) on one clip window.
+    label_start: the whole clip's start when this window is only a chunk of it (the static label names the clip)
+    """
+    global TIMESTAMP_ARGS
+    draw_type = TIMESTAMP_ARGS.get("draw_type", "updating").lower()
+
+    layout = get_timestamp_layout(input_file)
+    x_offset = layout["x_offset"]
+    y_offset = layout["y_offset"]
+    font_size = layout["font_size"]
+    borderw = layout["borderw"]
+    shadowx = layout["shadowx"]
+    shadowy = layout["shadowy"]
+
+    def drawtext(text, y, size, enable=None):
+        return Filter(
+            "drawtext",
+            text=text,
+            fontfile=FONT_PATH,
+            bordercolor="black", borderw=borderw,
+            x=x_offset,
+            y=f"{y}-text_h/2",
+            fontsize=size, fontcolor="white",
+            shadowx=shadowx, shadowy=shadowy, shadowcolor="black",
+            enable=enable
+        )
+
+    def updating_text(strftime_expr):
+        # ':' inside %{...} separates drawtext's function arguments, so the one in the format is escaped
+        return f"{escape_drawtext_text(prefix)} %{{pts:gmtime:{start_time}:{strftime_expr}}}"
+
+    no_hour_format = "%-M\\:%S"
+    hour_format = "%-H\\:%M\\:%S"
+
     filters = []
 
-    def escape_drawtext_string(s):
-        s = s.replace('%', '%%')
-        # shell -> Python -> FFmpeg backslash escaping (absurd)
-        s = s.replace('\\', '\\\\\\\\')
-        s = s.replace("'", "'\\''")
-        s = s.replace("\"", "\\\"")
-        return s
+    if series_text:
+        # series text is always visible, drawn under the timestamp
+        filters.append(drawtext(escape_drawtext_text(series_text), layout["series_y_offset"],
+                                layout["series_font_size"]))
 
     if draw_type == DrawType.UPDATING.value:
         # Determine if the displayed time crosses the 1‑hour mark
@@ -60,154 +136,135 @@ def build_clip_and_timestamp_script(input_file, start_time, duration, output_fil
         if crosses_hour:
             cross_t = 3600 - start_time
 
-            # Format without hours
-            strftime_no_hour = "%-M\\\\\\\\\\:%S"
-            text_no_hour = f"{prefix}\\ %{{pts\\:gmtime\\:{start_time}\\:{strftime_no_hour}}}"
-
-            # Format with hours
-            strftime_hour = "%-H\\\\\\\\\\:%M\\\\\\\\\\:%S"
-            text_hour = f"{prefix}\\ %{{pts\\:gmtime\\:{start_time}\\:{strftime_hour}}}"
-
             # Build the two timestamp filters with enable conditions
-            filter_no_hour = (
-                f"drawtext=\"text='{text_no_hour}':"
-                f"fontfile='{FONT_PATH}':"
-                f"bordercolor=black:borderw={borderw}:"
-                f"x={x_offset}:"
-                f"y={y_offset}-text_h/2:"
-                f"fontsize={font_size}:fontcolor=white:"
-                f"shadowx={shadowx}:shadowy={shadowy}:shadowcolor=black:"
-                f"enable='lt(t,{cross_t})'\""
-            )
-
-            filter_hour = (
-                f"drawtext=\"text='{text_hour}':"
-                f"fontfile='{FONT_PATH}':"
-                f"bordercolor=black:borderw={borderw}:"
-                f"x={x_offset}:"
-                f"y={y_offset}-text_h/2:"
-                f"fontsize={font_size}:fontcolor=white:"
-                f"shadowx={shadowx}:shadowy={shadowy}:shadowcolor=black:"
-                f"enable='gte(t,{cross_t})'\""
-            )
-
-            # Add series filter (always visible) and then the two timestamp filters
-            if series_text:
-                filters.append(series_filter)
-            filters.append(filter_no_hour)
-            filters.append(filter_hour)
-
+            filters.append(drawtext(updating_text(no_hour_format), y_offset, font_size, enable=f"lt(t,{cross_t})"))
+            filters.append(drawtext(updating_text(hour_format), y_offset, font_size, enable=f"gte(t,{cross_t})"))
         else:
             # Original single‑filter logic
             show_hours = start_time + duration >= 3600
-            strftime_expr = "%-M\\\\\\\\\\:%S"
-            if show_hours:
-                strftime_expr = "%-H\\\\\\\\\\:%M\\\\\\\\\\:%S"
-
-            text = f"{prefix}\\ %{{pts\\:gmtime\\:{start_time}\\:{strftime_expr}}}"
-
-            drawtext_filter = (
-                f"drawtext=\"text='{text}':"
-                f"fontfile='{FONT_PATH}':"
-                f"bordercolor=black:borderw={borderw}:"
-                f"x={x_offset}:"
-                f"y={y_offset}-text_h/2:"
-                f"fontsize={font_size}:fontcolor=white:"
-                f"shadowx={shadowx}:shadowy={shadowy}:shadowcolor=black\""
-            )
-
-            if series_text:
-                filters.append(series_filter)
-            filters.append(drawtext_filter)
+            strftime_expr = hour_format if show_hours else no_hour_format
+            filters.append(drawtext(updating_text(strftime_expr), y_offset, font_size))
     elif draw_type == DrawType.STATIC.value:
-        text = f"{prefix} {sec_to_timestamp(start_time + CLIP_BUFFER_SECONDS).replace(':', '\\:')}"
+        filters.append(drawtext(escape_drawtext_text(get_static_label(prefix, start_time, label_start)), y_offset,
+                                font_size))
     else:
         print(f"unknown draw type {draw_type}")
         exit(1)
 
-    if series_text:
-        # todo: does this need further escaping?
-        escaped_series_text = escape_drawtext_string(series_text)
-
-        series_y_offset = math.floor(y_offset - (font_size * 1.4)) # series text goes 1.5 lines above timestamp... if this works?
-        series_filter = (
-            f"drawtext=\"text='{escaped_series_text}':"
-            f"fontfile='{FONT_PATH}':"
-            f"bordercolor=black:borderw={borderw}:"
-            f"x={x_offset}:"
-            f"y={series_y_offset}-text_h/2:"
-            f"fontsize={math.floor(font_size*0.8)}:fontcolor=white:"
-            f"shadowx={shadowx}:shadowy={shadowy}:shadowcolor=black\""
-        )
-        filters.append(series_filter)
-
-    drawtext_filter = (
-        f"drawtext=\"text='{text}':"
-        f"fontfile='{FONT_PATH}':"
-        f"bordercolor=black:borderw={borderw}:"
-        f"x={x_offset}:"
-        f"y={y_offset}-text_h/2:"
-        f"fontsize={font_size}:fontcolor=white:"
-        f"shadowx={shadowx}:shadowy={shadowy}:shadowcolor=black\""
-    )
-    filters.append(drawtext_filter)
-
-    filter_chain = ",".join(filters)
-    command = [
-        'ffmpeg',
-        '-ss', str(start_time),
-        '-i', input_file,
-        '-t', str(duration),
-        '-vf', filter_chain,
-        '-c:v', 'h264_nvenc',#'libx264' 'h264_nvenc'
-        '-b:v', BIT_RATE,
-        '-preset', 'p6',
-        '-r', str(frame_rate),
-        output_file,
-        '-y'
-    ]
+    return filters
 
-    print_colored(f"{get_color(ColorsEnum.GREEN.value)}    Generated Command: " + " ".join(command) + RESET_COLOR,
-                  "clip_and_timestamp_ffmpeg", 4)
-    print()
 
-    script_path = "./ffmpeg_command.sh"  # todo: windows compatibility
-    with open(script_path, 'w') as f:
-        f.write("#!/bin/bash\n")
-        f.write(" ".join(command) + "\n")
+def get_clip_spec(input_file, start_time, duration, prefix, series_text=None):
+    """Everything that decides what a clip renders to, for its manifest fingerprint. start_time in seconds"""
+    return {
+        "version": RENDER_SPEC_VERSION,
+        "source": source_ids.get(input_file) or file_identity(input_file),
+        "start": start_time, "duration": duration, "buffer": CLIP_BUFFER_SECONDS,
+        "prefix": prefix, "series": series_text,
+        "timestamp_args": TIMESTAMP_ARGS,
+        "font": file_identity(FONT_PATH, hash_content=True),
+        "overlay": "numpy" if RENDER_ENGINE == RenderEngine.NUMPY.value else "drawtext",  # clip/multi draw alike
+        "encoder": [get_encoder(), ENCODER_SPEED, BIT_RATE],  # as resolved on this machine, not "auto"
+        "frame_rate": [HIGH_RES_THRESHOLD, HIGH_RES_FRAME_RATE],
+    }
+
+
+def get_clip_fingerprint(input_file, start_time, duration, prefix, series_text=None):
+    return fingerprint(get_clip_spec(input_file, start_time, duration, prefix, series_text))
+
+
+def record_render(output_file, clip_fingerprint, check):
+    """
+    Bookkeeping for a clip whose render was promoted into place: recorded in the manifest and the shared store
+    if it verified. A clip that didn't is left on disk unrecorded, for validation (and its delete prompt) to decide
+    """
+    if not check.ok:
+        manifest.forget(output_file)
+        return
+    manifest.record(output_file, clip_fingerprint)
+    if clip_store is not None:
+        clip_store.put(clip_fingerprint, output_file)
 
-    os.chmod(script_path, 0o755)
 
+def get_combined_fingerprint(input_file, clips, series_text=None):
+    """:param clips: list of (start_time, duration, prefix), start_time in seconds"""
+    return fingerprint([get_clip_spec(input_file, start_time, duration, prefix, series_text)
+                        for start_time, duration, prefix in clips])
+
+
+def get_thread_args(threads):
+    # per-worker thread caps, so concurrent renders don't each grab every core
+    if not threads:
+        return [], []
+    return ['-filter_threads', str(threads)], ['-threads', str(threads)]
+
+
+def print_command(command, label):
+    print_colored(f"{get_color(ColorsEnum.GREEN.value)}    Generated Command: " + command.to_shell() + RESET_COLOR,
+                  label, 4)
+    print()
+
+
+def dump_debug_script(command, output_file):
+    """With DEBUG_FFMPEG_SCRIPTS / --debug-script, keep a runnable .sh of each render for reproduction"""
+    if not DEBUG_FFMPEG_SCRIPTS:
+        return None
+    script_path = os.path.join(DEBUG_SCRIPT_DIR, os.path.basename(output_file)[:-4] + ".sh")
+    command.write_script(script_path)
+    print(f"Command written to {script_path}")
     return script_path
 
 
+def build_clip_and_timestamp_command(input_file, start_time, duration, output_file, prefix, frame_rate, series_text=None,
+                                     threads=None, input_offset=0, force_key_frames=None, label_start=None):
+    """
+    start_time is in source video time, which is what the overlay shows. input_offset is where input_file
+    starts in the source (a downloaded section), so the seek is start_time - input_offset.
+    force_key_frames: -force_key_frames times (output time) for a window that's cut up afterwards
+    label_start: see build_timestamp_filters, for chunks of a longer clip
+    """
+    global_thread_args, thread_args = get_thread_args(threads)
+
+    command = FFmpegCommand()
+    command.add_global('-y', *global_thread_args)
+    command.add_input(input_file, *thread_args, '-ss', start_time - input_offset)
+    command.add_output(
+        output_file,
+        '-t', duration,
+        '-vf', FilterChain(build_timestamp_filters(input_file, start_time, duration, prefix, series_text, label_start)),
+        *(['-force_key_frames', force_key_frames] if force_key_frames else []),
+        *get_video_encoder_args(),
+        '-r', frame_rate,
+        *thread_args
+    )
+
+    print_command(command, "clip_and_timestamp_ffmpeg")
+    return command
+
+
 def get_video_frame_rate(file_path):
     """
-    Retrieve the video's average frame rate using ffprobe.
+    Retrieve the video's frame rate (ffprobe's r_frame_rate, via the probe cache).
     Returns a float (e.g., 29.97, 25.0, 60.0).
     """
-    try:
-        cmd = [
-            'ffprobe', '-v', 'error',
-            '-select_streams', 'v:0',
-            '-show_entries', 'stream=r_frame_rate',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            file_path
-        ]
-        output = subprocess.check_output(cmd, universal_newlines=True).strip()
-        # ffprobe returns a rational like "30000/1001" or "25/1"
-        num, den = map(int, output.split('/'))
-        return num / den
-    except Exception as e:
+    info = probe_media(file_path)
+    if info is not None and info.frame_rate > 0:
+        return info.frame_rate
+    else:
         print_colored(f"Warning: Could not determine source frame rate for {file_path}, using {HIGH_RES_FRAME_RATE} fps as fallback.",
                       "get_video_frame_rate", 3)
         return HIGH_RES_FRAME_RATE  # fallback
 
 
-def clip_and_timestamp_ffmpeg(input_file, start_time, duration, output_file, prefix, series_text=None):  # per clip
-    start_clipping_time = time.time()
-    print(prefix)
+def record_clipping_time(duration, elapsed):
+    with clipping_times_lock:  # render pool workers finish out of order
+        if duration in clipping_times:
+            clipping_times[duration].append(elapsed)
+        else:
+            clipping_times[duration] = [elapsed]
+
 
+def get_output_frame_rate(input_file):
     # Determine output frame rate based on source resolution
     resolution = get_mp4_bounds(input_file)[1]
     if resolution >= HIGH_RES_THRESHOLD:
@@ -216,70 +273,327 @@ def clip_and_timestamp_ffmpeg(input_file, start_time, duration, output_file, pre
     else:
         frame_rate = get_video_frame_rate(input_file)
         print(f"Resolution {resolution}p < {HIGH_RES_THRESHOLD}p: using source frame rate ({frame_rate:.2f}fps)")
+    return frame_rate
 
-    script_path = build_clip_and_timestamp_script(input_file, start_time - CLIP_BUFFER_SECONDS, CLIP_BUFFER_SECONDS * 2 + duration,
-                                                  output_file, prefix, frame_rate, series_text)
 
-    print(f"Command written to {script_path}")
-    print_colored(f"writing to {os.path.basename(output_file)} for {duration + 2 * CLIP_BUFFER_SECONDS} seconds",
-                  "clip_and_timestamp_ffmpeg", -len(COLORS), 1)
+def run_ffmpeg(command, duration, on_progress):
+    """
+    Run an FFmpegCommand directly (no shell), reporting out_time / duration as 0..1 progress.
+    Waits for ffmpeg to exit; returns its FFmpegResult, printing the log tail if it failed.
+    """
+    def on_event(event):
+        if duration > 0:
+            # Use the UI handler (or the render pool) to update progress
+            on_progress(min(event.out_time / duration, 1))  # what's a lil 103% ever done to anyone, eh?
+
     try:
-        process = subprocess.Popen([script_path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                   universal_newlines=True)
+        result = run_ffmpeg_with_progress(command.argv(), on_event)
+    except OSError as e:  # ffmpeg missing/not executable
+        print_err(f"couldn't run ffmpeg: {e}", "run_ffmpeg")
+        return FFmpegResult(-1, None, str(e))
+
+    if not result.ok:
+        print_err(f"ffmpeg exited with {result.returncode}:\n{result.stderr_tail}", "run_ffmpeg")
+    elif result.last_event:
+        event = result.last_event
+        print_colored(f"done: {event.frame} frames, {event.out_time:.2f}s, {event.total_size / 1_000_000:.1f}MB "
+                      f"at {event.speed:.2f}x", "run_ffmpeg", ColorsEnum.CYAN.value, 1)
+    return result
+
+
+def clip_and_timestamp_ffmpeg(input_file, start_time, duration, output_file, prefix, series_text=None,
+                              on_progress=None, threads=None, input_offset=0):  # per clip
+    """
+    Render one clip. on_progress(0..1) defaults to driving the loading UI directly,
+    which is only safe from the main thread - render pool workers pass their own.
+    """
+    if on_progress is None:
+        on_progress = update_loading_ui
+
+    start_clipping_time = time.time()
+    print(prefix)
 
-        while True:
-            time.sleep(0.1)
-            line = process.stdout.readline()
+    frame_rate = get_output_frame_rate(input_file)
+    buffered_duration = duration + 2 * CLIP_BUFFER_SECONDS
 
-            if not line:
-                if process.poll() is not None:
-                    break  # process finished
-                continue  # nothing printed recently
+    temp_file = journal.begin(output_file)  # renamed to output_file only if ffmpeg succeeds
+    command = build_clip_and_timestamp_command(input_file, start_time - CLIP_BUFFER_SECONDS, buffered_duration,
+                                               temp_file, prefix, frame_rate, series_text, threads=threads,
+                                               input_offset=input_offset)
+    dump_debug_script(command, output_file)
 
-            line = line.strip()
-            if not (("fps=" in line) or ("bitrate=" in line)):
-                continue  # irrelevant line
+    print_colored(f"writing to {os.path.basename(output_file)} for {buffered_duration} seconds",
+                  "clip_and_timestamp_ffmpeg", -len(COLORS), 1)
+    result = run_ffmpeg(command, buffered_duration, on_progress)
+    promoted = journal.finish(output_file, result.ok)
+    check = verify_render(result, output_file, buffered_duration, frame_rate)
+    if promoted:
+        record_render(output_file, get_clip_fingerprint(input_file, start_time, duration, prefix, series_text), check)
+    source_cache.release(get_source_key(input_file), promoted and check.ok)  # pinned by clip_video
 
-            frame_match = re.search(r'frame=\s*(\d+)', line)
-            if frame_match:
-                current_frame = float(int(frame_match.group(1)))
-            else:
-                continue
+    end_clipping_time = time.time()
+    record_clipping_time(duration, end_clipping_time - start_clipping_time)
+    return result
 
-            fps_match = re.search(r'fps=\s*(\d+)', line)
-            if fps_match:
-                processing_fps = float(int(fps_match.group(1)))
-                if processing_fps < 1:
-                    processing_fps = 1
-            else:
-                continue
 
-            remaining = duration - (current_frame / frame_rate)
-            progress = min(round((duration - remaining) / duration * 100),
-                           100)  # what's a lil 103% ever done to anyone, eh?
+def clip_and_timestamp_chunked_ffmpeg(input_file, start_time, duration, output_file, prefix, series_text=None,
+                                      on_progress=None, threads=None, input_offset=0):  # per long clip
+    """
+    Render one long clip as chunks split at source keyframes (see chunked_render.py), encoded in parallel
+    and joined by stream copy. Falls back to clip_and_timestamp_ffmpeg when there's nowhere to split.
+    """
+    if on_progress is None:
+        on_progress = update_loading_ui
 
-            # Use the UI handler to update progress
-            update_loading_ui(min(progress / 100, 1))
+    frame_rate = get_output_frame_rate(input_file)
+    buffered_start = start_time - CLIP_BUFFER_SECONDS
+    buffered_duration = duration + 2 * CLIP_BUFFER_SECONDS
+    chunks = plan_chunks(keyframe_index.get(input_file), buffered_start - input_offset, buffered_duration, frame_rate)
+    if len(chunks) == 1:
+        return clip_and_timestamp_ffmpeg(input_file, start_time, duration, output_file, prefix, series_text,
+                                         on_progress=on_progress, threads=threads, input_offset=input_offset)
 
-            ETA = remaining * frame_rate / processing_fps
-            # progress_bar = ("|" * math.ceil(progress / 2)) + ("." * math.floor(50 - progress / 2))
-            # print(
-            #    f"{get_color(ColorsEnum.CYAN.value)}[{progress_bar}] {progress}% ETA: {round(ETA, 1)} seconds{RESET_COLOR}",
-            #    end='\r', flush=True
-            # )
+    start_clipping_time = time.time()
+    temp_file = journal.begin(output_file)
+    part_files = [f"{temp_file[:-4]}.part{n}.mp4" for n in range(len(chunks))]  # journal leftovers of temp_file
+    jobs = min(get_chunk_jobs(render_pool.jobs if render_pool is not None else 1), len(chunks))
+    chunk_threads = max(1, (threads or os.cpu_count() or 1) // jobs)
+    done_seconds = [0.0] * len(chunks)
+
+    def encode_chunk(n):
+        chunk_start, chunk_duration = chunks[n]
+        # each chunk's overlay starts at its own place in the source; the static label still names the clip
+        command = build_clip_and_timestamp_command(input_file, chunk_start + input_offset, chunk_duration,
+                                                   part_files[n], prefix, frame_rate, series_text,
+                                                   threads=chunk_threads, input_offset=input_offset,
+                                                   label_start=buffered_start)
+        dump_debug_script(command, part_files[n])
+
+        def on_chunk_progress(progress):
+            done_seconds[n] = progress * chunk_duration
+        return run_ffmpeg(command, chunk_duration, on_chunk_progress)
+
+    print_colored(f"writing {os.path.basename(output_file)} ({buffered_duration}s) as {len(chunks)} chunks, "
+                  f"{jobs} at a time", "clip_and_timestamp_chunked", -len(COLORS), 1)
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="chunk") as executor:
+        futures = [executor.submit(encode_chunk, n) for n in range(len(chunks))]
+        while wait(futures, timeout=0.25).not_done:  # on_progress stays on the calling thread
+            on_progress(sum(done_seconds) / buffered_duration)
+        results = [future.result() for future in futures]
+
+    failed = next((result for result in results if not result.ok), None)
+    ok = failed is None and concat_copy(part_files, temp_file)
+    result = FFmpegResult(failed.returncode if failed else (0 if ok else 1), None,
+                          failed.stderr_tail if failed else "")
+    promoted = journal.finish(output_file, ok)  # also removes the .partN files
+    if promoted:
+        check = verify_outputs(result, [(output_file, buffered_duration)])[0]
+        record_render(output_file, get_clip_fingerprint(input_file, start_time, duration, prefix, series_text), check)
+    else:
+        reason = f"ffmpeg exited with {failed.returncode}" if failed else "joining the chunks failed"
+        check = record_check(RenderCheck(output_file, buffered_duration, None, "failed", reason))
+    source_cache.release(get_source_key(input_file), promoted and check.ok)
 
-            if math.ceil(progress) > 99:
-                break  # process finished enough
+    record_clipping_time(duration, time.time() - start_clipping_time)
+    return result
 
-    except Exception as e:
-        print(e)
 
-    end_clipping_time = time.time()
-    global clipping_times
-    if duration in clipping_times:
-        clipping_times[duration].append(end_clipping_time - start_clipping_time)
-    else:
-        clipping_times[duration] = [end_clipping_time - start_clipping_time]
+def clip_and_timestamp_numpy(input_file, start_time, duration, output_file, prefix, series_text=None,
+                             on_progress=None, threads=None, input_offset=0):  # per clip, RenderEngine.NUMPY
+    """
+    Render one clip with the overlay drawn by numpy_overlay instead of drawtext: raw frames are piped
+    from a decoding ffmpeg through the overlay into an encoding one, which also takes the audio.
+    """
+    import numpy_overlay  # numpy is only needed by this engine
+
+    if on_progress is None:
+        on_progress = update_loading_ui
+
+    width, height = get_mp4_bounds(input_file)
+    if width % 2 or height % 2:  # frames are piped as yuv420p
+        return clip_and_timestamp_ffmpeg(input_file, start_time, duration, output_file, prefix, series_text,
+                                         on_progress=on_progress, threads=threads, input_offset=input_offset)
+
+    start_clipping_time = time.time()
+    print(prefix)
+
+    frame_rate = get_output_frame_rate(input_file)
+    buffered_start = start_time - CLIP_BUFFER_SECONDS
+    buffered_duration = duration + 2 * CLIP_BUFFER_SECONDS
+    seek = buffered_start - input_offset
+    global_thread_args, thread_args = get_thread_args(threads)
+
+    decoder = FFmpegCommand()
+    decoder.add_global('-v', 'error', *global_thread_args)
+    decoder.add_input(input_file, *thread_args, '-ss', seek)
+    decoder.add_output('pipe:1', '-t', buffered_duration, '-an', '-r', frame_rate, '-pix_fmt', 'yuv420p',
+                       '-f', 'rawvideo')
+
+    temp_file = journal.begin(output_file)
+    encoder = FFmpegCommand()
+    encoder.add_global('-y', *global_thread_args)
+    encoder.add_input('pipe:0', '-f', 'rawvideo', '-pix_fmt', 'yuv420p', '-s', f"{width}x{height}",
+                      '-framerate', frame_rate)
+    encoder.add_input(input_file, *thread_args, '-ss', seek, '-t', buffered_duration)  # audio
+    encoder.add_output(
+        temp_file,
+        '-map', '0:v', '-map', '1:a?',
+        *get_video_encoder_args(),
+        '-pix_fmt', 'yuv420p',
+        '-r', frame_rate,
+        *thread_args
+    )
+    print_command(decoder, "clip_and_timestamp_numpy")
+    print_command(encoder, "clip_and_timestamp_numpy")
+
+    draw_type = TIMESTAMP_ARGS.get("draw_type", "updating").lower()
+    static_text = get_static_label(prefix, buffered_start) if draw_type == DrawType.STATIC.value else None
+    print_colored(f"writing to {os.path.basename(output_file)} for {buffered_duration} seconds",
+                  "clip_and_timestamp_numpy", -len(COLORS), 1)
+    try:
+        overlay = numpy_overlay.TimestampOverlay(FONT_PATH, get_timestamp_layout(input_file), prefix, buffered_start,
+                                                 frame_rate, series_text, static_text)
+        result = numpy_overlay.run_overlay_pipeline(decoder.argv(), encoder.argv(), width, height, overlay,
+                                                    round(buffered_duration * frame_rate), on_progress)
+    except (OSError, RuntimeError) as e:  # ffmpeg missing, or the glyphs couldn't be rendered
+        print_err(f"couldn't run the numpy overlay: {e}", "clip_and_timestamp_numpy")
+        result = FFmpegResult(-1, None, str(e))
+    if not result.ok:
+        print_err(f"ffmpeg exited with {result.returncode}:\n{result.stderr_tail}", "clip_and_timestamp_numpy")
+
+    promoted = journal.finish(output_file, result.ok)
+    check = verify_render(result, output_file, buffered_duration, frame_rate)
+    if promoted:
+        record_render(output_file, get_clip_fingerprint(input_file, start_time, duration, prefix, series_text), check)
+    source_cache.release(get_source_key(input_file), promoted and check.ok)
+
+    record_clipping_time(duration, time.time() - start_clipping_time)
+    return result
+
+
+def build_multi_output_command(input_file, clips, frame_rate, series_text=None, threads=None, input_offset=0):
+    """
+    One ffmpeg for several clips of the same source. Each clip is its own fast-seeked input
+    (-ss/-t before -i), gets its own drawtext chain, and is encoded to its own output.
+    :param clips: list of (start_time, duration, output_file, prefix), buffer already applied
+    :param input_offset: where input_file starts in the source video, see build_clip_and_timestamp_command
+    """
+    global_thread_args, thread_args = get_thread_args(threads)
+
+    command = FFmpegCommand()
+    command.add_global('-y', *global_thread_args)
+    command.filter_graph = FilterGraph()
+
+    for start_time, duration, output_file, prefix in clips:
+        i = command.add_input(input_file, *thread_args, '-ss', start_time - input_offset, '-t', duration)
+        command.filter_graph.add(FilterChain(build_timestamp_filters(input_file, start_time, duration, prefix, series_text),
+                                             inputs=[f"{i}:v"], outputs=[f"v{i}"]))
+        command.add_output(
+            output_file,
+            '-map', f"[v{i}]",
+            '-map', f"{i}:a?",
+            *get_video_encoder_args(),
+            '-r', frame_rate,
+            *thread_args
+        )
+
+    print_command(command, "clip_and_timestamp_multi")
+    return command
+
+
+def clip_and_timestamp_multi_ffmpeg(input_file, clips, series_text=None, on_progress=None, threads=None,
+                                    input_offset=0):  # per batch
+    """
+    Render a batch of clips from one source in a single ffmpeg process.
+    :param clips: list of (start_time, duration, output_file, prefix), start_time in seconds, unbuffered
+    """
+    if on_progress is None:
+        on_progress = update_loading_ui
+
+    start_clipping_time = time.time()
+    frame_rate = get_output_frame_rate(input_file)
+
+    # longest first, so the first output's debug script / progress label covers the whole run
+    buffered = sorted(
+        [(start_time - CLIP_BUFFER_SECONDS, duration + 2 * CLIP_BUFFER_SECONDS, output_file, prefix)
+         for start_time, duration, output_file, prefix in clips],
+        key=lambda clip: clip[1], reverse=True
+    )
+
+    temp_outputs = [(start_time, duration, journal.begin(output_file), prefix)
+                    for start_time, duration, output_file, prefix in buffered]
+    command = build_multi_output_command(input_file, temp_outputs, frame_rate, series_text, threads=threads,
+                                         input_offset=input_offset)
+    dump_debug_script(command, buffered[0][2])
+
+    print_colored(f"writing {len(buffered)} clips from {os.path.basename(input_file)} in one pass",
+                  "clip_and_timestamp_multi", -len(COLORS), 1)
+    result = run_ffmpeg(command, buffered[0][1], on_progress)
+    promoted = {output_file: journal.finish(output_file, result.ok) for start_time, duration, output_file, prefix in clips}
+    checks = verify_outputs(result, [(output_file, duration) for start_time, duration, output_file, prefix in buffered])
+    checks = {check.path: check for check in checks}
+    for start_time, duration, output_file, prefix in clips:
+        if promoted[output_file]:
+            record_render(output_file, get_clip_fingerprint(input_file, start_time, duration, prefix, series_text),
+                          checks[output_file])
+        source_cache.release(get_source_key(input_file), promoted[output_file] and checks[output_file].ok)
+
+    # split the batch's wall time over its clips so the per-duration averages stay comparable
+    elapsed = time.time() - start_clipping_time
+    total_units = sum(clip[1] for clip in buffered)
+    for start_time, duration, output_file, prefix in clips:
+        record_clipping_time(duration, elapsed * (duration + 2 * CLIP_BUFFER_SECONDS) / total_units)
+    return result
+
+
+def clip_and_timestamp_window_ffmpeg(input_file, window, series_text=None, on_progress=None, threads=None,
+                                     input_offset=0):  # per merged window
+    """
+    Render the clips of a RenderWindow with one encode of the whole window, keyframes forced at every
+    clip boundary, then cut each clip out of it by stream copy.
+    """
+    if on_progress is None:
+        on_progress = update_loading_ui
+
+    start_clipping_time = time.time()
+    frame_rate = get_output_frame_rate(input_file)
+
+    temp_files = {output_file: journal.begin(output_file) for start_time, duration, output_file, *rest in window.clips}
+    window_file = get_window_file(temp_files[window.clips[0][2]])  # a leftover of that clip, for recovery
+    command = build_clip_and_timestamp_command(input_file, window.start, window.duration, window_file, window.prefix,
+                                               frame_rate, series_text, threads=threads, input_offset=input_offset,
+                                               force_key_frames=window.key_frames(frame_rate))
+    dump_debug_script(command, window.clips[0][2])
+
+    print_colored(f"writing {len(window.clips)} overlapping clips from one {window.duration:.0f}s window of "
+                  f"{os.path.basename(input_file)}", "clip_and_timestamp_window", -len(COLORS), 1)
+    result = run_ffmpeg(command, window.duration, on_progress)
+
+    cuts = {}  # output file -> (length, cut ok); every cut is made before finish() removes the window file
+    for start_time, duration, output_file, prefix, unit_amount in window.clips:
+        offset, length = window.cut(start_time, duration, frame_rate)
+        seek = offset + KEYFRAME_SLACK / frame_rate  # lands on the keyframe at offset, see RenderWindow.key_frames
+        cuts[output_file] = length, result.ok and cut_copy(window_file, seek, length, temp_files[output_file])
+
+    for start_time, duration, output_file, prefix, unit_amount in window.clips:
+        length, cut_ok = cuts[output_file]
+        promoted = journal.finish(output_file, cut_ok)
+        if promoted:
+            check = verify_outputs(result, [(output_file, length)])[0]
+            record_render(output_file, get_clip_fingerprint(input_file, start_time, duration, prefix, series_text),
+                          check)
+        else:
+            reason = f"ffmpeg exited with {result.returncode}" if not result.ok else "stream copy cut failed"
+            check = record_check(RenderCheck(output_file, length, None, "failed", reason))
+        source_cache.release(get_source_key(input_file), promoted and check.ok)
+    if os.path.exists(window_file):
+        os.remove(window_file)
+
+    elapsed = time.time() - start_clipping_time
+    total_units = sum(clip[4] for clip in window.clips)
+    for start_time, duration, output_file, prefix, unit_amount in window.clips:
+        record_clipping_time(duration, elapsed * unit_amount / total_units)
+    return result
 
 
 work_units_total = 0
@@ -291,73 +605,442 @@ work_units_active_total = 0
 work_units_active_completed = 0
 
 
-def clip_video(timestamps, video_filename, prefix="", series_text=None):
+def render_clip_batch(section, batch, series_text):
+    """Render (or queue) one multi-output batch of (start_sec, duration, output_file, prefix, unit_amount) from a Section"""
+    ui = get_ui_handler()
+    clips = [clip[:4] for clip in batch]
+    units = sum(clip[4] for clip in batch)
+
+    if render_pool is not None:
+        render_pool.submit(batch[0][2], clip_and_timestamp_multi_ffmpeg, section.path, clips, series_text,
+                           input_offset=section.start,
+                           on_done=lambda key, error, units=units: ui.increment_work_units(units, active=True))
+        render_pool.poll()
+        return
+
+    clip_and_timestamp_multi_ffmpeg(section.path, clips, series_text, input_offset=section.start)
+    ui.increment_work_units(units, active=True)
+
+
+def render_window(section, window, series_text):
+    """Render (or queue) the clips of one merged RenderWindow from a Section"""
+    ui = get_ui_handler()
+    units = sum(clip[4] for clip in window.clips)
+
+    if render_pool is not None:
+        render_pool.submit(window.clips[0][2], clip_and_timestamp_window_ffmpeg, section.path, window, series_text,
+                           input_offset=section.start,
+                           on_done=lambda key, error, units=units: ui.increment_work_units(units, active=True))
+        render_pool.poll()
+        return
+
+    clip_and_timestamp_window_ffmpeg(section.path, window, series_text, input_offset=section.start)
+    ui.increment_work_units(units, active=True)
+
+
+def should_chunk(unit_amount):
+    return CHUNKED_RENDER and unit_amount >= CHUNK_MIN_SECONDS
+
+
+def render_single_clip(section, clip, series_text):
+    """Render (or queue) one (start_sec, duration, output_file, prefix, unit_amount) from a Section"""
+    ui = get_ui_handler()
+    start_time, duration, output_file, prefix, unit_amount = clip
+    if RENDER_ENGINE == RenderEngine.NUMPY.value:
+        render_fn = clip_and_timestamp_numpy
+    elif should_chunk(unit_amount):
+        render_fn = clip_and_timestamp_chunked_ffmpeg
+    else:
+        render_fn = clip_and_timestamp_ffmpeg
+
+    if render_pool is not None:
+        # counters are bumped from the main thread when the pool reports the clip done
+        render_pool.submit(output_file, render_fn,
+                           section.path, start_time, duration, output_file, prefix, series_text,
+                           input_offset=section.start,
+                           on_done=lambda key, error, units=unit_amount: ui.increment_work_units(units, active=True))
+        render_pool.poll()
+        return
+
+    render_fn(section.path, start_time, duration, output_file, prefix, series_text, input_offset=section.start)
+    ui.increment_work_units(unit_amount, active=True)
+
+
+def can_merge_windows():
+    # the static overlay names each clip's own start, so overlapping clips can't share frames;
+    # windows are drawtext renders, so the numpy engine renders every clip on its own
+    return MERGE_CLIP_WINDOWS and TIMESTAMP_ARGS.get("draw_type", "updating").lower() == DrawType.UPDATING.value \
+        and RENDER_ENGINE != RenderEngine.NUMPY.value
+
+
+def render_clips(section, clips, series_text):
+    """
+    Render (or queue) clips [(start_sec, duration, output_file, prefix, unit_amount)] read from one Section:
+    overlapping ones as merged windows (see window_planner.py), the rest with RENDER_ENGINE
+    """
+    singles = []
+    if can_merge_windows():
+        for window in plan_windows(clips):
+            if len(window.clips) > 1:
+                render_window(section, window, series_text)
+            else:
+                singles.extend(window.clips)
+    else:
+        singles = clips
+
+    if RENDER_ENGINE == RenderEngine.MULTI.value:
+        batched = [clip for clip in singles if not should_chunk(clip[4])]  # long clips render on their own
+        for i in range(0, len(batched), MULTI_OUTPUT_BATCH):
+            render_clip_batch(section, batched[i:i + MULTI_OUTPUT_BATCH], series_text)
+        singles = [clip for clip in singles if should_chunk(clip[4])]
+    for clip in singles:
+        render_single_clip(section, clip, series_text)
+
+
+def clip_video(timestamps, video_filename, prefix="", series_text=None, sources=None):
+    """
+    :param sources: SourceSections to render from (see downloader.py); defaults to the full
+        download at OUTPUT_DIR/video_filename, which must then exist
+    """
     ui = get_ui_handler()
 
     video_filepath = os.path.join(OUTPUT_DIR, video_filename)
-    if not os.path.exists(video_filepath):
-        print_err(f"Failed to clip {video_filepath} as it does not exist!")
-        return False
+    if sources is None:
+        if not os.path.exists(video_filepath):
+            print_err(f"Failed to clip {video_filepath} as it does not exist!")
+            return False
+        sources = SourceSections.full(video_filepath)
 
     start_time_clipping = time.time()
     clip_files = []
     output_folder = os.path.join(OUTPUT_DIR, sanitize(video_filename[:-4])).lower()
+    clips_by_section = {}  # Section -> clips to render from it, rendered once all are known so they can be merged
 
     for start_time, duration in timestamps.items():
+        if start_time in ("name", "prefix", "aliases"):
+            continue
         unit_amount = duration + 2 * CLIP_BUFFER_SECONDS
+        output_file = get_clip_output_file(output_folder, prefix, start_time)
 
-        if not should_process_clip(start_time, prefix, output_folder):
+        clip_fingerprint = get_clip_fingerprint(video_filepath, timestamp_to_sec(start_time), duration, prefix,
+                                                series_text)
+        if manifest.is_current(output_file, clip_fingerprint):  # including clips get_clips_to_render linked
+            ui.increment_work_units(unit_amount)
+            continue
+        section = sources.locate(*clip_window(timestamp_to_sec(start_time), duration))
+        if section is None:
+            print_err(f"no downloaded section of {video_filename} covers the clip at {start_time}", "clip_video")
             ui.increment_work_units(unit_amount)
             continue
+        if os.path.exists(output_file):
+            print_colored(f"{output_file} was rendered from different settings, re-rendering", "clip_video",
+                          ColorsEnum.YELLOW.value)
 
         # Add to active work units
         ui.add_active_work_units(unit_amount)
         ui.set_active_start_time()
 
-        filename = f"{prefix}_{start_time.replace(':', '..')}_timestamped.mp4".lower()
-        output_file = os.path.join(output_folder, filename).replace(" ", "_")
-
-        if os.path.exists(output_file):
-            print_colored(f"Skipping {output_file} as it already exists.", "extract_clips_ffmpeg", 2)
-            clip_files.append(output_file)
-
+        if render_pool is not None and render_pool.is_scheduled(output_file):
             ui.increment_work_units(unit_amount, active=True)
             continue
 
-        clip_and_timestamp_ffmpeg(video_filepath, timestamp_to_sec(start_time), duration, output_file, prefix, series_text)
+        source_cache.pin(video_filepath)  # until the render is verified
+        clips_by_section.setdefault(section, []).append(
+            (timestamp_to_sec(start_time), duration, output_file, prefix, unit_amount))
         clip_files.append(output_file)
 
-        ui.increment_work_units(unit_amount, active=True)
+    for section, clips in clips_by_section.items():
+        render_clips(section, clips, series_text)
 
-    video_clipping_times.append((video_filename[:-4], time.time() - start_time_clipping))
+    if render_pool is None:  # with a pool this only measures scheduling, not clipping
+        video_clipping_times.append((video_filename[:-4], time.time() - start_time_clipping))
     return clip_files
 
 
-def clip_video_strategy(index, video_url, video_timestamps, prefix, video_filename):
+def get_combined_output_file(output_folder, prefix):
+    return os.path.join(output_folder, f"{prefix}_combined.mp4".lower()).replace(" ", "_")
+
+
+def build_combined_command(input_file, segments, output_file, frame_rate, series_text=None, with_audio=True,
+                           threads=None, input_offset=0):
+    """
+    Compile several windows of one source into one file. Every segment is its own fast-seeked input
+    (-ss/-t before -i) so only the clipped footage is decoded, unlike trim= which decodes from frame 0.
+    :param segments: list of (start_time, duration, prefix), buffer already applied
+    :param input_offset: where input_file starts in the source video, see build_clip_and_timestamp_command
+    """
+    global_thread_args, thread_args = get_thread_args(threads)
+
+    command = FFmpegCommand()
+    command.add_global('-y', *global_thread_args)
+    command.filter_graph = FilterGraph()
+
+    concat_inputs = []
+    for start_time, duration, prefix in segments:
+        i = command.add_input(input_file, *thread_args, '-ss', start_time - input_offset, '-t', duration)
+        command.filter_graph.add(FilterChain(build_timestamp_filters(input_file, start_time, duration, prefix, series_text),
+                                             inputs=[f"{i}:v"], outputs=[f"v{i}"]))
+        concat_inputs += [f"v{i}", f"{i}:a"] if with_audio else [f"v{i}"]
+
+    command.filter_graph.add(FilterChain([Filter("concat", n=len(segments), v=1, a=1 if with_audio else 0)],
+                                         inputs=concat_inputs, outputs=["v", "a"] if with_audio else ["v"]))
+
+    command.add_output(
+        output_file,
+        '-map', "[v]",
+        *(['-map', "[a]", '-c:a', 'aac'] if with_audio else []),
+        *get_video_encoder_args(),
+        '-r', frame_rate,
+        *thread_args
+    )
+
+    print_command(command, "combine_and_timestamp")
+    return command
+
+
+def combine_and_timestamp_ffmpeg(input_file, clips, output_file, series_text=None, on_progress=None, threads=None,
+                                 sources=None):
+    """
+    Render every clip of a video back to back into output_file.
+    Segments are encoded COMBINED_BATCH_SIZE at a time, so the number of open decoders (and memory)
+    doesn't grow with the clip count; batches share encoder settings and are joined by stream copy.
+    :param clips: list of (start_time, duration, prefix), start_time in seconds, unbuffered, in order
+    :param sources: SourceSections to read from, defaults to input_file in full. A batch never spans sections
+    """
+    if on_progress is None:
+        on_progress = update_loading_ui
+    sources = sources or SourceSections.full(input_file)
+
+    start_clipping_time = time.time()
+    frame_rate = get_output_frame_rate(sources.sections[0].path)
+    with_audio = has_audio_stream(sources.sections[0].path)
+
+    segments = [(start_time - CLIP_BUFFER_SECONDS, duration + 2 * CLIP_BUFFER_SECONDS, prefix)
+                for start_time, duration, prefix in clips]
+    batches = []  # (section, segments)
+    for segment, (start_time, duration, prefix) in zip(segments, clips):
+        section = sources.locate(*clip_window(start_time, duration))
+        if section is None:
+            print_err(f"no downloaded section covers the clip at {start_time}s, not combining", "combine_and_timestamp")
+            source_cache.release(get_source_key(input_file), False)
+            return
+        if batches and batches[-1][0] == section and len(batches[-1][1]) < COMBINED_BATCH_SIZE:
+            batches[-1][1].append(segment)
+        else:
+            batches.append((section, [segment]))
+    total_seconds = sum(segment[1] for segment in segments)
+
+    print_colored(f"combining {len(segments)} clips into {os.path.basename(output_file)} ({len(batches)} batches)",
+                  "combine_and_timestamp", -len(COLORS), 1)
+
+    temp_file = journal.begin(output_file)  # .partN files are derived from it, so recovery finds them too
+    parts = []
+    done_seconds = 0
+    ok = True
+    for n, (section, batch) in enumerate(batches):
+        part_file = temp_file if len(batches) == 1 else f"{temp_file[:-4]}.part{n}.mp4"
+        batch_seconds = sum(segment[1] for segment in batch)
+
+        command = build_combined_command(section.path, batch, part_file, frame_rate, series_text, with_audio,
+                                         threads=threads, input_offset=section.start)
+        dump_debug_script(command, part_file)
+        result = run_ffmpeg(command, batch_seconds,
+                            lambda progress: on_progress((done_seconds + progress * batch_seconds) / total_seconds))
+        if not result.ok:
+            ok = False
+            break
+
+        done_seconds += batch_seconds
+        parts.append(part_file)
+
+    if ok and len(parts) > 1:
+        ok = concat_copy(parts, temp_file)
+    promoted = journal.finish(output_file, ok)  # also removes the .partN files
+    if promoted:
+        manifest.record(output_file, get_combined_fingerprint(input_file, clips, series_text))
+    source_cache.release(get_source_key(input_file), promoted)  # pinned by combine_video
+
+    elapsed = time.time() - start_clipping_time
+    for start_time, duration, prefix in clips:
+        record_clipping_time(duration, elapsed * (duration + 2 * CLIP_BUFFER_SECONDS) / total_seconds)
+
+
+def combine_video(timestamps, video_filename, prefix="", series_text=None, video_url=None):
+    """
+    --combined counterpart of clip_video: one <prefix>_combined.mp4 per video instead of one file per clip.
+    The source is only acquired (see get_sources) if the clips can't simply be joined.
+    """
     ui = get_ui_handler()
 
-    raw_index = index
-    effective_index = get_effective_index(TARGETS, raw_index)
-    alias = get_alias_for_index(TARGETS, str(raw_index))
+    video_filepath = os.path.join(OUTPUT_DIR, video_filename)
+    output_folder = os.path.join(OUTPUT_DIR, sanitize(video_filename[:-4])).lower()
+    os.makedirs(output_folder, exist_ok=True)
+    output_file = get_combined_output_file(output_folder, prefix)
+
+    clip_timestamps = [start_time for start_time in timestamps if start_time not in ("name", "prefix", "aliases")]
+    clips = [(timestamp_to_sec(start_time), timestamps[start_time], prefix) for start_time in clip_timestamps]
+    units = sum(duration + 2 * CLIP_BUFFER_SECONDS for start_time, duration, prefix in clips)
+
+    combined_fingerprint = get_combined_fingerprint(video_filepath, clips, series_text)
+    if not clips or manifest.is_current(output_file, combined_fingerprint):
+        print_colored(f"Skipping {output_file} as it already exists.", "combine_video", 2)
+        ui.increment_work_units(units)
+        return [output_file] if clips else False
+    if os.path.exists(output_file):
+        print_colored(f"{output_file} was rendered from different settings, re-rendering", "combine_video",
+                      ColorsEnum.YELLOW.value)
+
+    ui.add_active_work_units(units)
+    ui.set_active_start_time()
+
+    # clips already rendered by clip_video: just join them, no decode/encode at all
+    clip_files = [get_clip_output_file(output_folder, prefix, start_time) for start_time in clip_timestamps]
+    if all(manifest.is_current(clip_file, get_clip_fingerprint(video_filepath, *clip, series_text))
+           for clip_file, clip in zip(clip_files, clips)):
+        if journal.finish(output_file, compile_clips(clip_files, journal.begin(output_file))):
+            manifest.record(output_file, combined_fingerprint)
+            ui.increment_work_units(units, active=True)
+            return [output_file]
+        print_err(f"couldn't compile existing clips for {output_file}, rendering from source", "combine_video")
+
+    sources = get_sources(video_url, video_filepath, [clip[:2] for clip in clips])
+    if sources is None:
+        print_err(f"Failed to combine {video_filepath} as it does not exist!")
+        ui.increment_work_units(units, active=True)
+        return False
+
+    source_cache.pin(video_filepath)
+    if render_pool is not None:
+        render_pool.submit(output_file, combine_and_timestamp_ffmpeg, video_filepath, clips, output_file, series_text,
+                           sources=sources, on_done=lambda key, error: ui.increment_work_units(units, active=True))
+        render_pool.poll()
+        return [output_file]
+
+    combine_and_timestamp_ffmpeg(video_filepath, clips, output_file, series_text, sources=sources)
+    ui.increment_work_units(units, active=True)
+    return [output_file]
+
+
+def get_clips_to_render(timestamps, video_filename, prefix="", series_text=None):
+    """
+    (start_sec, duration) of every clip of this video that's missing or was rendered from a different spec.
+    Clips the shared clip store has are linked into place here, so they never need the source downloaded.
+    """
+    video_filepath = os.path.join(OUTPUT_DIR, video_filename)
+    output_folder = os.path.join(OUTPUT_DIR, sanitize(video_filename[:-4])).lower()
+    missing = []  # (start_sec, duration, fingerprint, output file)
+    for start_time, duration in timestamps.items():
+        if start_time in ("name", "prefix", "aliases"):
+            continue
+        clip_fingerprint = get_clip_fingerprint(video_filepath, timestamp_to_sec(start_time), duration, prefix,
+                                                series_text)
+        output_file = get_clip_output_file(output_folder, prefix, start_time)
+        if not manifest.is_current(output_file, clip_fingerprint):
+            missing.append((timestamp_to_sec(start_time), duration, clip_fingerprint, output_file))
+
+    if clip_store is not None:
+        # prefetch_source plans a video ahead of clip_video_strategy; the store is only asked once per clip
+        unchecked = [(clip_fingerprint, output_file) for _, _, clip_fingerprint, output_file in missing
+                     if clip_fingerprint not in clip_store_misses]
+        linked = clip_store.fetch_many(unchecked)
+        for clip_fingerprint, output_file in unchecked:
+            if output_file in linked:
+                manifest.record(output_file, clip_fingerprint)
+            else:
+                clip_store_misses.add(clip_fingerprint)
+        missing = [clip for clip in missing if clip[3] not in linked]
+    return [(start_sec, duration) for start_sec, duration, _, _ in missing]
 
-    metadata = TARGETS[0] if TARGETS else {}
-    series_text = metadata.get("series", None)
 
-    # Use alias if available, otherwise use prefix + effective index
+def get_sources(video_url, video_filepath, clips):
+    """
+    The download stage: SourceSections covering clips [(start_sec, duration)], downloaded if needed
+    (see downloader.py). Section files share their video's id, so fingerprints don't depend on them.
+    """
+    start_time_downloading = time.time()
+    sources = acquire_source(video_url, video_filepath, clips)
+    if sources is None:
+        return None
+
+    if video_filepath in source_ids:
+        for path in sources.paths():
+            source_ids[path] = source_ids[video_filepath]
+    if sources.downloaded:
+        video_downloading_times.append((os.path.basename(video_filepath)[:-4], time.time() - start_time_downloading))
+    return sources
+
+
+def get_display_name(index, prefix):
+    """The clip prefix shown for video index: its alias if it has one, otherwise prefix + effective index"""
+    alias = get_alias_for_index(TARGETS, str(index))
     if alias:
-        display_name = alias
+        return alias
+    return f"{prefix}{get_effective_index(TARGETS, index)}"
+
+
+def prefetch_source(index, video_url, video_timestamps, prefix, video_filename):
+    """
+    The download stage of clip_video_strategy on its own, run ahead of it by process_playlist's prefetcher.
+    Returns the bytes downloaded, which count against PREFETCH_DISK_BUDGET_GB until the video is processed.
+    """
+    display_name = get_display_name(index, prefix)
+    series_text = (TARGETS[0] if TARGETS else {}).get("series", None)
+
+    video_filepath = os.path.join(OUTPUT_DIR, video_filename)
+    source_ids[video_filepath] = extract_video_id(video_url)
+
+    if COMBINED_MODE:
+        output_folder = os.path.join(OUTPUT_DIR, sanitize(video_filename[:-4])).lower()
+        clips = [(timestamp_to_sec(start_time), duration) for start_time, duration in video_timestamps.items()
+                 if start_time not in ("name", "prefix", "aliases")]
+        combined_fingerprint = get_combined_fingerprint(
+            video_filepath, [(*clip, display_name) for clip in clips], series_text)
+        if manifest.is_current(get_combined_output_file(output_folder, display_name), combined_fingerprint):
+            clips = []
+        elif not get_clips_to_render(video_timestamps, video_filename, display_name, series_text):
+            clips = []  # combine_video joins the existing clips without touching the source
     else:
-        display_name = f"{prefix}{effective_index}"
+        clips = get_clips_to_render(video_timestamps, video_filename, display_name, series_text)
+    if not clips:
+        return 0
 
-    if not should_process_clips(video_filename[:-4], video_timestamps, OUTPUT_DIR, display_name):
-        print_colored(f"Skipping {video_filename} as its clips already exist.", "clip_video_thread", 2)
+    sources = get_sources(video_url, video_filepath, clips)
+    if sources is None or not sources.downloaded:
+        return 0
+    return sum(os.path.getsize(path) for path in sources.paths() if os.path.exists(path))
 
-        total_units = sum(duration + 2 * CLIP_BUFFER_SECONDS for duration in video_timestamps.values())
-        ui.increment_work_units(total_units)
-        return False
 
-    temp = clip_video(video_timestamps, video_filename, display_name, series_text)
-    return temp
+def clip_video_strategy(index, video_url, video_timestamps, prefix, video_filename):
+    ui = get_ui_handler()
+
+    metadata = TARGETS[0] if TARGETS else {}
+    series_text = metadata.get("series", None)
+    display_name = get_display_name(index, prefix)
+
+    video_filepath = os.path.join(OUTPUT_DIR, video_filename)
+    source_ids[video_filepath] = extract_video_id(video_url)
+
+    source_cache.pin(video_filepath)  # while this video is processed; queued renders hold pins of their own
+    try:
+        if COMBINED_MODE:
+            return combine_video(video_timestamps, video_filename, display_name, series_text, video_url)
+
+        clips_to_render = get_clips_to_render(video_timestamps, video_filename, display_name, series_text)
+        if not clips_to_render:
+            print_colored(f"Skipping {video_filename} as its clips already exist.", "clip_video_thread", 2)
+
+            total_units = sum(duration + 2 * CLIP_BUFFER_SECONDS for duration in video_timestamps.values())
+            ui.increment_work_units(total_units)
+            return False
+
+        sources = get_sources(video_url, video_filepath, clips_to_render)
+        if sources is None:
+            print_err(f"Failed to clip {video_filepath} as it does not exist and couldn't be downloaded!")
+            return False
+
+        return clip_video(video_timestamps, video_filename, display_name, series_text, sources=sources)
+    finally:
+        source_cache.release(video_filepath)
 
 
 def format_timestamp(timestamp):  # unused
@@ -368,22 +1051,49 @@ def format_timestamp(timestamp):  # unused
 
 
 if __name__ == "__main__":
+    args = get_args()
+    RENDER_ENGINE = args.engine or RENDER_ENGINE
+    COMBINED_MODE = args.combined or COMBINED_MODE
+    CHUNKED_RENDER = args.chunked or CHUNKED_RENDER
+    DEBUG_FFMPEG_SCRIPTS = args.debug_script or DEBUG_FFMPEG_SCRIPTS
+    if RENDER_ENGINE == RenderEngine.NUMPY.value and importlib.util.find_spec("numpy") is None:
+        print_err("the numpy render engine needs numpy: pip install numpy", "tatoclip")
+        sys.exit(1)
+    if args.jobs > 1:
+        render_pool = RenderPool(args.jobs)
+
+    journal.recover()  # partial outputs from an interrupted run
+
     calculate_total_work_units(TARGETS)
     init_loading_ui()
-    process_targets_with(clip_video_strategy)
+    process_targets_with(clip_video_strategy, prefetch_source)
+    if render_pool is not None:
+        print_colored(f"waiting on {render_pool.pending()} queued clips...", "tatoclip", 4)
+        render_pool.wait(on_tick=lambda: update_loading_ui(render_pool.active_progress()))
+        render_pool.shutdown()
     close_ui()
 
     print("Processing completed.")
     print()
 
     print(clipping_times)
+    print_probe_stats()
+    if manifest.adopted:
+        print(f"manifest: adopted {manifest.adopted} clips rendered before it existed")
+    manifest.save()
+    if clip_store is not None:
+        clip_store.print_stats()
+    source_cache.print_stats()
+    ytdlp.print_stats()
+    if CHUNKED_RENDER:
+        print_keyframe_stats()
     for duration, times in clipping_times.items():
         if times:  # Ensure the list isn't empty
             average_time = sum(times) / len(times)
             print(f"Duration {duration}s: Average Clipping Time = {average_time:.2f} seconds")
     
     import validate_durations
-    validate_durations.main()
+    validate_durations.report(validate_durations.validate(TARGETS, session_checks=get_session_checks()))
 
     input("\n\nPress enter to close")
     sys.exit(0)
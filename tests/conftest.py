@@ -0,0 +1,26 @@
+# conftest.py
+# most modules import common, which reads config.json and targets.json from the working directory (and imports
+# yt_dlp). tests that need them ask for project_dir, a scratch project the session then stays in, since the
+# caches common's modules save at exit are relative paths too.
+import os
+import json
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def project_dir(tmp_path_factory):
+    pytest.importorskip("yt_dlp")
+    path = tmp_path_factory.mktemp("project")
+    with open(os.path.join(REPO_DIR, "config.json"), 'r') as f:
+        config = json.load(f)
+    config["FONT_PATH"] = str(path / "font.ttf")  # only has to exist; nothing is drawn
+    (path / "font.ttf").write_bytes(b"")
+    with open(path / "config.json", 'w') as f:
+        json.dump(config, f)
+    with open(path / "targets.json", 'w') as f:
+        json.dump([{"url": "https://www.youtube.com/playlist?list=TEST", "name": "test", "version": 1}], f)
+    os.chdir(path)
+    return path
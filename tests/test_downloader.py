@@ -0,0 +1,98 @@
+# test_downloader.py
+# how clips find their part of a sectioned download and seek within it, without downloading anything: section
+# files are named by the whole-second window they hold, and a clip at source time t in a section starting at s
+# seeks to t - s in that file while its overlay still shows t
+import json
+
+import pytest
+
+
+@pytest.fixture
+def downloader(project_dir):
+    import downloader
+    return downloader
+
+
+@pytest.fixture
+def tatoclip(project_dir, monkeypatch):
+    import tatoclip
+    monkeypatch.setattr(tatoclip, "get_mp4_bounds", lambda video_path: [1920, 1080])  # no file to probe
+    monkeypatch.setattr(tatoclip, "get_video_encoder_args", lambda: ["-c:v", "libx264"])
+    return tatoclip
+
+
+def make_sections(downloader, tmp_path, names, duration=None):
+    section_dir = tmp_path / "part_1.sections"
+    section_dir.mkdir()
+    for name in names:
+        (section_dir / name).write_bytes(b"")
+    if duration is not None:
+        with open(section_dir / downloader.SOURCE_INFO_FILE, 'w') as f:
+            json.dump({"url": "", "duration": duration}, f)
+    return downloader.SourceSections.from_dir(str(section_dir))
+
+
+def get_seek(args):
+    return float(args[args.index("-ss") + 1])
+
+
+def test_section_windows_round_out(downloader, monkeypatch):
+    monkeypatch.setattr(downloader, "SECTION_MERGE_GAP", 0)
+    windows = [(10.2, 20.4), (40.5, 50.25), (40.5, 50.75)]
+    sections = downloader.get_section_windows(windows)
+    assert sections == [(10, 21), (40, 51)]
+    assert all(isinstance(value, int) for section in sections for value in section)  # what the names hold
+    for start, end in windows:
+        assert any(s <= start and end <= e for s, e in sections)
+
+
+def test_fractional_windows_are_found_again(downloader, tmp_path, monkeypatch):
+    """A window ending at x.5 used to be saved as <start>-<x>.mp4, which doesn't cover it: downloaded every run"""
+    monkeypatch.setattr(downloader, "SECTION_MERGE_GAP", 0)
+    windows = [(7.0, 20.5), (97.25, 130.0)]
+    names = [f"{start}-{end}.mp4" for start, end in downloader.get_section_windows(windows)]
+    sources = make_sections(downloader, tmp_path, names)
+    assert sources.missing(windows) == []
+
+
+def test_locate(downloader, tmp_path):
+    sources = make_sections(downloader, tmp_path, ["7-21.mp4", "97-130.mp4", "notes.txt"], duration=125.6)
+    assert [(section.start, section.end) for section in sources.sections] == [(7, 21), (97, 130)]
+
+    section = sources.locate(10, 18)
+    assert (section.start, section.end) == (7, 21)
+    assert section.path.endswith("7-21.mp4")
+    assert sources.locate(5, 18) is None    # starts before the section
+    assert sources.locate(18, 100) is None  # spans two sections
+    # the last section stops where the video does, short of the window asked for
+    assert sources.locate(110, 128.6).start == 97
+    assert sources.missing([(10, 18), (18, 100)]) == [(18, 100)]
+
+
+def test_full_source_covers_everything(downloader):
+    sources = downloader.SourceSections.full("part_1.mp4")
+    assert sources.locate(0, 10 ** 6).path == "part_1.mp4"
+
+
+def test_clip_seeks_within_its_section(downloader, tatoclip, tmp_path):
+    sources = make_sections(downloader, tmp_path, ["7-21.mp4", "97-130.mp4"])
+    start_time, duration = 100, 12
+    window_start, window_end = downloader.clip_window(start_time, duration)
+    section = sources.locate(window_start, window_end)
+    assert section.start == 97
+
+    command = tatoclip.build_clip_and_timestamp_command(section.path, window_start, window_end - window_start,
+                                                        "out.mp4", "Part 1", 30, input_offset=section.start)
+    args, path = command.inputs[0]
+    assert path == section.path
+    assert get_seek(args) == pytest.approx(window_start - section.start)
+    assert f"gmtime\\:{window_start}" in command.to_shell()  # the overlay is still in source time
+
+
+def test_multi_output_seeks_within_its_section(downloader, tatoclip, tmp_path):
+    sources = make_sections(downloader, tmp_path, ["97-130.mp4"])
+    clips = [(100, 5, "a.mp4", "Part 1"), (110, 8, "b.mp4", "Part 1")]
+    section = sources.locate(100, 118)
+    command = tatoclip.build_multi_output_command(section.path, clips, 30, input_offset=section.start)
+    assert [get_seek(args) for args, path in command.inputs] == [100 - 97, 110 - 97]
+    assert all(path == section.path for args, path in command.inputs)
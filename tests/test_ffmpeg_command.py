@@ -0,0 +1,39 @@
+# test_ffmpeg_command.py
+# text as it ends up in ffmpeg's argv after each escaping level. drawtext reads '\%' as a literal percent ('%%'
+# is a "Stray %" error) and '%{...}' as an expansion
+import pytest
+
+from ffmpeg_command import FFmpegCommand, Filter, FilterChain, escape_drawtext_text
+
+
+def drawtext_argv(text):
+    command = FFmpegCommand()
+    command.add_output("out.mp4", '-vf', FilterChain([Filter("drawtext", text=text, x=15)]))
+    return command.argv()
+
+
+@pytest.mark.parametrize("text, escaped", [
+    ("50% ", "50\\% "),
+    ("100%%", "100\\%\\%"),
+    ("a\\b", "a\\\\b"),
+    ("\\%", "\\\\\\%"),
+    ("Part 1: ", "Part 1: "),
+])
+def test_escape_drawtext_text(text, escaped):
+    assert escape_drawtext_text(text) == escaped
+
+
+def test_percent_prefix_in_argv():
+    text = escape_drawtext_text("50% ") + "%{pts:gmtime:0:%M}"
+    # option level doubles the backslash and escapes ':'; the graph level single-quotes the option list
+    assert drawtext_argv(text) == ['ffmpeg', '-vf', "drawtext='text=50\\\\% %{pts\\:gmtime\\:0\\:%M}:x=15'",
+                                   'out.mp4']
+
+
+def test_timestamp_label_in_argv(project_dir, monkeypatch):
+    import tatoclip
+    monkeypatch.setattr(tatoclip, "get_mp4_bounds", lambda video_path: [1920, 1080])
+    monkeypatch.setattr(tatoclip, "get_video_encoder_args", lambda: [])
+    command = tatoclip.build_clip_and_timestamp_command("in.mp4", 100, 5, "out.mp4", "50% ", 30)
+    vf = command.outputs[0][0][command.outputs[0][0].index('-vf') + 1]
+    assert "text=50\\\\% " in vf and "%%" not in vf
@@ -0,0 +1,90 @@
+# test_mp4_header.py
+# mp4_header against ffprobe on files ffmpeg makes (skipped without ffmpeg), and the files it must refuse rather
+# than misread or raise on, which probe.py then hands to ffprobe
+import json
+import shutil
+import struct
+import subprocess
+from fractions import Fraction
+
+import pytest
+
+from mp4_header import read_mp4_info, read_mp4_keyframes
+
+needs_ffmpeg = pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")),
+                                  reason="needs ffmpeg and ffprobe")
+
+
+def make_mp4(path, rate="30", size="320x240", seconds=2, faststart=False):
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"testsrc=size={size}:rate={rate}",
+                    "-f", "lavfi", "-i", "sine", "-t", str(seconds), "-pix_fmt", "yuv420p", "-shortest",
+                    *(["-movflags", "+faststart"] if faststart else []), str(path)], check=True)
+    return path
+
+
+def ffprobe(path):
+    result = subprocess.run(["ffprobe", "-v", "error", "-select_streams", "v:0",
+                             "-show_entries", "stream=width,height,r_frame_rate:format=duration", "-of", "json",
+                             str(path)], stdout=subprocess.PIPE, check=True)
+    output = json.loads(result.stdout)
+    return output["format"], output["streams"][0]
+
+
+def box(box_type, payload=b""):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("rate, size", [("30", "320x240"), ("30000/1001", "640x360"), ("60", "256x144")])
+def test_matches_ffprobe(tmp_path, rate, size):
+    path = make_mp4(tmp_path / "clip.mp4", rate, size)
+    media_format, streams = read_mp4_info(str(path))
+    expected_format, expected_video = ffprobe(path)
+
+    video = next(stream for stream in streams if stream["codec_type"] == "video")
+    assert media_format["duration"] == pytest.approx(float(expected_format["duration"]), abs=0.01)
+    assert (video["width"], video["height"]) == (expected_video["width"], expected_video["height"])
+    assert Fraction(video["r_frame_rate"]) == Fraction(expected_video["r_frame_rate"])
+    assert any(stream["codec_type"] == "audio" for stream in streams)
+
+
+@needs_ffmpeg
+def test_keyframes_start_at_zero(tmp_path):
+    keyframes = read_mp4_keyframes(str(make_mp4(tmp_path / "clip.mp4")))
+    assert keyframes and keyframes[0] == 0 and keyframes == sorted(keyframes)
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("faststart", [False, True])
+def test_truncated_file_is_refused(tmp_path, faststart):
+    path = make_mp4(tmp_path / "clip.mp4", faststart=faststart)
+    data = path.read_bytes()
+    moov = data.find(b"moov") - 4
+    path.write_bytes(data[:moov + 64])  # cut inside the moov box, wherever it is
+    assert read_mp4_info(str(path)) is None
+    assert read_mp4_keyframes(str(path)) is None
+
+
+@pytest.mark.parametrize("data", [
+    b"",                                                             # empty: can't be mapped
+    box(b"ftyp", b"isom\0\0\2\0") + box(b"mdat", b"\0" * 64),        # no moov
+    box(b"ftyp", b"isom\0\0\2\0") + struct.pack(">I4s", 4096, b"moov") + box(b"mvhd", b"\0" * 20),  # past the end
+    box(b"ftyp", b"isom\0\0\2\0") + box(b"moov"),                    # moov without mvhd
+    b"not an mp4 at all, just text",
+])
+def test_unreadable_header_returns_none(tmp_path, data):
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(data)
+    assert read_mp4_info(str(path)) is None
+    assert read_mp4_keyframes(str(path)) is None
+
+
+def test_probe_falls_back_to_ffprobe(project_dir, tmp_path, monkeypatch):
+    import probe
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(box(b"ftyp", b"isom\0\0\2\0") + box(b"mdat", b"\0" * 64))
+    from_ffprobe = probe.build_media_info({"duration": "2.0"}, [{"codec_type": "video", "width": 320, "height": 240,
+                                                                 "r_frame_rate": "30/1"}])
+    monkeypatch.setattr(probe, "probe_cache", probe.ProbeCache(str(tmp_path / "probe_cache.json")))
+    monkeypatch.setattr(probe, "run_ffprobe", lambda video_path: from_ffprobe)
+    assert probe.probe_media(str(path)) == from_ffprobe
@@ -0,0 +1,136 @@
+# test_ytdlp_client.py
+# retries, pooling and the circuit breaker of YtdlpClient against a fake extractor and a fake clock: no network,
+# yt-dlp, config or targets.json needed
+import pytest
+
+from ytdlp_client import YtdlpClient, YtdlpUnavailable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeExtractor:
+    """YoutubeDL stand-in; outcomes is a list of exceptions/infos to raise/return per call, then info for the rest"""
+
+    def __init__(self, outcomes=()):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.created = 0
+
+    def __call__(self, options):  # the client's factory
+        self.created += 1
+        return self
+
+    def extract_info(self, url, download=False):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else {"id": url}
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def dropped():
+    return OSError("Connection reset by peer")
+
+
+def make_client(extractor, clock=None, **kwargs):
+    sleeps = []
+    client = YtdlpClient(factory=extractor, sleep=sleeps.append, clock=clock or FakeClock(), **kwargs)
+    return client, sleeps
+
+
+def test_retries_transient_failures():
+    extractor = FakeExtractor([dropped(), dropped()])
+    client, sleeps = make_client(extractor, retries=3, backoff=1.0)
+    assert client.extract_info("a", {}) == {"id": "a"}
+    assert extractor.calls == 3
+    assert client.stats["retries"] == 2
+    assert len(sleeps) == 2
+    assert 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0  # jittered exponential backoff
+
+
+def test_gives_up_after_retries():
+    extractor = FakeExtractor([dropped()] * 10)
+    client, sleeps = make_client(extractor, retries=2, failure_threshold=10)
+    with pytest.raises(OSError):
+        client.extract_info("a", {})
+    assert extractor.calls == 3
+    assert len(sleeps) == 2
+
+
+def test_permanent_errors_are_not_retried():
+    extractor = FakeExtractor([Exception("ERROR: [youtube] a: Private video")] * 10)
+    client, sleeps = make_client(extractor, retries=3, failure_threshold=1)
+    for _ in range(3):
+        with pytest.raises(Exception, match="Private video"):
+            client.extract_info("a", {})
+    assert extractor.calls == 3
+    assert not sleeps
+    assert client.breaker.state == "closed"
+
+
+def test_reuses_clients_per_option_set():
+    extractor = FakeExtractor()
+    client, _ = make_client(extractor)
+    for url in "abc":
+        client.extract_info(url, {"quiet": True})
+    client.extract_info("d", {"quiet": False})
+    assert extractor.created == 2
+    assert client.stats["created"] == 2
+
+
+def test_breaker_opens_after_consecutive_failures():
+    extractor = FakeExtractor([dropped()] * 3)
+    client, _ = make_client(extractor, retries=0, failure_threshold=3, cooldown=60)
+    for _ in range(3):
+        with pytest.raises(OSError):
+            client.extract_info("a", {})
+    assert client.breaker.state == "open"
+    with pytest.raises(YtdlpUnavailable):
+        client.extract_info("b", {})
+    assert extractor.calls == 3  # rejected without calling out
+    assert client.stats["rejected"] == 1
+
+
+def test_breaker_half_open_recovers():
+    clock = FakeClock()
+    extractor = FakeExtractor([dropped()] * 2)
+    client, _ = make_client(extractor, clock, retries=0, failure_threshold=2, cooldown=60)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            client.extract_info("a", {})
+    clock.now += 59
+    assert client.breaker.state == "open"
+    clock.now += 1
+    assert client.breaker.state == "half_open"
+    assert client.extract_info("b", {}) == {"id": "b"}  # the trial call goes through and closes it
+    assert client.breaker.state == "closed"
+
+
+def test_breaker_failed_trial_reopens():
+    clock = FakeClock()
+    extractor = FakeExtractor([dropped()] * 3)
+    client, _ = make_client(extractor, clock, retries=0, failure_threshold=2, cooldown=60)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            client.extract_info("a", {})
+    clock.now += 60
+    with pytest.raises(OSError):
+        client.extract_info("b", {})
+    assert client.breaker.state == "open"
+    with pytest.raises(YtdlpUnavailable):
+        client.extract_info("c", {})
+
+
+def test_half_open_allows_one_trial_at_a_time():
+    clock = FakeClock()
+    client, _ = make_client(FakeExtractor(), clock, failure_threshold=1, cooldown=10)
+    client.breaker.record_failure()
+    clock.now += 10
+    assert client.breaker.allow()
+    assert not client.breaker.allow()
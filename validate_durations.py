@@ -1,58 +1,72 @@
 import os
 import sys
-import subprocess
+import json
+import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
 from common import *
 from metadata_handler import get_effective_index, get_alias_for_index
+from probe import probe_media, print_probe_stats
 
-# Tolerance in seconds for duration comparison
-DURATION_TOLERANCE = 1
+VALIDATE_JOBS = config.get("VALIDATE_JOBS", 8)  # concurrent probes; each cache miss is at most one ffprobe
+VALIDATION_REPORT_PATH = config.get("VALIDATION_REPORT_PATH", "validation_report.json")
 
-def get_video_duration(filepath):
-    """Return duration of video file in seconds using ffprobe."""
-    cmd = [
-        'ffprobe', '-v', 'error',
-        '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        filepath
-    ]
-    try:
-        output = subprocess.check_output(cmd, stderr=subprocess.STDOUT,
-                                         universal_newlines=True)
-        return float(output.strip())
-    except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
-        print_colored(f"Error getting duration for {filepath}: {e}",
-                      "validate", ColorsEnum.RED.value)
-        return None
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Validate rendered clip durations and optionally delete failed clips."
-    )
-    parser.add_argument('-y', '--yes', action='store_true',
-                        help='Automatically delete clips that fail due to duration mismatch')
-    args = parser.parse_args()
+class ClipCheck(NamedTuple):
+    path: str
+    raw_index: int
+    start_time: str
+    expected: float
+    actual: Optional[float]
+    status: str              # "ok", "fail" (duration mismatch), "unreadable", "missing"
+    checked_by: str = "probe"  # or "render": verified by the encode itself this session, not probed
 
-    # Ensure targets are loaded
-    load_targets()
 
-    if not isinstance(TARGETS, list) or len(TARGETS) < 2:
-        print_colored("Invalid or empty TARGETS data", "validate",
-                      ColorsEnum.RED.value)
-        sys.exit(1)
+class ValidationResult(NamedTuple):
+    checks: list
+
+    def count(self, *statuses):
+        return sum(1 for check in self.checks if check.status in statuses)
 
-    meta = TARGETS[0]
-    meta_prefix = meta.get("prefix", "Part ")
+    @property
+    def passed(self):
+        return self.count("ok")
 
-    total_clips = 0
-    passed = 0
-    failed = 0          # duration mismatch, file exists
-    missing = 0
-    failed_files = []   # paths of existing clips with duration mismatch
+    @property
+    def failed(self):
+        return self.count("fail", "unreadable")
+
+    @property
+    def missing(self):
+        return self.count("missing")
+
+    @property
+    def failed_files(self):
+        """Existing clips that failed, i.e. the ones worth deleting and re-rendering"""
+        return [check.path for check in self.checks if check.status in ("fail", "unreadable")]
+
+    @property
+    def ok(self):
+        return self.failed == 0 and self.missing == 0
+
+def get_video_duration(filepath):
+    """Return duration of video file in seconds (ffprobe via the shared probe cache)."""
+    info = probe_media(filepath)
+    if info is None or info.duration <= 0:
+        print_colored(f"Error getting duration for {filepath}",
+                      "validate", ColorsEnum.RED.value)
+        return None
+    return info.duration
+
+def get_expected_clips(targets):
+    """(clip_path, raw_index, start_time, expected_duration) for every timestamp in targets, named as clip_video() names them"""
+    meta_prefix = targets[0].get("prefix", "Part ")
+    expected = []
 
     # Iterate over each video entry (raw index 1,2,3...)
-    for raw_index in range(1, len(TARGETS)):
-        video_data = TARGETS[raw_index]
+    for raw_index in range(1, len(targets)):
+        video_data = targets[raw_index]
         if not isinstance(video_data, dict):
             continue
 
@@ -65,8 +79,8 @@ def main():
         video_folder = os.path.join(OUTPUT_DIR, folder_name)
 
         # Get effective index and alias for this raw index
-        effective_index = get_effective_index(TARGETS, raw_index)
-        alias = get_alias_for_index(TARGETS, str(raw_index))
+        effective_index = get_effective_index(targets, raw_index)
+        alias = get_alias_for_index(targets, str(raw_index))
 
         # Build the display name (the prefix used in the clip filename)
         if alias:
@@ -87,51 +101,111 @@ def main():
                 # Not a timestamp key – skip it
                 continue
 
-            expected_duration = duration + 2 * CLIP_BUFFER_SECONDS
+            clip_path = get_clip_output_file(video_folder, display_name, start_time)
+            expected.append((clip_path, raw_index, start_time, duration + 2 * CLIP_BUFFER_SECONDS))
+    return expected
 
-            # Build clip filename exactly as in clip_video()
-            safe_start = start_time.replace(':', '..')
-            filename = f"{display_name}_{safe_start}_timestamped.mp4".lower()
-            filename = filename.replace(" ", "_")   # remove any spaces
-            clip_path = os.path.join(video_folder, filename)
 
-            total_clips += 1
+def check_clip(clip_path, raw_index, start_time, expected_duration):
+    if not os.path.exists(clip_path):
+        return ClipCheck(clip_path, raw_index, start_time, expected_duration, None, "missing")
 
-            if not os.path.exists(clip_path):
-                print_colored(f"MISSING: {clip_path}", "validate",
-                              ColorsEnum.RED.value)
-                missing += 1
-                continue
+    actual_duration = get_video_duration(clip_path)
+    if actual_duration is None:
+        return ClipCheck(clip_path, raw_index, start_time, expected_duration, None, "unreadable")
+
+    status = "ok" if abs(actual_duration - expected_duration) <= DURATION_TOLERANCE else "fail"
+    return ClipCheck(clip_path, raw_index, start_time, expected_duration, actual_duration, status)
 
-            actual_duration = get_video_duration(clip_path)
-            if actual_duration is None:
-                failed += 1
-                failed_files.append(clip_path)
-                continue
 
-            diff = abs(actual_duration - expected_duration)
-            if diff <= DURATION_TOLERANCE:
-                print_colored(f"OK: {clip_path} ({actual_duration:.2f}s / {expected_duration:.2f}s)",
-                              "validate", ColorsEnum.GREEN.value)
-                passed += 1
-            else:
-                print_colored(f"FAIL: {clip_path} duration mismatch "
-                              f"(expected {expected_duration:.2f}s, got {actual_duration:.2f}s)",
-                              "validate", ColorsEnum.RED.value)
-                failed += 1
-                failed_files.append(clip_path)
+def from_render_check(render_check, raw_index, start_time):
+    """ClipCheck from the verification a clip's own encode did this session (see verification.py)"""
+    if render_check.ok:
+        status = "ok"
+    else:
+        status = "fail" if render_check.actual is not None else "unreadable"
+    return ClipCheck(render_check.path, raw_index, start_time, render_check.expected, render_check.actual,
+                     status, checked_by="render")
+
+
+def print_check(check, verbose=False):
+    match check.status:
+        case "ok" if verbose:
+            print_colored(f"OK: {check.path} ({check.actual:.2f}s / {check.expected:.2f}s)",
+                          "validate", ColorsEnum.GREEN.value)
+        case "fail":
+            print_colored(f"FAIL: {check.path} duration mismatch "
+                          f"(expected {check.expected:.2f}s, got {check.actual:.2f}s)",
+                          "validate", ColorsEnum.RED.value)
+        case "missing":
+            print_colored(f"MISSING: {check.path}", "validate", ColorsEnum.RED.value)
+
+
+def validate(targets=None, jobs=VALIDATE_JOBS, verbose=False, session_checks=None):
+    """
+    Check every expected clip's duration, jobs at a time. Probes go through the shared probe
+    cache, so clips that haven't changed since they were last probed cost no ffprobe spawn.
+    Clips in session_checks (output path -> verification.RenderCheck) were already verified by
+    their own encode this run and aren't probed again.
+    Returns a ValidationResult with one ClipCheck per expected clip, in targets order.
+    """
+    session_checks = session_checks or {}
+    targets = targets if targets is not None else load_targets()
+    if not isinstance(targets, list) or len(targets) < 2:
+        raise ValueError("Invalid or empty TARGETS data")
+
+    expected = get_expected_clips(targets)
+    def check(clip):
+        clip_path, raw_index, start_time, expected_duration = clip
+        if clip_path in session_checks:
+            return from_render_check(session_checks[clip_path], raw_index, start_time)
+        return check_clip(*clip)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        checks = list(pool.map(check, expected))
+
+    for check in checks:
+        print_check(check, verbose)
+    return ValidationResult(checks)
+
+
+def write_report(result, report_path=VALIDATION_REPORT_PATH):
+    report = {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "tolerance": DURATION_TOLERANCE,
+        "total": len(result.checks),
+        "passed": result.passed,
+        "failed": result.failed,
+        "missing": result.missing,
+        "clips": [check._asdict() for check in result.checks]
+    }
+    tmp_path = report_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=4)
+    os.replace(tmp_path, report_path)
+    return report_path
+
+
+def report(result, assume_yes=False, report_path=VALIDATION_REPORT_PATH):
+    """Print the summary, write the JSON report and offer to delete failed clips. Returns result.ok"""
+    failed_files = result.failed_files
 
     # Summary
     print("\n" + "="*50)
-    print(f"Total clips checked: {total_clips}")
-    print(f"Passed: {passed}")
-    print(f"Failed (duration mismatch): {failed}")
-    print(f"Missing: {missing}")
-    
-    should_delete = args.yes
-    if failed_files and not args.yes:
+    print(f"Total clips checked: {len(result.checks)}")
+    print(f"Passed: {result.passed}")
+    print(f"Failed (duration mismatch): {result.failed}")
+    print(f"Missing: {result.missing}")
+    verified = sum(1 for check in result.checks if check.checked_by == "render")
+    if verified:
+        print(f"Verified during render (not re-probed): {verified}")
+    print_probe_stats()
+    if report_path:
+        print(f"Report: {write_report(result, report_path)}")
+
+    should_delete = assume_yes
+    if failed_files and not assume_yes:
         should_delete = input(f"{len(failed_files)} clips failed: Delete? Y/N: ").lower().startswith("y")
-    
 
     # Auto‑delete failed files if requested
     if should_delete and failed_files:
@@ -149,14 +223,35 @@ def main():
             print(f"Ignoring {len(failed_files)} failed clip(s)...")
 
     # Final status
-    any_issues = (failed > 0 or missing > 0)
-    if not any_issues:
+    if result.ok:
         print_colored("All clips validated successfully.", "validate",
                       ColorsEnum.GREEN.value)
     else:
         print_colored("Some clips have issues.", "validate",
                       ColorsEnum.RED.value)
-        sys.exit(1)
+    return result.ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Validate rendered clip durations and optionally delete failed clips."
+    )
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help='Automatically delete clips that fail due to duration mismatch')
+    parser.add_argument('-j', '--jobs', type=int, default=VALIDATE_JOBS,
+                        help='Number of clips to probe concurrently')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Also print a line for every clip that passed')
+    parser.add_argument('--report', default=VALIDATION_REPORT_PATH,
+                        help='Where to write the JSON report (per-clip expected/actual/status)')
+    args = parser.parse_args(argv)
+
+    try:
+        result = validate(jobs=args.jobs, verbose=args.verbose)
+    except ValueError as e:
+        print_colored(str(e), "validate", ColorsEnum.RED.value)
+        return 1
+    return 0 if report(result, args.yes, args.report) else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
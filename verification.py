@@ -0,0 +1,98 @@
+# verification.py
+# every encode checks its own result as it finishes, from what ffmpeg already told us (exit status, final frame
+# count and out_time) - so the end-of-run validation only has to probe clips that weren't rendered this session.
+import os
+import threading
+from typing import NamedTuple, Optional
+
+from common import DURATION_TOLERANCE, print_colored, print_err, ColorsEnum
+from probe import probe_media
+
+
+class RenderCheck(NamedTuple):
+    path: str
+    expected: float          # buffered duration, seconds
+    actual: Optional[float]  # out_time (single output) or container duration (multi-output), None if unknown
+    status: str              # "verified" or "failed"
+    reason: str = ""
+
+    @property
+    def ok(self):
+        return self.status == "verified"
+
+
+session_checks = {}  # output path -> RenderCheck, for everything rendered this run
+_checks_lock = threading.Lock()
+
+
+def record_check(check):
+    with _checks_lock:  # render pool workers finish out of order
+        session_checks[check.path] = check
+    if check.ok:
+        print_colored(f"verified {os.path.basename(check.path)} ({check.actual:.2f}s / {check.expected:.2f}s)",
+                      "verify", ColorsEnum.GREEN.value, 1)
+    else:
+        print_err(f"{check.path} failed verification: {check.reason}", "verify")
+    return check
+
+
+def get_session_checks():
+    with _checks_lock:
+        return dict(session_checks)
+
+
+def check_output_exists(output_file, expected_duration):
+    if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
+        return RenderCheck(output_file, expected_duration, None, "failed", "no output written")
+    return None
+
+
+def verify_render(result, output_file, expected_duration, frame_rate):
+    """Verify a single-output encode from its FFmpegResult: exit status, final frame count and out_time"""
+    if not result.ok:
+        return record_check(RenderCheck(output_file, expected_duration, None, "failed",
+                                        f"ffmpeg exited with {result.returncode}"))
+    missing = check_output_exists(output_file, expected_duration)
+    if missing:
+        return record_check(missing)
+
+    event = result.last_event
+    if event is None:
+        return record_check(RenderCheck(output_file, expected_duration, None, "failed", "no progress reported"))
+
+    if abs(event.out_time - expected_duration) > DURATION_TOLERANCE:
+        return record_check(RenderCheck(output_file, expected_duration, event.out_time, "failed",
+                                        f"wrote {event.out_time:.2f}s"))
+    expected_frames = expected_duration * frame_rate
+    if abs(event.frame - expected_frames) > DURATION_TOLERANCE * frame_rate:
+        return record_check(RenderCheck(output_file, expected_duration, event.out_time, "failed",
+                                        f"wrote {event.frame} frames, expected ~{expected_frames:.0f}"))
+    return record_check(RenderCheck(output_file, expected_duration, event.out_time, "verified"))
+
+
+def verify_outputs(result, outputs):
+    """
+    Verify a multi-output encode. ffmpeg's progress only covers the process as a whole, so past the
+    exit status each output's duration comes from its mp4 header (no ffprobe spawn).
+    :param outputs: list of (output_file, expected_duration)
+    """
+    checks = []
+    for output_file, expected_duration in outputs:
+        if not result.ok:
+            checks.append(record_check(RenderCheck(output_file, expected_duration, None, "failed",
+                                                   f"ffmpeg exited with {result.returncode}")))
+            continue
+        missing = check_output_exists(output_file, expected_duration)
+        if missing:
+            checks.append(record_check(missing))
+            continue
+
+        info = probe_media(output_file)
+        if info is None:
+            checks.append(record_check(RenderCheck(output_file, expected_duration, None, "failed", "unreadable")))
+        elif abs(info.duration - expected_duration) > DURATION_TOLERANCE:
+            checks.append(record_check(RenderCheck(output_file, expected_duration, info.duration, "failed",
+                                                   f"wrote {info.duration:.2f}s")))
+        else:
+            checks.append(record_check(RenderCheck(output_file, expected_duration, info.duration, "verified")))
+    return checks
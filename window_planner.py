@@ -0,0 +1,67 @@
+# window_planner.py
+# clips of one video are often seconds apart, so their buffered windows overlap and the same footage gets encoded
+# two or three times. the planner groups clips whose windows overlap or nearly touch into one RenderWindow: one
+# encode of their union with keyframes forced at every clip boundary, out of which each clip is cut by stream copy.
+# the updating overlay shows source time, so a clip cut from its window looks exactly like its own render would.
+from typing import NamedTuple
+
+from common import config
+from downloader import clip_window
+
+MERGE_CLIP_WINDOWS = config.get("MERGE_CLIP_WINDOWS", True)
+WINDOW_MERGE_GAP = config.get("WINDOW_MERGE_GAP", 2)  # windows closer than this (s) are encoded together
+
+KEYFRAME_SLACK = 0.25  # frames between a forced keyframe's written time, its frame, and the seek that cuts there
+
+
+def snap(seconds, frame_rate):
+    """Nearest frame time, so a forced keyframe lands exactly where its clip is cut"""
+    return round(seconds * frame_rate) / frame_rate
+
+
+class RenderWindow(NamedTuple):
+    start: float  # buffered, in source seconds
+    end: float
+    clips: list   # (start_sec, duration, output_file, prefix, unit_amount), unbuffered like everywhere else
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    @property
+    def prefix(self):
+        return self.clips[0][3]
+
+    def cut(self, start_time, duration, frame_rate):
+        """(offset into the window's encode, length) of a clip's buffered window, on the frame grid"""
+        clip_start, clip_end = clip_window(start_time, duration)
+        offset = snap(clip_start - self.start, frame_rate)
+        return offset, snap(clip_end - self.start, frame_rate) - offset
+
+    def key_frames(self, frame_rate):
+        """
+        -force_key_frames value: every clip start and end inside the window, window time. Each is written
+        a quarter frame early: ffmpeg keys the first frame at or after it, and a rounded-up time would
+        key the frame after the cut (seek the cut a quarter frame late for the same reason).
+        """
+        times = set()
+        for start_time, duration, *rest in self.clips:
+            offset, length = self.cut(start_time, duration, frame_rate)
+            times.update((offset, offset + length))
+        return ",".join(f"{t - KEYFRAME_SLACK / frame_rate:.6f}" for t in sorted(times) if 0 < t < self.duration)
+
+
+def plan_windows(clips, gap=WINDOW_MERGE_GAP):
+    """
+    Group clips [(start_sec, duration, output_file, prefix, unit_amount)] read from one source into
+    RenderWindows, in start order. Clips with different prefixes never share a window (different overlay).
+    """
+    windows = []
+    for clip in sorted(clips, key=lambda clip: clip[0]):
+        start, end = clip_window(clip[0], clip[1])
+        if windows and windows[-1].prefix == clip[3] and start <= windows[-1].end + gap:
+            last = windows[-1]
+            windows[-1] = RenderWindow(last.start, max(last.end, end), last.clips + [clip])
+        else:
+            windows.append(RenderWindow(start, end, [clip]))
+    return windows
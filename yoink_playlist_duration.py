@@ -7,7 +7,7 @@ from metadata_handler import (
     resolve_alias_to_effective_index, get_alias_for_index
 )
 
-ensure_ytdlp()
+# the version check is only needed when the playlist has to be fetched (get_playlist_links_untrusted does it)
 
 def get_playlist_duration(playlist_url):    
     total_duration = 0
@@ -15,67 +15,48 @@ def get_playlist_duration(playlist_url):
     
     print(f"fetching playlist info for: {playlist_url}...")
     
-    try:
-        # get playlist info with durations
-        command = [
-            'yt-dlp',
-            '--flat-playlist',
-            '--dump-json',
-            '--playlist-end', '99999',  # all of them bitches
-            playlist_url
-        ]
-        
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        
-        # Parse each video's funny json dump
-        videos = []
-        for line in result.stdout.strip().split('\n'):
-            if line.strip():
-                try:
-                    video_data = json.loads(line)
-                    videos.append(video_data)
-                except json.JSONDecodeError:
-                    continue
-        
-        if not videos:
-            print("no videos? :megamind:")
+    # the flat playlist fetch caches every video's duration (and title), so a known playlist needs no network at all
+    video_urls = get_playlist_links(playlist_url)
+    durations = get_cached_durations(video_urls or [])
+    if not video_urls or len(durations) < len(video_urls):
+        video_urls = get_playlist_links_untrusted(playlist_url)
+        if video_urls is None:
             return 0
-        
-        print(f"found {len(videos)} videos\n")
-        
-        for i, video in enumerate(videos, 1):
-            # foreach, get duration
-            duration = video.get('duration')
-            title = video.get('title', f'Video {i}')
-            
-            if duration is None:
-                print(f"  video {i}: '{title}' - couldn't find shit for duration. It's None. The duration is fucking None.'")
-                continue
-            
-            total_duration += duration
-            video_count += 1
-            
-            # formatting
-            mins = duration // 60
-            secs = duration % 60
-            hours = mins // 60
-            mins = mins % 60
-            
-            if hours > 0:
-                duration_str = f"{hours}:{mins:02d}:{secs:02d}"
-            else:
-                duration_str = f"{mins}:{secs:02d}"
-            
-            print(f"  video {i}: {duration_str} - {title[:40]}")
-        
-    except subprocess.CalledProcessError as e:
-        print(f"error fetching playlist: {e}")
-        print(f"yt-dlp error: {e.stderr}")
-        return 0
-    except Exception as e:
-        print(f"unexpected error: {e}")
+        durations = get_cached_durations(video_urls)
+
+    if not video_urls:
+        print("no videos? :megamind:")
         return 0
-    
+
+    print(f"found {len(video_urls)} videos\n")
+    titles = metadata.get_many(TITLES, [extract_video_id(video_url) for video_url in video_urls])
+
+    for i, video_url in enumerate(video_urls, 1):
+        # foreach, get duration
+        duration = durations.get(video_url)
+        title = titles.get(extract_video_id(video_url), f'Video {i}')
+
+        if duration is None:
+            print(f"  video {i}: '{title}' - couldn't find shit for duration. It's None. The duration is fucking None.'")
+            continue
+
+        duration = int(duration)
+        total_duration += duration
+        video_count += 1
+
+        # formatting
+        mins = duration // 60
+        secs = duration % 60
+        hours = mins // 60
+        mins = mins % 60
+
+        if hours > 0:
+            duration_str = f"{hours}:{mins:02d}:{secs:02d}"
+        else:
+            duration_str = f"{mins}:{secs:02d}"
+
+        print(f"  video {i}: {duration_str} - {title[:40]}")
+
     print(f"\nprocessed {video_count} videos successfully")
     return total_duration
 
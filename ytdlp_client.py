@@ -0,0 +1,166 @@
+# ytdlp_client.py
+# metadata requests through yt-dlp's API without building a YoutubeDL per call: instances are kept per option set
+# and reused (extractors and the http session stay warm). transient failures (timeouts, 429/5xx, dropped
+# connections) are retried with jittered exponential backoff; a run of failed requests opens a circuit breaker
+# that fails calls fast until a cooldown passes, then lets one request through to probe. "this video is private"
+# isn't a failure of the service, so it's raised as is and doesn't count towards the breaker.
+import re
+import json
+import time
+import random
+import threading
+
+TRANSIENT_PATTERN = re.compile(r"HTTP Error (429|5\d\d)|timed out|timeout|Connection (reset|refused|aborted)|"
+                               r"Temporary failure|Remote end closed|IncompleteRead", re.IGNORECASE)
+
+
+class YtdlpUnavailable(Exception):
+    """The breaker is open: yt-dlp failed too many times in a row recently"""
+
+
+def is_transient(error):
+    if isinstance(error, (OSError, TimeoutError)):
+        return True
+    return bool(TRANSIENT_PATTERN.search(str(error)))
+
+
+class CircuitBreaker:
+    """closed -> open after failure_threshold consecutive failures -> half open after cooldown (one trial call)"""
+
+    def __init__(self, failure_threshold, cooldown, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self.clock() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Whether a call may go out now; in half open state only one at a time"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        """Returns True if this failure opened (or re-opened) the breaker"""
+        with self._lock:
+            self._failures += 1
+            was_trial, self._trial_running = self._trial_running, False
+            if was_trial or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = self.clock()
+                return True
+            return False
+
+
+class YtdlpClient:
+    """
+    Thread-safe yt-dlp front end. factory(options) builds a YoutubeDL-like object (extract_info(url,
+    download=False)), yt_dlp.YoutubeDL by default; pass a fake one to run without the network. sleep is
+    injectable for the same reason.
+    """
+
+    def __init__(self, retries=3, backoff=1.0, max_backoff=30.0, failure_threshold=5, cooldown=60.0,
+                 factory=None, sleep=time.sleep, clock=time.monotonic):
+        if factory is None:
+            import yt_dlp  # only for the real thing, so a fake factory runs without yt-dlp installed
+            factory = yt_dlp.YoutubeDL
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.factory = factory
+        self.sleep = sleep
+        self.clock = clock
+        self.breaker = CircuitBreaker(failure_threshold, cooldown, clock)
+        self._lock = threading.Lock()
+        self._idle = {}  # options key -> [YoutubeDL], returned after each request
+        self.stats = {"requests": 0, "attempts": 0, "succeeded": 0, "retries": 0, "failures": 0, "rejected": 0,
+                      "created": 0, "latency_total": 0.0, "latency_max": 0.0}
+
+    def _acquire(self, key, options):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+            self.stats["created"] += 1
+        return self.factory(dict(options))
+
+    def _release(self, key, ydl):
+        with self._lock:
+            self._idle.setdefault(key, []).append(ydl)
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self.stats[name] += amount
+
+    def extract_info(self, url, options):
+        """
+        ydl.extract_info(url, download=False) with retries. Raises YtdlpUnavailable while the breaker is
+        open, or the last error once retries run out (or right away if it isn't transient).
+        """
+        key = json.dumps(options, sort_keys=True, default=str)
+        self._count(requests=1)
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self._count(rejected=1)
+                raise YtdlpUnavailable(f"yt-dlp failed {self.breaker.failure_threshold} times in a row, "
+                                       f"not trying again for {self.breaker.cooldown:.0f}s")
+            ydl = self._acquire(key, options)
+            start = self.clock()
+            try:
+                info = ydl.extract_info(url, download=False)
+            except Exception as e:
+                self._release(key, ydl)
+                transient = is_transient(e)
+                self._count(attempts=1)
+                if not transient:
+                    self.breaker.record_success()  # the service answered, the video is just unavailable
+                    raise
+                self._count(failures=1)
+                self.breaker.record_failure()
+                if attempt == self.retries:
+                    raise
+                self._count(retries=1)
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                self.sleep(random.uniform(delay / 2, delay))  # jittered so parallel callers don't retry in step
+                continue
+            latency = self.clock() - start
+            self._release(key, ydl)
+            self.breaker.record_success()
+            with self._lock:
+                self.stats["attempts"] += 1
+                self.stats["succeeded"] += 1
+                self.stats["latency_total"] += latency
+                self.stats["latency_max"] = max(self.stats["latency_max"], latency)
+            return info
+
+    def print_stats(self):
+        stats = self.stats
+        average = stats["latency_total"] / stats["succeeded"] * 1000 if stats["succeeded"] else 0
+        print(f"yt-dlp: {stats['requests']} requests, {stats['retries']} retries, {stats['failures']} failed attempts, "
+              f"{stats['rejected']} rejected by the breaker ({self.breaker.state}), {stats['created']} clients, "
+              f"{average:.0f}ms average / {stats['latency_max'] * 1000:.0f}ms max latency")